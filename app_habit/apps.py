@@ -5,3 +5,6 @@ class AppHabitConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_habit'
     verbose_name = 'Привычки'
+
+    def ready(self):
+        from . import signals  # noqa: F401
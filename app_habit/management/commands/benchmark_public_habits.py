@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from app_habit.models import Habit
+from app_habit.serializers import PublicHabitSerializer, PublicHabitListSerializer, PUBLIC_HABIT_VALUES
+from app_user.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Сравнение скорости сериализации списка публичных привычек. '
+            'Тестовые данные создаются в транзакции, которая откатывается после замера')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=3000, help='Количество публичных привычек')
+        parser.add_argument('--users', type=int, default=300, help='Количество пользователей')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов каждого замера')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_data(options['users'], options['habits'])
+
+            queryset = Habit.objects.filter(is_public=True).order_by('id')
+            variants = [
+                ('ModelSerializer', lambda: PublicHabitSerializer(queryset.all(), many=True).data),
+                ('ModelSerializer + select_related', lambda: PublicHabitSerializer(
+                    queryset.select_related('user'), many=True).data),
+                ('values() + PublicHabitListSerializer', lambda: PublicHabitListSerializer(
+                    queryset.values(*PUBLIC_HABIT_VALUES), many=True).data),
+            ]
+            for name, serialize in variants:
+                self.measure(name, serialize, options['repeat'])
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def create_data(users_count: int, habits_count: int) -> None:
+        """
+        Создает тестовых пользователей и публичные привычки.
+
+        :param users_count: Количество пользователей.
+        :param habits_count: Количество привычек.
+        """
+        users = CustomUser.objects.bulk_create([
+            CustomUser(email=f'benchmark_{i}@example.com', first_name=f'Имя {i}', last_name=f'Фамилия {i}')
+            for i in range(users_count)
+        ])
+        Habit.objects.bulk_create([
+            Habit(user=users[i % users_count], place='Дом', time='09:00', action=f'Привычка {i}',
+                  is_pleasant=False, time_for_action=60, is_public=True)
+            for i in range(habits_count)
+        ])
+
+    def measure(self, name: str, serialize, repeat: int) -> None:
+        """
+        Замеряет время сериализации и количество запросов к БД.
+
+        :param name: Название варианта.
+        :param serialize: Функция, возвращающая сериализованный список.
+        :param repeat: Количество повторов.
+        """
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        timings = []
+        for _ in range(repeat):
+            queries.clear()
+            with connection.execute_wrapper(count_queries):
+                started_at = time.perf_counter()
+                rows = len(serialize())
+                timings.append(time.perf_counter() - started_at)
+        best = min(timings)
+        self.stdout.write(f'{name}: {rows} строк, лучшее время {best * 1000:.1f} мс, '
+                          f'{rows / best:.0f} строк/с, запросов к БД: {len(queries)}')
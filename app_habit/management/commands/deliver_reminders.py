@@ -0,0 +1,21 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from app_habit.services.delivery_service import AsyncDeliveryService
+
+
+class Command(BaseCommand):
+    help = 'Асинхронная доставка напоминаний из очереди Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Максимальное число одновременных запросов к Telegram')
+        parser.add_argument('--batch-size', type=int, help='Количество напоминаний, забираемых из очереди за раз')
+        parser.add_argument('--drain', action='store_true', help='Завершить работу, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        service = AsyncDeliveryService(concurrency=options['concurrency'], batch_size=options['batch_size'])
+        try:
+            sent = async_to_sync(service.run)(drain=options['drain'])
+        except KeyboardInterrupt:
+            sent = service.sent
+        self.stdout.write(self.style.SUCCESS(f'Доставлено напоминаний: {sent}'))
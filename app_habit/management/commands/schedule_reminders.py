@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_habit.services.scheduler_service import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Планировщик напоминаний на колесе таймеров (вместо задачи dispatch_due_reminders в celery beat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catch-up', type=int,
+                            help='На сколько минут может опоздать напоминание, пропущенное за время простоя '
+                                 '(0 - не отправлять пропущенные напоминания)')
+
+    def handle(self, *args, **options):
+        if settings.REMINDER_SCHEDULER != 'wheel':
+            self.stdout.write(self.style.WARNING(
+                'Напоминания планирует celery beat. Для запуска планировщика установите REMINDER_SCHEDULER=wheel'))
+            return
+        try:
+            ReminderScheduler(catch_up_minutes=options['catch_up']).run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Планировщик остановлен'))
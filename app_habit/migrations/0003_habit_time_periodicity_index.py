@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['time', 'periodicity'], name='habits_time_periodicity_idx'),
+        ),
+    ]
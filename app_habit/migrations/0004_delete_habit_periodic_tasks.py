@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-17 18:46
+
+from django.db import migrations
+
+
+def delete_habit_periodic_tasks(apps, schema_editor):
+    """
+    Удаляет периодические задачи, созданные для каждой привычки отдельно.
+    Напоминания теперь отправляет одна задача dispatch_due_reminders.
+    """
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name__startswith='reminder_for_habit_').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0003_habit_time_periodicity_index'),
+        ('django_celery_beat', '0018_improve_crontab_helptext'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_habit_periodic_tasks, migrations.RunPython.noop),
+    ]
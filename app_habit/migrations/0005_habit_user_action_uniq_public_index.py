@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-17 18:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_actions(apps, schema_editor):
+    """
+    Переименовывает повторяющиеся действия привычек одного пользователя,
+    чтобы можно было добавить ограничение уникальности (user, action).
+    Первая по ID привычка сохраняет действие, к остальным добавляется их ID.
+    """
+    Habit = apps.get_model('app_habit', 'Habit')
+    duplicates = (Habit.objects.values('user_id', 'action')
+                  .annotate(count=Count('id')).filter(count__gt=1))
+    for duplicate in duplicates:
+        habits = Habit.objects.filter(user_id=duplicate['user_id'], action=duplicate['action']).order_by('id')
+        for habit in habits[1:]:
+            suffix = f' ({habit.id})'
+            habit.action = f'{habit.action[:200 - len(suffix)]}{suffix}'
+            habit.save(update_fields=['action'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0004_delete_habit_periodic_tasks'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_actions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['id'], name='habits_public_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='habit',
+            constraint=models.UniqueConstraint(fields=('user', 'action'), name='habits_user_action_uniq'),
+        ),
+    ]
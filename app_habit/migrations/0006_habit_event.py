@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0005_habit_user_action_uniq_public_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('habit_id', models.BigIntegerField(verbose_name='ID привычки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время создания')),
+            ],
+            options={
+                'verbose_name': 'Событие изменения привычки',
+                'verbose_name_plural': 'События изменения привычек',
+                'db_table': 'habit_events',
+            },
+        ),
+    ]
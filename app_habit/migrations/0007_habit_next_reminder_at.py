@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-17 19:12
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_next_reminder_at(apps, schema_editor):
+    """
+    Заполняет время следующего напоминания ближайшим наступлением времени привычки.
+    """
+    Habit = apps.get_model('app_habit', 'Habit')
+    now = timezone.now()
+    today = timezone.localtime(now).date()
+    batch = []
+    for habit in Habit.objects.only('id', 'time').iterator(chunk_size=2000):
+        reminder_at = timezone.make_aware(datetime.combine(today, habit.time.replace(second=0, microsecond=0)))
+        if reminder_at <= now:
+            reminder_at = timezone.make_aware(datetime.combine(today + timedelta(days=1), reminder_at.time()))
+        habit.next_reminder_at = reminder_at
+        batch.append(habit)
+        if len(batch) == 2000:
+            Habit.objects.bulk_update(batch, ['next_reminder_at'])
+            batch = []
+    Habit.objects.bulk_update(batch, ['next_reminder_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0006_habit_event'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='habit',
+            name='habits_time_periodicity_idx',
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время следующего напоминания'),
+        ),
+        migrations.RunPython(fill_next_reminder_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['next_reminder_at'], name='habits_next_reminder_at_idx'),
+        ),
+    ]
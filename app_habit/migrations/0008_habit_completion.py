@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 19:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CREATE_HABIT_COMPLETIONS = """
+CREATE TABLE habit_completions (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    habit_id bigint NOT NULL REFERENCES habits (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+    user_id bigint NOT NULL,
+    completed_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, completed_at)
+) PARTITION BY RANGE (completed_at);
+CREATE INDEX habit_completions_habit_completed_idx ON habit_completions (habit_id, completed_at);
+CREATE INDEX habit_completions_user_completed_idx ON habit_completions (user_id, completed_at);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0007_habit_next_reminder_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_HABIT_COMPLETIONS, 'DROP TABLE habit_completions;'),
+        migrations.CreateModel(
+            name='HabitCompletion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField(verbose_name='ID пользователя')),
+                ('completed_at', models.DateTimeField(verbose_name='Время выполнения')),
+                ('habit', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING,
+                                            related_name='completions', to='app_habit.habit',
+                                            verbose_name='Привычка')),
+            ],
+            options={
+                'verbose_name': 'Выполнение привычки',
+                'verbose_name_plural': 'Выполнения привычек',
+                'db_table': 'habit_completions',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_user', '0003_user_timezone'),
+        ('app_habit', '0008_habit_completion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitStats',
+            fields=[
+                ('current_streak', models.PositiveIntegerField(default=0, verbose_name='Текущая серия')),
+                ('best_streak', models.PositiveIntegerField(default=0, verbose_name='Лучшая серия')),
+                ('total_completions', models.PositiveIntegerField(default=0, verbose_name='Всего выполнений')),
+                ('last_completed_on', models.DateField(blank=True, null=True, verbose_name='День последнего выполнения')),
+                ('recent_days', models.PositiveIntegerField(default=0, verbose_name='Дни выполнения за последние 30 дней')),
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='app_habit.habit', verbose_name='Привычка')),
+            ],
+            options={
+                'verbose_name': 'Статистика привычки',
+                'verbose_name_plural': 'Статистика привычек',
+                'db_table': 'habit_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('current_streak', models.PositiveIntegerField(default=0, verbose_name='Текущая серия')),
+                ('best_streak', models.PositiveIntegerField(default=0, verbose_name='Лучшая серия')),
+                ('total_completions', models.PositiveIntegerField(default=0, verbose_name='Всего выполнений')),
+                ('last_completed_on', models.DateField(blank=True, null=True, verbose_name='День последнего выполнения')),
+                ('recent_days', models.PositiveIntegerField(default=0, verbose_name='Дни выполнения за последние 30 дней')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='habit_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+                'db_table': 'user_habit_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+ADD_COMPLETION_KEY = """
+ALTER TABLE habit_completions ADD COLUMN key uuid;
+CREATE UNIQUE INDEX habit_completions_key_uniq ON habit_completions (key, completed_at);
+"""
+DROP_COMPLETION_KEY = """
+DROP INDEX habit_completions_key_uniq;
+ALTER TABLE habit_completions DROP COLUMN key;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_habit', '0009_completion_stats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(ADD_COMPLETION_KEY, DROP_COMPLETION_KEY),
+        migrations.AddField(
+            model_name='habitcompletion',
+            name='key',
+            field=models.UUIDField(blank=True, null=True, verbose_name='Ключ отметки'),
+        ),
+    ]
@@ -1,10 +1,14 @@
-from typing import List
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone, tzinfo
+from typing import Any, Dict, List, Optional, Union
 
 from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_time
 
 from app_user.models import CustomUser
 
 NULLABLE = {'blank': True, 'null': True}
+MAX_PERIODICITY = 7
 
 
 class Habit(models.Model):
@@ -21,18 +25,241 @@ class Habit(models.Model):
     reward = models.CharField(max_length=200, verbose_name='Вознаграждение', **NULLABLE)
     time_for_action = models.PositiveIntegerField(verbose_name='Время на выполнение')
     is_public = models.BooleanField(default=False, verbose_name='Признак публичности')
+    next_reminder_at = models.DateTimeField(**NULLABLE, verbose_name='Время следующего напоминания')
 
     class Meta:
         verbose_name = 'Привычка'
         verbose_name_plural = 'Привычки'
         db_table = 'habits'
+        indexes = [
+            models.Index(fields=['next_reminder_at'], name='habits_next_reminder_at_idx'),
+            models.Index(fields=['id'], condition=models.Q(is_public=True), name='habits_public_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'action'], name='habits_user_action_uniq'),
+        ]
 
     def __str__(self):
         return f'{self.action}'
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет привычку. Если время следующего напоминания не задано,
+        ставит его на ближайшее наступление времени привычки в часовом поясе пользователя.
+        """
+        if self.next_reminder_at is None:
+            self.next_reminder_at = self.get_first_reminder_at(self.time, tz=self.user.get_timezone())
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_reminder_at(day: date, habit_time: dt_time, tz: Optional[tzinfo] = None) -> datetime:
+        """
+        Возвращает момент (в UTC), когда в день day наступает время привычки по часовому поясу tz.
+        Время, которого нет из-за перевода часов вперед, сдвигается на величину перевода,
+        из повторяющегося при переводе назад берется первое.
+
+        :param day: Дата по часовому поясу tz.
+        :param habit_time: Время выполнения привычки.
+        :param tz: Часовой пояс пользователя (по умолчанию - TIME_ZONE).
+        """
+        local_reminder_at = datetime.combine(day, habit_time.replace(second=0, microsecond=0))
+        return timezone.make_aware(local_reminder_at, tz).astimezone(dt_timezone.utc)
+
+    @classmethod
+    def get_first_reminder_at(cls, habit_time: Union[dt_time, str], moment: Optional[datetime] = None,
+                              tz: Optional[tzinfo] = None) -> datetime:
+        """
+        Возвращает ближайший после moment момент (в UTC), когда по часовому поясу tz наступает время привычки
+        (сегодня, если это время еще не прошло, иначе завтра). Запросов к БД не выполняет.
+
+        :param habit_time: Время выполнения привычки.
+        :param moment: Момент времени, после которого ищется напоминание (по умолчанию - текущий).
+        :param tz: Часовой пояс пользователя (по умолчанию - TIME_ZONE).
+        """
+        if isinstance(habit_time, str):
+            habit_time = parse_time(habit_time)
+        moment = moment or timezone.now()
+        day = timezone.localtime(moment, tz).date()
+        reminder_at = cls.get_reminder_at(day, habit_time, tz)
+        if reminder_at <= moment:
+            reminder_at = cls.get_reminder_at(day + timedelta(days=1), habit_time, tz)
+        return reminder_at
+
     @classmethod
     def get_all_habits(cls) -> List['CustomUser']:
         """
         Возвращает список всех привычек
         """
         return cls.objects.all().order_by('id')
+
+
+class HabitEvent(models.Model):
+    """
+    Модель, описывающая событие изменения привычки (transactional outbox).
+    Событие записывается в той же транзакции, что и изменение привычки,
+    а фоновая задача process_habit_events обрабатывает события пачками.
+    """
+
+    habit_id = models.BigIntegerField(verbose_name='ID привычки')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Время создания')
+
+    class Meta:
+        verbose_name = 'Событие изменения привычки'
+        verbose_name_plural = 'События изменения привычек'
+        db_table = 'habit_events'
+
+    def __str__(self):
+        return f'{self.habit_id}'
+
+
+class HabitCompletion(models.Model):
+    """
+    Модель, описывающая отметку о выполнении привычки.
+
+    Журнал только дополняется. Таблица habit_completions секционирована по месяцам (PARTITION BY RANGE
+    по completed_at) и создается миграцией вручную, поэтому модель не управляется Django.
+    Отметки пишутся пачками через буфер HabitCompletionService, при удалении привычки
+    ее отметки удаляет внешний ключ в БД (ON DELETE CASCADE). Ключ отметки уникален (вместе с completed_at,
+    ключом секционирования), поэтому повторная запись пачки из буфера не дублирует отметки.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    key = models.UUIDField(**NULLABLE, verbose_name='Ключ отметки')
+    habit = models.ForeignKey(Habit, on_delete=models.DO_NOTHING, db_constraint=False, related_name='completions',
+                              verbose_name='Привычка')
+    user_id = models.BigIntegerField(verbose_name='ID пользователя')
+    completed_at = models.DateTimeField(verbose_name='Время выполнения')
+
+    class Meta:
+        managed = False
+        verbose_name = 'Выполнение привычки'
+        verbose_name_plural = 'Выполнения привычек'
+        db_table = 'habit_completions'
+
+    def __str__(self):
+        return f'{self.habit_id} {self.completed_at}'
+
+
+class CompletionStats(models.Model):
+    """
+    Абстрактная модель накопительной статистики выполнений: серии выполнений и выполнения за последние дни.
+
+    Статистика обновляется инкрементально при записи отметок (add_day) и периодически пересчитывается
+    по журналу выполнений, поэтому для чтения журнал не нужен. Дни выполнения за последние WINDOW_DAYS дней
+    хранятся битовой маской recent_days: бит i означает выполнение в день last_completed_on - i.
+    """
+    WINDOW_DAYS = 30
+
+    current_streak = models.PositiveIntegerField(default=0, verbose_name='Текущая серия')
+    best_streak = models.PositiveIntegerField(default=0, verbose_name='Лучшая серия')
+    total_completions = models.PositiveIntegerField(default=0, verbose_name='Всего выполнений')
+    last_completed_on = models.DateField(**NULLABLE, verbose_name='День последнего выполнения')
+    recent_days = models.PositiveIntegerField(default=0, verbose_name='Дни выполнения за последние 30 дней')
+
+    class Meta:
+        abstract = True
+
+    def add_day(self, day: date, periodicity: int = 1, count: int = 1) -> None:
+        """
+        Учитывает выполнения за день. Серия продолжается, если с предыдущего выполнения прошло
+        не больше periodicity дней. Выполнения за дни раньше последнего учитываются только в маске,
+        серии по ним исправляет пересчет по журналу.
+
+        :param day: День выполнения по часовому поясу пользователя.
+        :param periodicity: Периодичность в днях.
+        :param count: Количество выполнений за день.
+        """
+        self.total_completions += count
+        if self.last_completed_on is None or day > self.last_completed_on:
+            gap = (day - self.last_completed_on).days if self.last_completed_on else None
+            if gap is not None and gap < self.WINDOW_DAYS:
+                self.recent_days = (self.recent_days << gap | 1) & ((1 << self.WINDOW_DAYS) - 1)
+            else:
+                self.recent_days = 1
+            self.current_streak = self.current_streak + 1 if gap is not None and gap <= periodicity else 1
+            self.best_streak = max(self.best_streak, self.current_streak)
+            self.last_completed_on = day
+        elif (self.last_completed_on - day).days < self.WINDOW_DAYS:
+            self.recent_days |= 1 << (self.last_completed_on - day).days
+
+    def get_current_streak(self, today: date, periodicity: int = 1) -> int:
+        """
+        Возвращает текущую серию: серия прервана, если с последнего выполнения прошло больше periodicity дней.
+
+        :param today: Текущий день по часовому поясу пользователя.
+        :param periodicity: Периодичность в днях.
+        """
+        if self.last_completed_on is None or (today - self.last_completed_on).days > periodicity:
+            return 0
+        return self.current_streak
+
+    def get_completed_days(self, today: date, days: int) -> int:
+        """
+        Возвращает количество дней с выполнениями за последние days дней (включая сегодня).
+
+        :param today: Текущий день по часовому поясу пользователя.
+        :param days: Количество дней (не больше WINDOW_DAYS).
+        """
+        if self.last_completed_on is None:
+            return 0
+        shift = max((today - self.last_completed_on).days, 0)
+        if shift >= days:
+            return 0
+        return bin(self.recent_days & ((1 << (days - shift)) - 1)).count('1')
+
+    def get_completion_rate(self, today: date, days: int, periodicity: int = 1) -> float:
+        """
+        Возвращает долю выполненных повторений за последние days дней (от 0 до 1).
+
+        :param today: Текущий день по часовому поясу пользователя.
+        :param days: Количество дней (не больше WINDOW_DAYS).
+        :param periodicity: Периодичность в днях.
+        """
+        expected = -(-days // periodicity)
+        return round(min(self.get_completed_days(today, days) / expected, 1), 2)
+
+    def get_summary(self, today: date, periodicity: int = 1) -> Dict[str, Any]:
+        """
+        Возвращает статистику на текущий день.
+
+        :param today: Текущий день по часовому поясу пользователя.
+        :param periodicity: Периодичность в днях.
+        """
+        return {
+            'current_streak': self.get_current_streak(today, periodicity),
+            'best_streak': self.best_streak,
+            'total_completions': self.total_completions,
+            'last_completed_on': self.last_completed_on,
+            'completion_rate_7d': self.get_completion_rate(today, 7, periodicity),
+            'completion_rate_30d': self.get_completion_rate(today, 30, periodicity),
+        }
+
+
+class HabitStats(CompletionStats):
+    """Модель, описывающая статистику выполнений привычки"""
+
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                 verbose_name='Привычка')
+
+    class Meta:
+        verbose_name = 'Статистика привычки'
+        verbose_name_plural = 'Статистика привычек'
+        db_table = 'habit_stats'
+
+    def __str__(self):
+        return f'{self.habit_id}'
+
+
+class UserStats(CompletionStats):
+    """Модель, описывающая статистику выполнений всех привычек пользователя (серии - по дням с выполнениями)"""
+
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='habit_stats',
+                                verbose_name='Пользователь')
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+        db_table = 'user_habit_stats'
+
+    def __str__(self):
+        return f'{self.user_id}'
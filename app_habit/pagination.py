@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from django.db.models import QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CustomPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с номером страницы (OFFSET и COUNT(*))"""
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset): следующая страница начинается после ID
+    последней записи предыдущей. Не использует OFFSET и COUNT(*), поэтому
+    время получения страницы не зависит от ее глубины.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    after_query_param = 'after'
+
+    def __init__(self) -> None:
+        self.request = None
+        self.next_after = None
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Возвращает размер страницы из параметра запроса, но не больше max_page_size.
+
+        :param request: HTTP-запрос.
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_after(self, request: Request) -> Optional[int]:
+        """
+        Возвращает ID, после которого начинается страница, или None для первой страницы.
+
+        :param request: HTTP-запрос.
+        """
+        after = request.query_params.get(self.after_query_param)
+        if after is None:
+            return None
+        try:
+            return int(after)
+        except ValueError:
+            raise NotFound('Неверный курсор')
+
+    @staticmethod
+    def get_row_id(row: Any) -> int:
+        """
+        Возвращает ID записи страницы (экземпляра модели или словаря из values()).
+
+        :param row: Запись страницы.
+        """
+        return row['id'] if isinstance(row, dict) else row.pk
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> List[Any]:
+        """
+        Возвращает записи страницы, отсортированные по ID.
+
+        :param queryset: QuerySet, который нужно разбить на страницы.
+        :param request: HTTP-запрос.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        after = self.get_after(request)
+
+        queryset = queryset.order_by('id')
+        if after is not None:
+            queryset = queryset.filter(id__gt=after)
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        self.next_after = self.get_row_id(page[-1]) if len(rows) > page_size else None
+        return page
+
+    def get_next_link(self) -> Optional[str]:
+        """
+        Возвращает ссылку на следующую страницу или None, если страница последняя.
+        """
+        if self.next_after is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.after_query_param, self.next_after)
+
+    def get_paginated_response(self, data: List[Any]) -> Response:
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class HabitPagination(BasePagination):
+    """
+    Пагинация списков привычек.
+    По умолчанию используется постраничная пагинация с номером страницы,
+    параметр pagination=keyset включает пагинацию по ключу.
+    """
+    mode_query_param = 'pagination'
+    keyset_mode = 'keyset'
+
+    def __init__(self) -> None:
+        self.paginator = None
+
+    def get_paginator(self, request: Request) -> BasePagination:
+        """
+        Возвращает пагинатор, выбранный параметром запроса.
+
+        :param request: HTTP-запрос.
+        """
+        if request.query_params.get(self.mode_query_param) == self.keyset_mode:
+            return KeysetPagination()
+        return CustomPageNumberPagination()
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> Optional[List[Any]]:
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: List[Any]) -> Response:
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return CustomPageNumberPagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view) -> List[dict]:
+        return CustomPageNumberPagination().get_schema_operation_parameters(view)
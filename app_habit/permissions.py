@@ -0,0 +1,19 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+from rest_framework.request import Request
+
+
+class HasServiceToken(BasePermission):
+    """
+    Доступ к внутреннему API для сервисов (Telegram-бота) по общему токену BOT_SERVICE_TOKEN
+    в заголовке X-Service-Token. Если токен не задан, доступ закрыт.
+    """
+    header = 'HTTP_X_SERVICE_TOKEN'
+
+    def has_permission(self, request: Request, view) -> bool:
+        token = settings.BOT_SERVICE_TOKEN
+        if not token:
+            return False
+        return hmac.compare_digest(request.META.get(self.header, '').encode(), token.encode())
@@ -1,16 +1,167 @@
-from typing import Dict, Any
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Iterator, List
 
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
 
 from app_user.serializers import UserSerializer
-from .models import Habit
+from .models import CompletionStats, Habit, MAX_PERIODICITY
+
+DUPLICATE_ACTION_CONSTRAINT = 'habits_user_action_uniq'
+DUPLICATE_ACTION_ERROR = 'У вас уже есть привычка с таким действием'
+
+
+@contextmanager
+def duplicate_action_guard() -> Iterator[None]:
+    """
+    Выполняет запись в отдельной точке сохранения и превращает нарушение
+    ограничения уникальности (user, action) в ошибку валидации.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as error:
+        if DUPLICATE_ACTION_CONSTRAINT not in str(error):
+            raise
+        raise serializers.ValidationError({'non_field_errors': [DUPLICATE_ACTION_ERROR]})
+
+
+def parse_ids(values: Iterable[Any]) -> List[int]:
+    """
+    Возвращает ID из входных данных запроса, пропуская значения, которые не являются числами.
+
+    :param values: Значения ID из запроса.
+    """
+    ids = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+class RelatedHabitField(serializers.PrimaryKeyRelatedField):
+    """
+    Поле связанной привычки.
+    При пакетной записи берет привычку из словаря related_habits в контексте,
+    загруженного одним запросом для всей пачки, а не запрашивает каждую отдельно.
+    """
+
+    def to_internal_value(self, data: Any) -> Habit:
+        related_habits = self.context.get('related_habits')
+        if related_habits is not None:
+            try:
+                return related_habits[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class HabitListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор для пакетного создания и обновления привычек.
+    Связанные привычки и занятые действия проверяются для всей пачки сразу,
+    запись выполняется через bulk_create/bulk_update.
+    При обновлении instance - словарь {ID: привычка} привычек текущего пользователя.
+    """
+
+    def to_internal_value(self, data: Any) -> List[Dict[str, Any]]:
+        """
+        Загружает одним запросом связанные привычки всех элементов пачки,
+        валидирует элементы и проверяет пачку целиком.
+        Ошибки возвращаются списком, по одному элементу на каждую привычку пачки.
+        :param data: Список привычек из запроса.
+        """
+        if isinstance(data, list):
+            related_ids = parse_ids(item.get('related_habit') for item in data if isinstance(item, dict))
+            self.context['related_habits'] = Habit.objects.in_bulk(related_ids)
+        return self.validate_batch(super().to_internal_value(data))
+
+    def validate_batch(self, attrs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Проверка пачки привычек:
+        - при обновлении у каждой привычки указан ID, ID не повторяются внутри пачки
+          и все привычки принадлежат пользователю;
+        - действия не повторяются внутри пачки и не совпадают с действиями
+          других привычек пользователя (один запрос на всю пачку).
+        :param attrs: Валидные данные элементов пачки.
+        """
+        user = self.context['request'].user
+        errors = [{} for _ in attrs]
+
+        if self.instance is not None:
+            ids = Counter(item['id'] for item in attrs if 'id' in item)
+            for error, item in zip(errors, attrs):
+                if 'id' not in item:
+                    error['id'] = [serializers.Field.default_error_messages['required']]
+                elif ids[item['id']] > 1:
+                    error['id'] = ['Привычка повторяется в пачке']
+                elif item['id'] not in self.instance:
+                    error['id'] = ['Привычка не найдена']
+
+        actions = Counter(item['action'] for item in attrs if 'action' in item)
+        renamed_ids = [item['id'] for item in attrs if 'id' in item and 'action' in item]
+        taken_actions = set(
+            Habit.objects.filter(user=user, action__in=actions).exclude(id__in=renamed_ids)
+            .values_list('action', flat=True)
+        ) if actions else set()
+        for error, item in zip(errors, attrs):
+            action = item.get('action')
+            if action is not None and (actions[action] > 1 or action in taken_actions):
+                error['action'] = [DUPLICATE_ACTION_ERROR]
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data: List[Dict[str, Any]]) -> List[Habit]:
+        """
+        Создание пачки привычек текущего пользователя одним запросом.
+        :param validated_data: Валидные данные для создания привычек.
+        """
+        user = self.context['request'].user
+        tz = user.get_timezone()
+        habits = [Habit(user=user, next_reminder_at=Habit.get_first_reminder_at(attrs['time'], tz=tz), **attrs)
+                  for attrs in validated_data]
+        with duplicate_action_guard():
+            return Habit.objects.bulk_create(habits)
+
+    def update(self, instance: Dict[int, Habit], validated_data: List[Dict[str, Any]]) -> List[Habit]:
+        """
+        Обновление пачки привычек одним запросом.
+        :param instance: Словарь {ID: привычка} обновляемых привычек.
+        :param validated_data: Валидные данные для обновления привычек, каждый элемент содержит id.
+        """
+        tz = self.context['request'].user.get_timezone()
+        habits = []
+        fields = set()
+        for attrs in validated_data:
+            habit = instance[attrs.pop('id')]
+            if HabitSerializer.is_schedule_changed(habit, attrs):
+                attrs['next_reminder_at'] = Habit.get_first_reminder_at(attrs.get('time', habit.time), tz=tz)
+            for field, value in attrs.items():
+                setattr(habit, field, value)
+            fields.update(attrs)
+            habits.append(habit)
+        if fields:
+            with duplicate_action_guard():
+                Habit.objects.bulk_update(habits, fields)
+        return habits
 
 
 class HabitSerializer(serializers.ModelSerializer):
+    serializer_related_field = RelatedHabitField
+
     class Meta:
         model = Habit
         fields = '__all__'
-        read_only_fields = ('user',)
+        read_only_fields = ('user', 'next_reminder_at')
+        list_serializer_class = HabitListSerializer
 
     def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -18,11 +169,10 @@ class HabitSerializer(serializers.ModelSerializer):
         - нельзя одновременно указать связанную привычку и вознаграждение;
         - время выполнения не больше 120 секунд;
         - у приятной привычки не может быть вознаграждения или связанной привычки;
-        - периодичность не может быть более 7 дней;
+        - периодичность не может быть менее 1 и более 7 дней;
+        Уникальность действия в пределах пользователя проверяет ограничение habits_user_action_uniq в БД.
         :param data: Входные данные для создания/обновления привычки.
         """
-        user = self.context['request'].user
-
         if data.get('reward') and data.get('related_habit'):
             raise serializers.ValidationError(
                 'Нельзя одновременно указать связанную привычку и вознаграждение'
@@ -36,11 +186,11 @@ class HabitSerializer(serializers.ModelSerializer):
                 "У приятной привычки не может быть вознаграждения или связанной привычки"
             )
 
-        if 'periodicity' in data and data['periodicity'] > 7:
-            raise serializers.ValidationError('Периодичность не может быть более 7 дней')
+        if 'periodicity' in data and data['periodicity'] > MAX_PERIODICITY:
+            raise serializers.ValidationError(f'Периодичность не может быть более {MAX_PERIODICITY} дней')
 
-        if 'action' in data and Habit.objects.filter(action=data['action'], user=user).exists():
-            raise serializers.ValidationError('У вас уже есть привычка с таким действием')
+        if 'periodicity' in data and data['periodicity'] < 1:
+            raise serializers.ValidationError('Периодичность не может быть менее 1 дня')
 
         return data
 
@@ -62,9 +212,78 @@ class HabitSerializer(serializers.ModelSerializer):
         :param validated_data: Валидные данные для создания привычки.
         """
         validated_data['user'] = self.context['request'].user
-        habit = super().create(validated_data)
+        with duplicate_action_guard():
+            habit = super().create(validated_data)
+        return habit
+
+    def update(self, instance: Habit, validated_data: Dict[str, Any]) -> Habit:
+        """
+        Обновление привычки.
+        Если изменились время или периодичность, время следующего напоминания считается заново.
+        :param instance: Обновляемая привычка.
+        :param validated_data: Валидные данные для обновления привычки.
+        """
+        if self.is_schedule_changed(instance, validated_data):
+            validated_data['next_reminder_at'] = Habit.get_first_reminder_at(
+                validated_data.get('time', instance.time), tz=self.context['request'].user.get_timezone())
+        with duplicate_action_guard():
+            habit = super().update(instance, validated_data)
         return habit
 
+    @staticmethod
+    def is_schedule_changed(instance: Habit, validated_data: Dict[str, Any]) -> bool:
+        """
+        Проверяет, меняют ли данные время или периодичность привычки.
+        :param instance: Обновляемая привычка.
+        :param validated_data: Валидные данные для обновления привычки.
+        """
+        return any(field in validated_data and validated_data[field] != getattr(instance, field)
+                   for field in ('time', 'periodicity'))
+
+
+class HabitBulkUpdateSerializer(HabitSerializer):
+    """Элемент пачки для пакетного обновления привычек: ID обязателен"""
+    id = serializers.IntegerField()
+
+
+class HabitBulkDeleteSerializer(serializers.Serializer):
+    """Список ID привычек для пакетного удаления"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False,
+                                max_length=settings.HABIT_BULK_MAX_SIZE)
+
+
+class HabitCompletionSerializer(serializers.Serializer):
+    """
+    Отметка о выполнении привычки: время выполнения необязательно (по умолчанию - текущее).
+    Выполнение можно отметить не раньше чем за HABIT_COMPLETION_BACKDATE_DAYS дней
+    (но не больше окна статистики): иначе каждая отметка в новом месяце создавала бы секцию таблицы.
+    """
+    completed_at = serializers.DateTimeField(required=False)
+
+    @staticmethod
+    def validate_completed_at(value: datetime) -> datetime:
+        """
+        Проверка, что время выполнения не в будущем и не раньше допустимого срока.
+        :param value: Время выполнения.
+        """
+        now = timezone.now()
+        if value > now:
+            raise serializers.ValidationError('Время выполнения не может быть в будущем')
+        backdate_days = min(settings.HABIT_COMPLETION_BACKDATE_DAYS, CompletionStats.WINDOW_DAYS)
+        if value < now - timedelta(days=backdate_days):
+            raise serializers.ValidationError(f'Выполнение можно отметить не раньше чем за {backdate_days} дн.')
+        return value
+
+
+class CompletionStatsSerializer(serializers.Serializer):
+    """Статистика выполнений привычки или пользователя на текущий день"""
+    current_streak = serializers.IntegerField()
+    best_streak = serializers.IntegerField()
+    total_completions = serializers.IntegerField()
+    last_completed_on = serializers.DateField(allow_null=True)
+    completion_rate_7d = serializers.FloatField()
+    completion_rate_30d = serializers.FloatField()
+
 
 class PublicHabitSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения данных в списке публичных привычек"""
@@ -74,3 +293,40 @@ class PublicHabitSerializer(serializers.ModelSerializer):
         model = Habit
         fields = ['user', 'place', 'time', 'action', 'is_pleasant', 'related_habit',
                   'periodicity', 'reward', 'time_for_action', 'is_public']
+
+
+class PublicHabitListSerializer(serializers.BaseSerializer):
+    """
+    Облегченный сериализатор для списка публичных привычек.
+    Принимает строки из values() (см. PUBLIC_HABIT_VALUES) и формирует
+    тот же ответ, что и PublicHabitSerializer, без накладных расходов на поля ModelSerializer.
+    """
+
+    def to_representation(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Преобразует строку values() в словарь ответа.
+        :param row: Строка QuerySet.values() с полями PUBLIC_HABIT_VALUES.
+        """
+        return {
+            'user': {
+                'id': row['user_id'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+                'email': row['user__email'],
+            },
+            'place': row['place'],
+            'time': row['time'].isoformat(),
+            'action': row['action'],
+            'is_pleasant': row['is_pleasant'],
+            'related_habit': row['related_habit_id'],
+            'periodicity': row['periodicity'],
+            'reward': row['reward'],
+            'time_for_action': row['time_for_action'],
+            'is_public': row['is_public'],
+        }
+
+
+PUBLIC_HABIT_VALUES = (
+    'id', 'user_id', 'user__first_name', 'user__last_name', 'user__email', 'place', 'time', 'action',
+    'is_pleasant', 'related_habit_id', 'periodicity', 'reward', 'time_for_action', 'is_public',
+)
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from django.utils import timezone
+
+from ..models import Habit
+from .completion_service import HabitCompletionService
+
+
+class BotHabitService:
+    """
+    Сервис, описывающий привычки для команд Telegram-бота.
+    Привычки пользователя выбираются по ID в Telegram одним запросом (индексы users_tg_id и habits.user_id),
+    в ответ попадают только поля, которые показывает бот.
+    """
+    fields = ('id', 'action', 'place', 'time')
+
+    @classmethod
+    def get_habits(cls, tg_id: int, today: bool = False) -> List[Dict[str, Any]]:
+        """
+        Возвращает привычки пользователя, отсортированные по времени выполнения.
+
+        :param tg_id: ID пользователя в Telegram.
+        :param today: Вернуть только привычки, которые выполняются сегодня (по часовому поясу пользователя).
+        """
+        rows = (Habit.objects.filter(user__tg_id=tg_id)
+                .order_by('time', 'id')
+                .values(*cls.fields, 'periodicity', 'next_reminder_at', 'user__timezone'))
+        moment = timezone.now()
+        return [
+            {'id': row['id'], 'action': row['action'], 'place': row['place'], 'time': row['time'].strftime('%H:%M')}
+            for row in rows
+            if not today or cls.is_scheduled_on_day(row, moment)
+        ]
+
+    @staticmethod
+    def is_scheduled_on_day(row: Dict[str, Any], moment: datetime) -> bool:
+        """
+        Проверяет, выполняется ли привычка в день moment по часовому поясу пользователя.
+        Дни выполнения - next_reminder_at плюс-минус целое число периодов, поэтому привычка,
+        напоминание о которой сегодня уже отправлено, тоже считается сегодняшней.
+
+        :param row: Строка привычки с полями periodicity, next_reminder_at и user__timezone.
+        :param moment: Момент времени, день которого проверяется.
+        """
+        if row['next_reminder_at'] is None:
+            return False
+        tz = ZoneInfo(row['user__timezone'])
+        days = (timezone.localtime(row['next_reminder_at'], tz).date() - timezone.localtime(moment, tz).date()).days
+        return days % max(row['periodicity'], 1) == 0
+
+    @staticmethod
+    def complete(tg_id: int, habit_id: int) -> Optional[datetime]:
+        """
+        Отмечает выполнение привычки пользователя. Возвращает время выполнения
+        или None, если у пользователя нет такой привычки.
+
+        :param tg_id: ID пользователя в Telegram.
+        :param habit_id: ID привычки.
+        """
+        user_id = Habit.objects.filter(id=habit_id, user__tg_id=tg_id).values_list('user_id', flat=True).first()
+        if user_id is None:
+            return None
+        return HabitCompletionService.record(habit_id, user_id)
@@ -0,0 +1,179 @@
+import io
+import logging
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from redis.exceptions import LockError, LockNotOwnedError
+
+from config.redis import get_redis
+from ..models import Habit
+from .stats_service import HabitStatsService
+
+logger = logging.getLogger(__name__)
+
+Completion = Tuple[uuid.UUID, int, int, datetime]
+
+
+class HabitCompletionService:
+    """
+    Сервис, описывающий запись отметок о выполнении привычек.
+
+    Отметка с уникальным ключом сначала попадает в список Redis buffer_key (один RPUSH, без обращения
+    к Postgres), а фоновая задача забирает буфер пачками: пачка копируется командой COPY во временную
+    таблицу и переносится в секционированную по месяцам таблицу habit_completions с ON CONFLICT DO NOTHING
+    по ключу отметки. Секции месяцев создаются при записи, в той же транзакции вставленные отметки
+    учитываются в статистике выполнений (HabitStatsService).
+
+    flush выполняется под блокировкой lock_key, чтобы пачки не записывали параллельно. Перед коммитом
+    блокировка продлевается (если она истекла, транзакция откатывается), а пачка удаляется из буфера
+    после коммита, только пока блокировка принадлежит обработчику. При сбое пачка записывается повторно,
+    но отметки не теряются и не дублируются ни в журнале, ни в статистике.
+    """
+    buffer_key = 'habits:completions'
+    lock_key = 'habits:completions:flush-lock'
+    lock_timeout = 60
+    known_partitions: Set[date] = set()
+
+    # Удаляет ARGV[2] элементов из начала буфера KEYS[2], если блокировка KEYS[1] принадлежит владельцу ARGV[1]
+    trim_script = """
+        if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+            return 0
+        end
+        redis.call('LTRIM', KEYS[2], tonumber(ARGV[2]), -1)
+        return 1
+    """
+
+    @classmethod
+    def record(cls, habit_id: int, user_id: int, completed_at: Optional[datetime] = None) -> datetime:
+        """
+        Добавляет отметку о выполнении привычки в буфер. Возвращает время выполнения.
+
+        :param habit_id: ID привычки.
+        :param user_id: ID владельца привычки.
+        :param completed_at: Время выполнения (по умолчанию - текущее).
+        """
+        completed_at = completed_at or timezone.now()
+        get_redis().rpush(cls.buffer_key, f'{uuid.uuid4()},{habit_id},{user_id},{completed_at.timestamp():.6f}')
+        return completed_at
+
+    @staticmethod
+    def parse(item: bytes) -> Completion:
+        """
+        Разбирает отметку из буфера. Отметкам, добавленным в буфер без ключа, ключ назначается
+        по содержимому, чтобы повторная запись их тоже не дублировала.
+
+        :param item: Строка "ключ,habit_id,user_id,unix-время".
+        """
+        fields = item.decode().split(',')
+        key = uuid.UUID(fields.pop(0)) if len(fields) == 4 else uuid.uuid5(uuid.NAMESPACE_OID, item.decode())
+        habit_id, user_id, timestamp = fields
+        return key, int(habit_id), int(user_id), datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+
+    @staticmethod
+    def get_month(moment: datetime) -> date:
+        """
+        Возвращает первый день месяца (по UTC), в секцию которого попадает момент времени.
+
+        :param moment: Момент времени.
+        """
+        moment = moment.astimezone(dt_timezone.utc)
+        return date(moment.year, moment.month, 1)
+
+    @staticmethod
+    def get_partition_name(month: date) -> str:
+        """
+        Возвращает имя секции таблицы habit_completions для месяца.
+
+        :param month: Первый день месяца.
+        """
+        return f'habit_completions_{month:%Y_%m}'
+
+    @classmethod
+    def ensure_partitions(cls, months: Iterable[date]) -> None:
+        """
+        Создает секции для месяцев, которых еще нет. Созданные секции запоминаются на время жизни процесса
+        после коммита транзакции, в которой они созданы.
+
+        :param months: Первые дни месяцев.
+        """
+        missing = sorted(set(months) - cls.known_partitions)
+        if not missing:
+            return
+        with connection.cursor() as cursor:
+            for month in missing:
+                next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS {cls.get_partition_name(month)} PARTITION OF habit_completions '
+                    f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') TO ('{next_month.isoformat()} 00:00+00')"
+                )
+        transaction.on_commit(lambda: cls.known_partitions.update(missing))
+
+    @classmethod
+    def write(cls, rows: List[Completion]) -> int:
+        """
+        Записывает отметки (COPY во временную таблицу и одна вставка из нее) и учитывает в статистике
+        выполнений только вставленные: отметки, уже записанные в журнал, и отметки удаленных привычек
+        пропускаются. Возвращает количество вставленных отметок.
+
+        :param rows: Четверки (ключ отметки, ID привычки, ID пользователя, время выполнения).
+        """
+        habits = {habit_id: (periodicity, tz) for habit_id, periodicity, tz in Habit.objects.filter(
+            id__in={row[1] for row in rows}).values_list('id', 'periodicity', 'user__timezone')}
+        rows = [row for row in rows if row[1] in habits]
+        if not rows:
+            return 0
+
+        cls.ensure_partitions(cls.get_month(completed_at) for *_, completed_at in rows)
+        data = io.StringIO(''.join(f'{key}\t{habit_id}\t{user_id}\t{completed_at.isoformat()}\n'
+                                   for key, habit_id, user_id, completed_at in rows))
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMP TABLE habit_completions_batch (key uuid, habit_id bigint, user_id bigint, '
+                           'completed_at timestamp with time zone) ON COMMIT DROP')
+            cursor.copy_expert('COPY habit_completions_batch FROM STDIN', data)
+            cursor.execute('INSERT INTO habit_completions (key, habit_id, user_id, completed_at) '
+                           'SELECT key, habit_id, user_id, completed_at FROM habit_completions_batch '
+                           'ON CONFLICT DO NOTHING RETURNING habit_id, user_id, completed_at')
+            inserted = cursor.fetchall()
+            cursor.execute('DROP TABLE habit_completions_batch')
+        if inserted:
+            HabitStatsService.apply(inserted, habits)
+        return len(inserted)
+
+    @classmethod
+    def flush(cls, batch_size: Optional[int] = None) -> int:
+        """
+        Записывает в БД одну пачку отметок из буфера и удаляет ее из буфера.
+        Возвращает количество отметок, забранных из буфера (0, если буфер пуст, его записывает
+        другой обработчик или блокировка истекла во время записи - тогда пачка остается в буфере).
+
+        :param batch_size: Максимальное количество отметок в пачке.
+        """
+        batch_size = batch_size or settings.HABIT_COMPLETIONS_BATCH_SIZE
+        redis = get_redis()
+        lock = redis.lock(cls.lock_key, timeout=cls.lock_timeout, blocking=False)
+        if not lock.acquire():
+            return 0
+        try:
+            items = redis.lrange(cls.buffer_key, 0, batch_size - 1)
+            if not items:
+                return 0
+            with transaction.atomic():
+                written = cls.write([cls.parse(item) for item in items])
+                lock.reacquire()
+            if not redis.eval(cls.trim_script, 2, cls.lock_key, cls.buffer_key, lock.local.token, len(items)):
+                raise LockNotOwnedError('Блокировка записи буфера истекла после коммита')
+        except LockNotOwnedError as exc:
+            logger.warning(f'Пачка отметок о выполнении привычек осталась в буфере: {exc}')
+            return 0
+        finally:
+            try:
+                lock.release()
+            except LockError:
+                pass
+
+        logger.info(f'Записано отметок о выполнении привычек: {written} из {len(items)}')
+        return len(items)
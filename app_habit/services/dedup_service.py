@@ -0,0 +1,87 @@
+import logging
+from typing import List
+
+from django.conf import settings
+
+from config.redis import get_redis
+from .metrics_service import MetricsService
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderDedupService:
+    """
+    Сервис, защищающий от повторной отправки напоминаний.
+
+    Перед отправкой для каждой пары (привычка, слот расписания) в Redis ставится ключ
+    с TTL. Если ключ уже есть, напоминание в этот слот уже отправлялось (например, после
+    перезапуска beat или повторной доставки задачи) и отбрасывается до обращения к БД и Telegram.
+    Если отправить напоминание не удалось, ключ удаляется, чтобы повторная доставка его отправила.
+    """
+    key_prefix = 'reminders:sent'
+    hits_metric = 'reminders.dedup_hits'
+
+    @classmethod
+    def get_key(cls, habit_id: int, slot: int) -> str:
+        """
+        Возвращает ключ Redis для пары (привычка, слот).
+
+        :param habit_id: ID привычки.
+        :param slot: Слот расписания (unix-время минуты, на которую запланировано напоминание).
+        """
+        return f'{cls.key_prefix}:{habit_id}:{slot}'
+
+    @classmethod
+    def filter_sent(cls, habit_ids: List[int], slot: int) -> List[int]:
+        """
+        Возвращает ID привычек, напоминания о которых в этот слот еще не отправлялись, не отмечая их.
+        Позволяет отбросить повторы до обращения к БД, сами напоминания отмечаются перед отправкой (claim).
+
+        :param habit_ids: Список ID привычек.
+        :param slot: Слот расписания (unix-время минуты, на которую запланировано напоминание).
+        """
+        pipeline = get_redis().pipeline(transaction=False)
+        for habit_id in habit_ids:
+            pipeline.exists(cls.get_key(habit_id, slot))
+        not_sent = [habit_id for habit_id, exists in zip(habit_ids, pipeline.execute()) if not exists]
+        cls.count_hits(len(habit_ids) - len(not_sent), slot)
+        return not_sent
+
+    @classmethod
+    def claim(cls, habit_ids: List[int], slot: int) -> List[int]:
+        """
+        Отмечает напоминания как отправляемые и возвращает ID привычек,
+        напоминания о которых в этот слот еще не отправлялись.
+
+        :param habit_ids: Список ID привычек.
+        :param slot: Слот расписания (unix-время минуты, на которую запланировано напоминание).
+        """
+        pipeline = get_redis().pipeline(transaction=False)
+        for habit_id in habit_ids:
+            pipeline.set(cls.get_key(habit_id, slot), 1, nx=True, ex=settings.REMINDER_DEDUP_TTL)
+        claimed = [habit_id for habit_id, is_new in zip(habit_ids, pipeline.execute()) if is_new]
+        cls.count_hits(len(habit_ids) - len(claimed), slot)
+        return claimed
+
+    @classmethod
+    def release(cls, habit_ids: List[int], slot: int) -> None:
+        """
+        Снимает отметку с напоминаний, которые не удалось отправить.
+
+        :param habit_ids: Список ID привычек.
+        :param slot: Слот расписания (unix-время минуты, на которую запланировано напоминание).
+        """
+        if habit_ids:
+            get_redis().delete(*(cls.get_key(habit_id, slot) for habit_id in habit_ids))
+
+    @classmethod
+    def count_hits(cls, hits: int, slot: int) -> None:
+        """
+        Учитывает отброшенные повторы в метрике.
+
+        :param hits: Количество отброшенных напоминаний.
+        :param slot: Слот расписания.
+        """
+        if hits:
+            MetricsService.increment(cls.hits_metric, hits)
+            logger.info(f'Пропущено повторных напоминаний для слота {slot}: {hits}')
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from redis import asyncio as aioredis
+from redis.exceptions import LockError
+
+from config.redis import get_redis
+from .dedup_service import ReminderDedupService
+from .reminder_service import ReminderService
+from .telegram_service import TelegramRateLimiter, TelegramService, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDeliveryService:
+    """
+    Сервис асинхронной доставки напоминаний.
+
+    Диспетчер складывает ID привычек со слотом расписания в очередь Redis, а сервис забирает их пачками,
+    отбрасывает повторы и отправляет напоминания через одну aiohttp-сессию, держа одновременно
+    в работе до concurrency запросов к Telegram.
+
+    Очередь обрабатывает один потребитель (блокировка lock_key продлевается, пока он работает),
+    поэтому лимиты Telegram соблюдает один TelegramRateLimiter. Пачка атомарно переносится из очереди
+    в список processing_key, а каждое напоминание удаляется из него после отправки (с неотправленного
+    снимается отметка ReminderDedupService). При запуске напоминания, оставшиеся в processing_key после
+    сбоя, возвращаются в начало очереди, и отметки с них снимаются: напоминания не теряются,
+    а повторно может уйти только сообщение, отправка которого прервалась сбоем.
+    """
+    queue_key = 'reminders:queue'
+    processing_key = 'reminders:processing'
+    lock_key = 'reminders:delivery-lock'
+    lock_timeout = 30
+    block_timeout = 5
+
+    # Переносит до ARGV[1] элементов из начала очереди KEYS[1] в конец списка KEYS[2]
+    move_batch_script = """
+        local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+        if #items > 0 then
+            redis.call('LTRIM', KEYS[1], #items, -1)
+            redis.call('RPUSH', KEYS[2], unpack(items))
+        end
+        return items
+    """
+    # Возвращает все элементы списка KEYS[2] в начало очереди KEYS[1], сохраняя порядок
+    restore_script = """
+        local items = redis.call('LRANGE', KEYS[2], 0, -1)
+        for i = #items, 1, -1 do
+            redis.call('LPUSH', KEYS[1], items[i])
+        end
+        redis.call('DEL', KEYS[2])
+        return items
+    """
+
+    def __init__(self, concurrency: int = None, batch_size: int = None) -> None:
+        """
+        Инициализация сервиса.
+        :param concurrency: Максимальное число одновременных запросов к Telegram.
+        :param batch_size: Количество ID привычек, забираемых из очереди за раз.
+        """
+        self.concurrency = concurrency or settings.REMINDER_DELIVERY_CONCURRENCY
+        self.batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+        self.url = TelegramService.get_send_message_url()
+        self.rate_limiter = TelegramRateLimiter()
+        self.sent = 0
+
+    @classmethod
+    def enqueue(cls, habit_ids: List[int], slot: int) -> None:
+        """
+        Добавляет напоминания в очередь доставки.
+
+        :param habit_ids: Список ID привычек, напоминания о которых нужно отправить.
+        :param slot: Слот расписания (unix-время минуты, на которую запланированы напоминания).
+        """
+        if habit_ids:
+            get_redis().rpush(cls.queue_key, *(f'{habit_id}:{slot}' for habit_id in habit_ids))
+
+    @staticmethod
+    def parse(item: bytes) -> Tuple[int, int]:
+        """
+        Разбирает элемент очереди. Возвращает ID привычки и слот расписания.
+
+        :param item: Строка "habit_id:slot".
+        """
+        habit_id, slot = item.split(b':')
+        return int(habit_id), int(slot)
+
+    async def pop_batch(self, redis_client: aioredis.Redis, block: bool) -> List[Tuple[int, int]]:
+        """
+        Переносит из очереди в список processing_key пачку пар (ID привычки, слот расписания) и возвращает ее.
+        Если очередь пуста и block=True, ждет появления новых напоминаний не дольше block_timeout секунд.
+
+        :param redis_client: Асинхронный клиент Redis.
+        :param block: Ждать ли появления напоминаний в пустой очереди.
+        """
+        items = await redis_client.eval(self.move_batch_script, 2, self.queue_key, self.processing_key,
+                                        self.batch_size)
+        if not items and block:
+            item = await redis_client.blmove(self.queue_key, self.processing_key, self.block_timeout, 'LEFT', 'RIGHT')
+            items = [item] if item else []
+        return [self.parse(item) for item in items]
+
+    async def ack(self, redis_client: aioredis.Redis, entries: List[Tuple[int, int]]) -> None:
+        """
+        Удаляет обработанные напоминания из списка processing_key.
+
+        :param redis_client: Асинхронный клиент Redis.
+        :param entries: Пары (ID привычки, слот расписания).
+        """
+        if entries:
+            pipeline = redis_client.pipeline(transaction=False)
+            for habit_id, slot in entries:
+                pipeline.lrem(self.processing_key, 1, f'{habit_id}:{slot}')
+            await pipeline.execute()
+
+    async def restore(self, redis_client: aioredis.Redis) -> int:
+        """
+        Возвращает в начало очереди напоминания, оставшиеся в processing_key после сбоя,
+        и снимает с них отметки об отправке. Возвращает количество напоминаний.
+
+        :param redis_client: Асинхронный клиент Redis.
+        """
+        entries = [self.parse(item) for item in
+                   await redis_client.eval(self.restore_script, 2, self.queue_key, self.processing_key)]
+        habit_ids_by_slot = defaultdict(list)
+        for habit_id, slot in entries:
+            habit_ids_by_slot[slot].append(habit_id)
+        for slot, habit_ids in habit_ids_by_slot.items():
+            await sync_to_async(ReminderDedupService.release)(habit_ids, slot)
+        if entries:
+            logger.warning(f'Возвращено в очередь неподтвержденных напоминаний: {len(entries)}')
+        return len(entries)
+
+    @staticmethod
+    def prepare_messages(entries: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """
+        Отбрасывает уже отправленные напоминания и возвращает остальные
+        (напоминания из ReminderService.build_payloads со слотом расписания).
+
+        :param entries: Пары (ID привычки, слот расписания).
+        """
+        habit_ids_by_slot = defaultdict(list)
+        for habit_id, slot in entries:
+            habit_ids_by_slot[slot].append(habit_id)
+
+        payloads = []
+        for slot, slot_habit_ids in habit_ids_by_slot.items():
+            habit_ids = ReminderDedupService.claim(slot_habit_ids, slot)
+            if habit_ids:
+                payloads.extend(dict(payload, slot=slot) for payload in ReminderService.build_payloads(habit_ids))
+        return payloads
+
+    async def deliver(self, session: aiohttp.ClientSession, redis_client: aioredis.Redis,
+                      payload: Dict[str, Any]) -> bool:
+        """
+        Отправляет напоминание и удаляет его из списка processing_key.
+        Если отправить не удалось, снимает с напоминания отметку об отправке.
+        Возвращает True, если сообщение доставлено.
+
+        :param session: Общая aiohttp-сессия.
+        :param redis_client: Асинхронный клиент Redis.
+        :param payload: Напоминание со слотом расписания.
+        """
+        sent = await self.send_message(session, payload['tg_id'], payload['message'])
+        if not sent:
+            await sync_to_async(ReminderDedupService.release)([payload['habit_id']], payload['slot'])
+        await self.ack(redis_client, [(payload['habit_id'], payload['slot'])])
+        return sent
+
+    async def send_message(self, session: aiohttp.ClientSession, chat_id: int, text: str) -> bool:
+        """
+        Отправляет сообщение в чат с учетом лимитов Telegram и повторами при ошибках 429 и 5xx.
+        Возвращает True, если сообщение доставлено.
+
+        :param session: Общая aiohttp-сессия.
+        :param chat_id: ID чата в Telegram.
+        :param text: Текст сообщения.
+        """
+        data = {'chat_id': chat_id, 'text': text}
+
+        for attempt in range(settings.TELEGRAM_MAX_RETRIES + 1):
+            delay = self.rate_limiter.reserve(chat_id)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            backoff = settings.TELEGRAM_RETRY_BACKOFF * 2 ** attempt
+            try:
+                async with session.post(self.url, data=data) as response:
+                    if response.status == 200:
+                        return True
+                    if response.status == 429:
+                        try:
+                            payload = await response.json(content_type=None)
+                        except ValueError:
+                            payload = None
+                        await asyncio.sleep(parse_retry_after(payload, response.headers, backoff))
+                        continue
+                    if response.status >= 500:
+                        await asyncio.sleep(backoff)
+                        continue
+                    logger.warning(f'Telegram отклонил сообщение для чата {chat_id}: {response.status}')
+                    return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                logger.warning(f'Ошибка соединения с Telegram для чата {chat_id}: {error!r}')
+                await asyncio.sleep(backoff)
+
+        logger.error(f'Не удалось отправить сообщение в чат {chat_id}')
+        return False
+
+    async def keep_lock(self, lock: Any) -> None:
+        """
+        Продлевает блокировку потребителя, пока он работает.
+
+        :param lock: Блокировка Redis.
+        """
+        while True:
+            await asyncio.sleep(self.lock_timeout / 3)
+            await lock.reacquire()
+
+    async def run(self, drain: bool = False) -> int:
+        """
+        Забирает напоминания из очереди и отправляет их.
+        Возвращает количество доставленных сообщений.
+
+        :param drain: Если True, завершает работу, как только очередь опустеет
+                      (или сразу, если очередь обрабатывает другой потребитель).
+                      Иначе ждет своей очереди и работает, пока задачу не отменят.
+        """
+        redis_client = aioredis.from_url(settings.REDIS_URL)
+        lock = redis_client.lock(self.lock_key, timeout=self.lock_timeout)
+        try:
+            if not await lock.acquire(blocking=not drain):
+                logger.info('Очередь напоминаний обрабатывает другой потребитель')
+                return self.sent
+            keeper = asyncio.create_task(self.keep_lock(lock))
+            try:
+                await self.restore(redis_client)
+                await self.process(redis_client, drain)
+            finally:
+                keeper.cancel()
+                try:
+                    await lock.release()
+                except LockError:
+                    pass
+        finally:
+            await redis_client.close()
+        return self.sent
+
+    async def process(self, redis_client: aioredis.Redis, drain: bool) -> None:
+        """
+        Отправляет напоминания из очереди, держа в работе до concurrency запросов.
+
+        :param redis_client: Асинхронный клиент Redis.
+        :param drain: Завершить работу, как только очередь опустеет.
+        """
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=settings.TELEGRAM_REQUEST_TIMEOUT)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        in_flight: Set[asyncio.Task] = set()
+
+        def on_done(task: asyncio.Task) -> None:
+            in_flight.discard(task)
+            semaphore.release()
+            if not task.cancelled() and task.exception() is None and task.result():
+                self.sent += 1
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            while True:
+                entries = await self.pop_batch(redis_client, block=not drain)
+                if not entries:
+                    if drain:
+                        break
+                    continue
+                payloads = await sync_to_async(self.prepare_messages)(entries)
+                skipped = Counter(entries)
+                skipped.subtract((payload['habit_id'], payload['slot']) for payload in payloads)
+                await self.ack(redis_client, list(skipped.elements()))
+                for payload in payloads:
+                    await semaphore.acquire()
+                    task = asyncio.create_task(self.deliver(session, redis_client, payload))
+                    in_flight.add(task)
+                    task.add_done_callback(on_done)
+            if in_flight:
+                await asyncio.gather(*in_flight)
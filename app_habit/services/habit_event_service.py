@@ -0,0 +1,83 @@
+import logging
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+
+from config.redis import get_redis
+from ..models import Habit, HabitEvent
+
+logger = logging.getLogger(__name__)
+
+
+class HabitEventService:
+    """
+    Сервис, описывающий события изменения привычек (transactional outbox).
+
+    Запись привычки добавляет в таблицу habit_events по одному событию на привычку
+    в той же транзакции, поэтому событие не теряется и не появляется без изменения.
+    Фоновая задача забирает события пачками, схлопывает повторные изменения одной привычки
+    и публикует время следующего напоминания привычек в поток Redis stream_key,
+    из которого его читает планировщик напоминаний.
+    """
+    stream_key = 'habits:changes'
+    stream_maxlen = 100000
+    upsert = 'upsert'
+    delete = 'delete'
+
+    @staticmethod
+    def record(habit_ids: Iterable[int]) -> None:
+        """
+        Записывает события изменения привычек одним запросом.
+        Вызывается в транзакции, изменяющей привычки.
+
+        :param habit_ids: ID измененных, созданных или удаленных привычек.
+        """
+        HabitEvent.objects.bulk_create([HabitEvent(habit_id=habit_id) for habit_id in habit_ids])
+
+    @classmethod
+    def process(cls, batch_size: int = None) -> int:
+        """
+        Обрабатывает пачку событий: публикует в поток Redis по одному сообщению
+        на каждую измененную привычку и удаляет обработанные события.
+        Параллельные обработчики пропускают события, заблокированные друг другом.
+        Возвращает количество обработанных событий.
+
+        :param batch_size: Максимальное количество событий в пачке.
+        """
+        batch_size = batch_size or settings.HABIT_EVENTS_BATCH_SIZE
+        with transaction.atomic():
+            events = list(
+                HabitEvent.objects.select_for_update(skip_locked=True)
+                .order_by('id').values_list('id', 'habit_id')[:batch_size]
+            )
+            if not events:
+                return 0
+
+            habit_ids = {habit_id for _, habit_id in events}
+            cls.publish(habit_ids)
+            HabitEvent.objects.filter(id__in=[event_id for event_id, _ in events]).delete()
+
+        logger.info(f'Обработано событий изменения привычек: {len(events)}, привычек: {len(habit_ids)}')
+        return len(events)
+
+    @classmethod
+    def publish(cls, habit_ids: Iterable[int]) -> None:
+        """
+        Публикует в поток Redis актуальное состояние привычек.
+        Для существующих привычек публикуется время следующего напоминания (unix-время),
+        для удаленных - только признак удаления.
+
+        :param habit_ids: ID привычек.
+        """
+        next_reminders = dict(Habit.objects.filter(id__in=habit_ids).values_list('id', 'next_reminder_at'))
+        pipeline = get_redis().pipeline(transaction=False)
+        for habit_id in sorted(habit_ids):
+            if habit_id not in next_reminders:
+                fields = {'op': cls.delete, 'habit_id': habit_id}
+            else:
+                next_reminder_at = next_reminders[habit_id]
+                fields = {'op': cls.upsert, 'habit_id': habit_id,
+                          'next_reminder_at': int(next_reminder_at.timestamp()) if next_reminder_at else ''}
+            pipeline.xadd(cls.stream_key, fields, maxlen=cls.stream_maxlen, approximate=True)
+        pipeline.execute()
@@ -0,0 +1,28 @@
+from config.redis import get_redis
+
+
+class MetricsService:
+    """
+    Сервис, описывающий счетчики метрик.
+    Счетчики хранятся в хеше Redis и общие для всех процессов.
+    """
+    key = 'metrics'
+
+    @classmethod
+    def increment(cls, name: str, amount: int = 1) -> None:
+        """
+        Увеличивает счетчик метрики.
+
+        :param name: Название метрики.
+        :param amount: Величина, на которую увеличивается счетчик.
+        """
+        get_redis().hincrby(cls.key, name, amount)
+
+    @classmethod
+    def get(cls, name: str) -> int:
+        """
+        Возвращает текущее значение счетчика метрики.
+
+        :param name: Название метрики.
+        """
+        return int(get_redis().hget(cls.key, name) or 0)
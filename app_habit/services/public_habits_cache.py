@@ -0,0 +1,78 @@
+import hashlib
+import math
+import time
+import uuid
+from typing import Any, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class PublicHabitsCacheService:
+    """
+    Сервис, описывающий кеш ленты публичных привычек.
+
+    Страницы ленты кешируются под ключом с текущей версией ленты. При изменении
+    публичной привычки версия меняется, и все закешированные страницы перестают
+    использоваться (а затем удаляются по TTL). Версия также служит ETag,
+    а время ее смены - Last-Modified. Last-Modified передается с точностью до секунды,
+    поэтому время смены округляется вверх и строго растет: клиент, получивший ленту
+    в ту же секунду, что и предыдущее изменение, не получит 304 после следующего.
+    """
+    state_key = 'public_habits:state'
+    page_key_prefix = 'public_habits:page'
+
+    @classmethod
+    def get_state(cls) -> Tuple[str, int]:
+        """
+        Возвращает текущую версию ленты и время ее последнего изменения (unix-время).
+        """
+        state = cache.get(cls.state_key)
+        if state is None:
+            state = cls.invalidate()
+        return state
+
+    @classmethod
+    def invalidate(cls) -> Tuple[str, int]:
+        """
+        Меняет версию ленты, делая все закешированные страницы устаревшими.
+        Возвращает новую версию и время изменения.
+        """
+        previous = cache.get(cls.state_key)
+        last_modified = math.ceil(time.time())
+        if previous is not None:
+            last_modified = max(last_modified, previous[1] + 1)
+        state = (uuid.uuid4().hex, last_modified)
+        cache.set(cls.state_key, state, timeout=None)
+        return state
+
+    @classmethod
+    def get_page_key(cls, version: str, url: str) -> str:
+        """
+        Возвращает ключ кеша для страницы ленты.
+
+        :param version: Версия ленты.
+        :param url: Абсолютный URL запроса (страница содержит абсолютные ссылки next/previous).
+        """
+        return f'{cls.page_key_prefix}:{version}:{hashlib.md5(url.encode()).hexdigest()}'
+
+    @classmethod
+    def get_page(cls, version: str, url: str) -> Optional[Any]:
+        """
+        Возвращает закешированные данные страницы ленты или None.
+
+        :param version: Версия ленты.
+        :param url: Абсолютный URL запроса.
+        """
+        return cache.get(cls.get_page_key(version, url))
+
+    @classmethod
+    def set_page(cls, version: str, url: str, data: Any) -> None:
+        """
+        Сохраняет данные страницы ленты в кеш на PUBLIC_HABITS_CACHE_TIMEOUT секунд.
+
+        :param version: Версия ленты.
+        :param url: Абсолютный URL запроса.
+        :param data: Сериализованные данные страницы.
+        """
+        cache.set(cls.get_page_key(version, url), data, timeout=settings.PUBLIC_HABITS_CACHE_TIMEOUT)
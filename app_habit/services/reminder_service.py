@@ -0,0 +1,189 @@
+from datetime import datetime, time, timedelta, tzinfo
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from app_habit.models import Habit
+from app_user.models import CustomUser
+from .habit_event_service import HabitEventService
+
+
+class ReminderService:
+    """
+    Сервис, описывающий напоминания о привычках.
+
+    У каждой привычки хранится время следующего напоминания next_reminder_at (в UTC),
+    посчитанное по часовому поясу пользователя. Раз в минуту выбираются привычки всех часовых поясов,
+    у которых это время наступило (один проход по индексу next_reminder_at), время напоминания
+    сдвигается на периодичность привычки, а сами напоминания раздаются воркерам пачками.
+    """
+
+    @staticmethod
+    def get_following_reminder_at(reminder_at: datetime, habit_time: time, periodicity: int, moment: datetime,
+                                  tz: Optional[tzinfo] = None) -> datetime:
+        """
+        Возвращает первое после moment напоминание из ряда "время привычки через каждые periodicity дней
+        после reminder_at". Дни отсчитываются по часовому поясу пользователя, поэтому при переводе часов
+        меняется только UTC-время следующего напоминания, а местное время остается прежним.
+
+        :param reminder_at: Время наступившего напоминания.
+        :param habit_time: Время выполнения привычки.
+        :param periodicity: Периодичность привычки в днях.
+        :param moment: Момент времени, после которого должно быть следующее напоминание.
+        :param tz: Часовой пояс пользователя (по умолчанию - TIME_ZONE).
+        """
+        periodicity = max(periodicity, 1)
+        reminder_day = timezone.localtime(reminder_at, tz).date()
+        elapsed_days = (timezone.localtime(moment, tz).date() - reminder_day).days
+        periods = max(elapsed_days // periodicity, 1)
+        while True:
+            following = Habit.get_reminder_at(reminder_day + timedelta(days=periods * periodicity), habit_time, tz)
+            if following > moment:
+                return following
+            periods += 1
+
+    @staticmethod
+    def get_due_habits(moment: datetime) -> QuerySet:
+        """
+        Возвращает QuerySet привычек, время напоминания о которых наступило к моменту moment.
+        Запрос использует индекс по полю next_reminder_at.
+
+        :param moment: Момент времени, для которого выбираются привычки.
+        """
+        return Habit.objects.filter(next_reminder_at__lte=moment).order_by('next_reminder_at', 'id')
+
+    @classmethod
+    def claim_due_batch(cls, moment: datetime,
+                        habit_ids: Optional[List[int]] = None) -> List[Tuple[int, datetime, datetime]]:
+        """
+        Забирает пачку привычек (не больше REMINDER_BATCH_SIZE), время напоминания о которых наступило,
+        и одним запросом сдвигает их next_reminder_at на следующее напоминание по часовому поясу владельца.
+        Строки привычек блокируются до конца транзакции, параллельные диспетчеры пропускают чужие пачки.
+        Возвращает тройки (ID привычки, время наступившего напоминания, время следующего напоминания).
+
+        :param moment: Момент времени, для которого выбираются привычки.
+        :param habit_ids: Если передан, выбираются только привычки из этого списка.
+        """
+        habits = cls.get_due_habits(moment).select_for_update(skip_locked=True, of=('self',))
+        if habit_ids is not None:
+            habits = habits.filter(id__in=habit_ids)
+
+        with transaction.atomic():
+            rows = habits.values_list('id', 'next_reminder_at', 'time', 'periodicity', 'user__timezone')
+            claimed = []
+            for habit_id, reminder_at, habit_time, periodicity, tz_name in rows[:settings.REMINDER_BATCH_SIZE]:
+                next_reminder_at = cls.get_following_reminder_at(reminder_at, habit_time, periodicity, moment,
+                                                                 ZoneInfo(tz_name))
+                claimed.append((habit_id, reminder_at, next_reminder_at))
+            Habit.objects.bulk_update([Habit(id=habit_id, next_reminder_at=next_reminder_at)
+                                       for habit_id, _, next_reminder_at in claimed], ['next_reminder_at'])
+        return claimed
+
+    @staticmethod
+    def reschedule_user_habits(user: CustomUser) -> int:
+        """
+        Пересчитывает время следующего напоминания привычек пользователя после смены часового пояса
+        и записывает события изменения привычек для планировщика. Затрагивает только привычки пользователя.
+        Вызывается в транзакции, изменяющей пользователя. Возвращает количество привычек.
+
+        :param user: Пользователь с новым часовым поясом.
+        """
+        habits = list(Habit.objects.filter(user=user).only('id', 'time'))
+        tz = user.get_timezone()
+        moment = timezone.now()
+        for habit in habits:
+            habit.next_reminder_at = Habit.get_first_reminder_at(habit.time, moment, tz)
+        Habit.objects.bulk_update(habits, ['next_reminder_at'], batch_size=1000)
+        HabitEventService.record(habit.id for habit in habits)
+        return len(habits)
+
+    @staticmethod
+    def group_by_slot(claimed: List[Tuple[int, datetime, datetime]], moment: datetime,
+                      catch_up_minutes: Optional[int] = None) -> Dict[int, List[int]]:
+        """
+        Группирует наступившие напоминания по слотам расписания (unix-время минуты напоминания).
+        Напоминания, опоздавшие больше чем на catch_up_minutes (например, после простоя), пропускаются.
+
+        :param claimed: Тройки из claim_due_batch.
+        :param moment: Текущий момент времени.
+        :param catch_up_minutes: Допустимое опоздание в минутах (по умолчанию REMINDER_CATCH_UP_MINUTES).
+        """
+        if catch_up_minutes is None:
+            catch_up_minutes = settings.REMINDER_CATCH_UP_MINUTES
+        oldest = moment - timedelta(minutes=catch_up_minutes)
+        habit_ids_by_slot = {}
+        for habit_id, reminder_at, _ in claimed:
+            if reminder_at >= oldest:
+                habit_ids_by_slot.setdefault(int(reminder_at.timestamp()), []).append(habit_id)
+        return habit_ids_by_slot
+
+    @classmethod
+    def iter_due_batches(cls, moment: datetime) -> Iterator[Tuple[int, List[int]]]:
+        """
+        Возвращает генератор пар (слот расписания, пачка ID привычек) для всех привычек,
+        время напоминания о которых наступило к моменту moment. Каждая пачка забирается
+        и сдвигается отдельной транзакцией claim_due_batch.
+
+        :param moment: Момент времени, для которого выбираются привычки.
+        """
+        while True:
+            claimed = cls.claim_due_batch(moment)
+            yield from cls.group_by_slot(claimed, moment).items()
+            if len(claimed) < settings.REMINDER_BATCH_SIZE:
+                return
+
+    @staticmethod
+    def build_message(action: str, place: str, related_action: Optional[str], reward: Optional[str]) -> str:
+        """
+        Формирует текст напоминания о привычке.
+
+        :param action: Действие привычки.
+        :param place: Место выполнения привычки.
+        :param related_action: Действие связанной приятной привычки.
+        :param reward: Вознаграждение.
+        """
+        message = (f"⏰ Пора выполнить привычку: {action}\n"
+                   f"📍 {place}\n")
+
+        if related_action:
+            message += f"После этого ты сможешь {related_action} 🙂\n"
+
+        if reward:
+            message += f" 🎁 Твое вознаграждение: {reward}"
+
+        return message
+
+    @classmethod
+    def build_payloads(cls, habit_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Возвращает готовые к отправке напоминания для пачки привычек.
+        Все данные выбираются одним запросом, привычки пользователей без Telegram пропускаются.
+
+        :param habit_ids: Список ID привычек.
+        """
+        rows = Habit.objects.filter(
+            id__in=habit_ids,
+            user__tg_id__isnull=False,
+        ).order_by('id').values('id', 'action', 'place', 'reward', 'user__tg_id', 'related_habit__action')
+
+        return [
+            {
+                'habit_id': row['id'],
+                'tg_id': row['user__tg_id'],
+                'message': cls.build_message(row['action'], row['place'], row['related_habit__action'], row['reward']),
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    def build_messages(cls, habit_ids: List[int]) -> List[Tuple[int, str]]:
+        """
+        Возвращает список пар (ID пользователя в Telegram, текст напоминания) для пачки привычек.
+
+        :param habit_ids: Список ID привычек.
+        """
+        return [(payload['tg_id'], payload['message']) for payload in cls.build_payloads(habit_ids)]
@@ -0,0 +1,172 @@
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from config.redis import get_redis
+from ..models import Habit
+from ..tasks import enqueue_reminders
+from .habit_event_service import HabitEventService
+from .reminder_service import ReminderService
+from .timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний на колесе таймеров.
+
+    При запуске загружает все привычки в TimingWheel по времени следующего напоминания
+    (next_reminder_at), затем в цикле читает изменения привычек из потока Redis
+    HabitEventService.stream_key и раз в минуту ставит сработавшие напоминания в очередь доставки
+    пачками, сдвигая next_reminder_at в БД так же, как диспетчер celery beat.
+    Напоминания, пропущенные за время простоя, срабатывают сразу после запуска,
+    если опоздали не больше чем на catch_up_minutes.
+    """
+    read_count = 1000
+
+    def __init__(self, catch_up_minutes: Optional[int] = None) -> None:
+        """
+        Инициализация планировщика.
+        :param catch_up_minutes: На сколько минут может опоздать напоминание, пропущенное
+                                 за время простоя (0 - не отправлять пропущенные напоминания).
+        """
+        self.catch_up_minutes = (settings.REMINDER_CATCH_UP_MINUTES
+                                 if catch_up_minutes is None else catch_up_minutes)
+        self.wheel: Optional[TimingWheel] = None
+        self.stream_id = '0-0'
+
+    @staticmethod
+    def to_minute(moment: datetime) -> int:
+        """
+        Возвращает номер минуты (unix-время // 60) для момента времени.
+
+        :param moment: Момент времени.
+        """
+        return int(moment.timestamp()) // 60
+
+    @staticmethod
+    def from_minute(minute: int) -> datetime:
+        """
+        Возвращает момент времени начала минуты.
+
+        :param minute: Номер минуты (unix-время // 60).
+        """
+        return timezone.localtime(datetime.fromtimestamp(minute * 60, tz=dt_timezone.utc))
+
+    def load(self, current_minute: int) -> None:
+        """
+        Загружает все привычки в колесо таймеров.
+        Позиция в потоке изменений запоминается до чтения привычек,
+        поэтому изменения, сделанные во время загрузки, не теряются.
+
+        :param current_minute: Последняя обработанная минута. Более ранние напоминания
+                               срабатывают при первом сдвиге колеса.
+        """
+        last_messages = get_redis().xrevrange(HabitEventService.stream_key, count=1)
+        self.stream_id = last_messages[0][0] if last_messages else '0-0'
+        self.wheel = TimingWheel(current_minute)
+
+        habits = (Habit.objects.filter(next_reminder_at__isnull=False)
+                  .values_list('id', 'next_reminder_at').iterator(chunk_size=10000))
+        for habit_id, next_reminder_at in habits:
+            self.wheel.add(habit_id, self.to_minute(next_reminder_at))
+        logger.info(f'Загружено привычек в планировщик: {len(self.wheel)}')
+
+    def apply_changes(self, block_ms: Optional[int] = None) -> int:
+        """
+        Читает изменения привычек из потока Redis и обновляет таймеры.
+        Возвращает количество прочитанных сообщений.
+
+        :param block_ms: Сколько миллисекунд ждать новых сообщений, если их нет (None - не ждать).
+        """
+        response = get_redis().xread({HabitEventService.stream_key: self.stream_id},
+                                     count=self.read_count, block=block_ms)
+        if not response:
+            return 0
+
+        messages = response[0][1]
+        for message_id, fields in messages:
+            habit_id = int(fields[b'habit_id'])
+            next_reminder_at = fields.get(b'next_reminder_at')
+            if fields[b'op'].decode() == HabitEventService.upsert and next_reminder_at:
+                self.wheel.add(habit_id, int(next_reminder_at) // 60)
+            else:
+                self.wheel.remove(habit_id)
+            self.stream_id = message_id
+        return len(messages)
+
+    def reload(self, habit_ids: Iterable[int]) -> None:
+        """
+        Переставляет таймеры привычек по next_reminder_at из БД.
+        Нужно для привычек, которые сработали в колесе, но в БД уже перенесены
+        (изменение еще не дошло через поток) или заблокированы другим диспетчером.
+
+        :param habit_ids: ID привычек.
+        """
+        habit_ids = list(habit_ids)
+        next_reminders = dict(Habit.objects.filter(id__in=habit_ids).values_list('id', 'next_reminder_at'))
+        for habit_id in habit_ids:
+            next_reminder_at = next_reminders.get(habit_id)
+            if next_reminder_at is None:
+                self.wheel.remove(habit_id)
+            else:
+                self.wheel.add(habit_id, self.to_minute(next_reminder_at))
+
+    def dispatch(self, habit_ids: List[int], moment: datetime) -> int:
+        """
+        Забирает сработавшие привычки в БД, ставит напоминания в очередь доставки
+        и переставляет таймеры на следующие напоминания.
+        Возвращает количество поставленных в очередь напоминаний.
+
+        :param habit_ids: ID сработавших привычек.
+        :param moment: Текущий момент времени.
+        """
+        dispatched = 0
+        batch_size = settings.REMINDER_BATCH_SIZE
+        for i in range(0, len(habit_ids), batch_size):
+            batch = habit_ids[i:i + batch_size]
+            claimed = ReminderService.claim_due_batch(moment, habit_ids=batch)
+            dispatched += enqueue_reminders(
+                ReminderService.group_by_slot(claimed, moment, self.catch_up_minutes).items()
+            )
+            for habit_id, _, next_reminder_at in claimed:
+                self.wheel.add(habit_id, self.to_minute(next_reminder_at))
+
+            claimed_ids = {habit_id for habit_id, _, _ in claimed}
+            unclaimed_ids = [habit_id for habit_id in batch if habit_id not in claimed_ids]
+            if unclaimed_ids:
+                self.reload(unclaimed_ids)
+        return dispatched
+
+    def tick(self, now_minute: int) -> int:
+        """
+        Сдвигает колесо до текущей минуты и ставит сработавшие напоминания в очередь доставки.
+        Возвращает количество поставленных в очередь напоминаний.
+
+        :param now_minute: Текущая минута.
+        """
+        moment = self.from_minute(now_minute)
+        fired = [habit_id for _, habit_ids in self.wheel.advance(now_minute) for habit_id in habit_ids]
+        return self.dispatch(fired, moment) if fired else 0
+
+    def run(self) -> None:
+        """
+        Запускает планировщик: загружает привычки, отправляет пропущенные за время простоя
+        напоминания и дальше работает, пока процесс не остановят.
+        """
+        self.load(self.to_minute(timezone.now()) - 1)
+
+        while True:
+            now = time.time()
+            now_minute = int(now) // 60
+            if now_minute > self.wheel.current:
+                dispatched = self.tick(now_minute)
+                if dispatched:
+                    logger.info(f'Поставлено в очередь напоминаний: {dispatched}')
+            wait_ms = int(((now_minute + 1) * 60 - now) * 1000)
+            self.apply_changes(block_ms=max(wait_ms, 1))
@@ -0,0 +1,176 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app_user.models import CustomUser
+from ..models import CompletionStats, HabitStats, UserStats
+
+DayCounts = Dict[int, Counter]
+
+
+class HabitStatsService:
+    """
+    Сервис, описывающий статистику выполнений привычек (HabitStats) и пользователей (UserStats).
+
+    Статистика обновляется в той же транзакции, в которой пачка отметок записывается в журнал,
+    а задача rebuild_completion_stats пересчитывает ее по журналу пачками. Строки статистики
+    блокируются (select_for_update) до чтения журнала, поэтому запись пачки и пересчет не затирают
+    друг друга. Чтение статистики - одна строка без обращения к журналу.
+    """
+
+    @staticmethod
+    def lock(model: Type[CompletionStats], ids: Iterable[int]) -> Dict[int, CompletionStats]:
+        """
+        Создает недостающие строки статистики и блокирует строки до конца транзакции.
+        Возвращает статистику по ID привычки или пользователя.
+
+        :param model: Модель статистики (HabitStats или UserStats).
+        :param ids: ID привычек или пользователей.
+        """
+        ids = sorted(set(ids))
+        model.objects.bulk_create([model(pk=pk) for pk in ids], ignore_conflicts=True)
+        return {stats.pk: stats for stats in model.objects.select_for_update().filter(pk__in=ids).order_by('pk')}
+
+    @staticmethod
+    def save(model: Type[CompletionStats], stats: Iterable[CompletionStats]) -> None:
+        """
+        Сохраняет статистику одним запросом.
+
+        :param model: Модель статистики (HabitStats или UserStats).
+        :param stats: Статистика.
+        """
+        model.objects.bulk_update(list(stats), ['current_streak', 'best_streak', 'total_completions',
+                                                'last_completed_on', 'recent_days'])
+
+    @classmethod
+    def apply(cls, rows: List[Tuple[int, int, datetime]], habits: Dict[int, Tuple[int, str]]) -> None:
+        """
+        Учитывает в статистике пачку записанных отметок. Вызывается в транзакции записи пачки.
+
+        :param rows: Тройки (ID привычки, ID пользователя, время выполнения).
+        :param habits: Периодичность и часовой пояс владельца по ID привычки.
+        """
+        habit_days: DayCounts = defaultdict(Counter)
+        user_days: DayCounts = defaultdict(Counter)
+        for habit_id, user_id, completed_at in rows:
+            day = completed_at.astimezone(ZoneInfo(habits[habit_id][1])).date()
+            habit_days[habit_id][day] += 1
+            user_days[user_id][day] += 1
+
+        habit_stats = cls.lock(HabitStats, habit_days)
+        for habit_id, days in habit_days.items():
+            cls.add_days(habit_stats[habit_id], days, habits[habit_id][0])
+        cls.save(HabitStats, habit_stats.values())
+
+        user_stats = cls.lock(UserStats, user_days)
+        for user_id, days in user_days.items():
+            cls.add_days(user_stats[user_id], days)
+        cls.save(UserStats, user_stats.values())
+
+    @staticmethod
+    def add_days(stats: CompletionStats, days: Counter, periodicity: int = 1) -> None:
+        """
+        Учитывает в статистике выполнения по дням в порядке дней.
+
+        :param stats: Статистика.
+        :param days: Количество выполнений по дням.
+        :param periodicity: Периодичность в днях.
+        """
+        for day in sorted(days):
+            stats.add_day(day, periodicity, days[day])
+
+    @staticmethod
+    def get_days(key: str, ids: List[int]) -> DayCounts:
+        """
+        Возвращает количество выполнений по дням (по текущему часовому поясу пользователя) из журнала.
+
+        :param key: Столбец группировки журнала (habit_id или user_id).
+        :param ids: ID привычек или пользователей.
+        """
+        days: DayCounts = defaultdict(Counter)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT c.{key}, (c.completed_at AT TIME ZONE u.timezone)::date AS day, COUNT(*) '
+                f'FROM habit_completions c JOIN users u ON u.id = c.user_id '
+                f'WHERE c.{key} = ANY(%s) GROUP BY 1, 2',
+                [ids]
+            )
+            for pk, day, count in cursor.fetchall():
+                days[pk][day] = count
+        return days
+
+    @classmethod
+    def rebuild_habits(cls, habits: List[Tuple[int, int]]) -> None:
+        """
+        Пересчитывает статистику привычек по журналу выполнений.
+
+        :param habits: Пары (ID привычки, периодичность).
+        """
+        with transaction.atomic():
+            cls.lock(HabitStats, (habit_id for habit_id, _ in habits))
+            days = cls.get_days('habit_id', [habit_id for habit_id, _ in habits])
+            stats = []
+            for habit_id, periodicity in habits:
+                habit_stats = HabitStats(habit_id=habit_id)
+                cls.add_days(habit_stats, days[habit_id], periodicity)
+                stats.append(habit_stats)
+            cls.save(HabitStats, stats)
+
+    @classmethod
+    def rebuild_users(cls, user_ids: List[int]) -> None:
+        """
+        Пересчитывает статистику пользователей по журналу выполнений.
+
+        :param user_ids: ID пользователей.
+        """
+        with transaction.atomic():
+            cls.lock(UserStats, user_ids)
+            days = cls.get_days('user_id', user_ids)
+            stats = []
+            for user_id in user_ids:
+                user_stats = UserStats(user_id=user_id)
+                cls.add_days(user_stats, days[user_id])
+                stats.append(user_stats)
+            cls.save(UserStats, stats)
+
+    @classmethod
+    def rebuild(cls, batch_size: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Пересчитывает по журналу всю статистику пачками по batch_size, каждая пачка - в своей транзакции.
+        Строка статистики появляется при записи первой отметки, поэтому пересчитываются только существующие строки.
+        Возвращает количество пересчитанных привычек и пользователей.
+
+        :param batch_size: Размер пачки.
+        """
+        batch_size = batch_size or settings.HABIT_STATS_REBUILD_BATCH_SIZE
+        habits_count = users_count = 0
+
+        last_id = 0
+        while habits := list(HabitStats.objects.filter(habit_id__gt=last_id).order_by('habit_id')
+                             .values_list('habit_id', 'habit__periodicity')[:batch_size]):
+            cls.rebuild_habits(habits)
+            habits_count += len(habits)
+            last_id = habits[-1][0]
+
+        last_id = 0
+        while user_ids := list(UserStats.objects.filter(user_id__gt=last_id).order_by('user_id')
+                               .values_list('user_id', flat=True)[:batch_size]):
+            cls.rebuild_users(user_ids)
+            users_count += len(user_ids)
+            last_id = user_ids[-1]
+
+        return habits_count, users_count
+
+    @staticmethod
+    def get_today(user: CustomUser) -> date:
+        """
+        Возвращает текущий день по часовому поясу пользователя.
+
+        :param user: Пользователь.
+        """
+        return timezone.localtime(timezone=user.get_timezone()).date()
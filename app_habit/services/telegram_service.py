@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов по алгоритму token bucket.
+    Токены пополняются со скоростью rate в секунду, но не больше capacity.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Инициализация ограничителя.
+        :param rate: Количество токенов, добавляемых в секунду.
+        :param capacity: Максимальное количество накопленных токенов (по умолчанию равно rate).
+        :param clock: Функция, возвращающая текущее монотонное время в секундах.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Резервирует один токен и возвращает время в секундах,
+        которое нужно подождать, прежде чем его использовать.
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def is_full(self) -> bool:
+        """
+        Проверяет, накоплено ли максимальное количество токенов.
+        """
+        with self.lock:
+            elapsed = self.clock() - self.updated_at
+            return self.tokens + elapsed * self.rate >= self.capacity
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель частоты отправки сообщений в Telegram:
+    общий лимит на все чаты и отдельный лимит на каждый чат.
+    """
+    max_chat_buckets = 10000
+
+    def __init__(self) -> None:
+        """
+        Инициализация ограничителя по настройкам TELEGRAM_GLOBAL_RATE_LIMIT и TELEGRAM_CHAT_RATE_LIMIT.
+        """
+        self.global_bucket = TokenBucket(settings.TELEGRAM_GLOBAL_RATE_LIMIT)
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def get_chat_bucket(self, chat_id: int) -> TokenBucket:
+        """
+        Возвращает ограничитель частоты для чата.
+        Если ограничителей накопилось слишком много, удаляет неиспользуемые.
+
+        :param chat_id: ID чата в Telegram.
+        """
+        with self.lock:
+            if chat_id not in self.chat_buckets and len(self.chat_buckets) >= self.max_chat_buckets:
+                self.chat_buckets = {key: bucket for key, bucket in self.chat_buckets.items()
+                                     if not bucket.is_full()}
+            return self.chat_buckets.setdefault(chat_id, TokenBucket(settings.TELEGRAM_CHAT_RATE_LIMIT))
+
+    def reserve(self, chat_id: int) -> float:
+        """
+        Резервирует отправку сообщения в чат и возвращает время в секундах,
+        которое нужно подождать, чтобы уложиться в лимиты.
+
+        :param chat_id: ID чата в Telegram.
+        """
+        return max(self.global_bucket.reserve(), self.get_chat_bucket(chat_id).reserve())
+
+
+class TelegramService:
+    """
+    Сервис, описывающий отправку сообщений через Telegram Bot API.
+
+    Все запросы процесса идут через одну HTTP-сессию с пулом соединений.
+    Частота отправки ограничивается общим лимитом и лимитом на каждый чат,
+    ответы 429 и 5xx повторяются с задержкой.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None) -> None:
+        """
+        Инициализация сервиса.
+        :param session: HTTP-сессия. Если не передана, создается сессия с пулом соединений.
+        """
+        self.session = session or self.create_session()
+        self.url = self.get_send_message_url()
+        self.rate_limiter = TelegramRateLimiter()
+
+    @staticmethod
+    def get_send_message_url() -> str:
+        """
+        Возвращает URL метода sendMessage Telegram Bot API.
+        """
+        return f'{settings.TELEGRAM_API_URL}/bot{settings.BOT_TOKEN}/sendMessage'
+
+    @staticmethod
+    def create_session() -> requests.Session:
+        """
+        Создает HTTP-сессию с пулом соединений размером TELEGRAM_POOL_SIZE.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.TELEGRAM_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def wait_for_limits(self, chat_id: int) -> None:
+        """
+        Ожидает, пока отправка сообщения в чат не будет укладываться в лимиты Telegram.
+
+        :param chat_id: ID чата в Telegram.
+        """
+        delay = self.rate_limiter.reserve(chat_id)
+        if delay > 0:
+            time.sleep(delay)
+
+    def send_message(self, chat_id: int, text: str) -> bool:
+        """
+        Отправляет сообщение в чат. Возвращает True, если сообщение доставлено.
+
+        :param chat_id: ID чата в Telegram.
+        :param text: Текст сообщения.
+        """
+        data = {'chat_id': chat_id, 'text': text}
+
+        for attempt in range(settings.TELEGRAM_MAX_RETRIES + 1):
+            self.wait_for_limits(chat_id)
+            delay = settings.TELEGRAM_RETRY_BACKOFF * 2 ** attempt
+            try:
+                response = self.session.post(self.url, data=data, timeout=settings.TELEGRAM_REQUEST_TIMEOUT)
+            except requests.RequestException as error:
+                logger.warning(f'Ошибка соединения с Telegram для чата {chat_id}: {error}')
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 200:
+                return True
+            if response.status_code == 429:
+                time.sleep(self.get_retry_after(response, delay))
+                continue
+            if response.status_code >= 500:
+                time.sleep(delay)
+                continue
+
+            logger.warning(f'Telegram отклонил сообщение для чата {chat_id}: {response.status_code} {response.text}')
+            return False
+
+        logger.error(f'Не удалось отправить сообщение в чат {chat_id}')
+        return False
+
+    def send_messages(self, messages: Iterable[Tuple[int, str]]) -> int:
+        """
+        Отправляет пачку сообщений. Возвращает количество доставленных сообщений.
+
+        :param messages: Пары (ID чата в Telegram, текст сообщения).
+        """
+        return sum(self.send_message(chat_id, text) for chat_id, text in messages)
+
+    @staticmethod
+    def get_retry_after(response: requests.Response, default: float) -> float:
+        """
+        Возвращает время ожидания перед повтором из ответа 429.
+
+        :param response: Ответ Telegram Bot API.
+        :param default: Время ожидания, если в ответе оно не указано.
+        """
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return parse_retry_after(payload, response.headers, default)
+
+
+def parse_retry_after(payload: Any, headers: Mapping[str, str], default: float) -> float:
+    """
+    Возвращает время ожидания перед повтором из тела или заголовков ответа 429.
+
+    :param payload: Тело ответа Telegram Bot API.
+    :param headers: Заголовки ответа.
+    :param default: Время ожидания, если в ответе оно не указано.
+    """
+    try:
+        return float(payload['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(headers.get('Retry-After', default))
+    except ValueError:
+        return default
+
+
+@lru_cache(maxsize=None)
+def get_telegram_service() -> TelegramService:
+    """
+    Возвращает общий для процесса экземпляр TelegramService,
+    чтобы соединения и лимиты переиспользовались между задачами.
+    """
+    return TelegramService()
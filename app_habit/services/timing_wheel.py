@@ -0,0 +1,126 @@
+import heapq
+from typing import Dict, Iterator, List, Set, Tuple
+
+
+class TimingWheel:
+    """
+    Иерархическое колесо таймеров с шагом в одну минуту.
+
+    Время задается целым числом минут (unix-время // 60). Уровень колеса состоит из size ячеек
+    по tick минут: нижний уровень хранит таймеры ближайшего часа поминутно, следующий -
+    таймеры ближайших суток по часам, верхний - таймеры ближайших дней по дням.
+    Таймеры дальше верхнего уровня лежат в куче. Когда время доходит до начала ячейки
+    верхнего уровня, ее таймеры опускаются на нижние уровни, поэтому добавление, удаление
+    и срабатывание таймера стоят O(1) независимо от количества таймеров.
+    """
+    levels = ((1, 60), (60, 24), (60 * 24, 16))
+
+    def __init__(self, current: int) -> None:
+        """
+        Инициализация колеса.
+        :param current: Последняя обработанная минута. Таймеры на нее и раньше срабатывают при первом advance.
+        """
+        self.current = current
+        self.buckets: List[List[Set[Tuple[int, int]]]] = [[set() for _ in range(size)] for _, size in self.levels]
+        self.overflow: List[Tuple[int, int]] = []
+        self.expired: Set[Tuple[int, int]] = set()
+        self.timers: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.timers
+
+    def add(self, key: int, minute: int) -> None:
+        """
+        Добавляет таймер или переносит существующий на другую минуту.
+
+        :param key: Ключ таймера (ID привычки).
+        :param minute: Минута срабатывания.
+        """
+        self.timers[key] = minute
+        self.place(key, minute)
+
+    def remove(self, key: int) -> None:
+        """
+        Удаляет таймер. Запись в ячейке удаляется лениво, при ее обработке.
+
+        :param key: Ключ таймера (ID привычки).
+        """
+        self.timers.pop(key, None)
+
+    def get(self, key: int) -> int:
+        """
+        Возвращает минуту срабатывания таймера.
+
+        :param key: Ключ таймера (ID привычки).
+        """
+        return self.timers[key]
+
+    def place(self, key: int, minute: int) -> None:
+        """
+        Кладет таймер в ячейку самого нижнего уровня, окно которого его покрывает.
+
+        :param key: Ключ таймера.
+        :param minute: Минута срабатывания.
+        """
+        if minute <= self.current:
+            self.expired.add((key, minute))
+            return
+        for bucket, (tick, size) in zip(self.buckets, self.levels):
+            if minute // tick - self.current // tick < size:
+                bucket[minute // tick % size].add((key, minute))
+                return
+        heapq.heappush(self.overflow, (minute, key))
+
+    def cascade(self) -> None:
+        """
+        Опускает на нижние уровни таймеры ячеек, которые начинаются в текущую минуту,
+        и переносит в колесо таймеры из кучи, попавшие в окно верхнего уровня.
+        """
+        top_tick, top_size = self.levels[-1]
+        if self.current % top_tick == 0:
+            while self.overflow and self.overflow[0][0] // top_tick - self.current // top_tick < top_size:
+                minute, key = heapq.heappop(self.overflow)
+                self.place(key, minute)
+
+        for level in range(len(self.levels) - 1, 0, -1):
+            tick, size = self.levels[level]
+            if self.current % tick == 0:
+                index = self.current // tick % size
+                entries, self.buckets[level][index] = self.buckets[level][index], set()
+                for key, minute in entries:
+                    self.place(key, minute)
+
+    def advance(self, to_minute: int) -> Iterator[Tuple[int, List[int]]]:
+        """
+        Двигает время колеса до минуты to_minute включительно и возвращает генератор пар
+        (минута, ключи сработавших таймеров) по возрастанию минут. Удаленные и перенесенные
+        таймеры пропускаются, сработавшие таймеры удаляются из колеса.
+        Пропущенные минуты (например, после простоя) обрабатываются по порядку.
+
+        :param to_minute: Минута, до которой нужно сдвинуть время.
+        """
+        if self.expired:
+            yield from self.pop_expired()
+        while self.current < to_minute:
+            self.current += 1
+            self.cascade()
+            index = self.current % self.levels[0][1]
+            self.expired.update(self.buckets[0][index])
+            self.buckets[0][index] = set()
+            yield from self.pop_expired()
+
+    def pop_expired(self) -> Iterator[Tuple[int, List[int]]]:
+        """
+        Возвращает генератор пар (минута, ключи) для сработавших таймеров и удаляет их из колеса.
+        """
+        expired, self.expired = self.expired, set()
+        by_minute: Dict[int, List[int]] = {}
+        for key, minute in expired:
+            if self.timers.get(key) == minute:
+                del self.timers[key]
+                by_minute.setdefault(minute, []).append(key)
+        for minute in sorted(by_minute):
+            yield minute, sorted(by_minute[minute])
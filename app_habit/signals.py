@@ -0,0 +1,58 @@
+from typing import Any, Dict
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from app_user.models import CustomUser
+from .models import Habit
+from .services.public_habits_cache import PublicHabitsCacheService
+from .services.reminder_service import ReminderService
+
+# Поля пользователя, от которых зависят привычки: часовой пояс (время напоминаний)
+# и данные, показываемые в ленте публичных привычек
+TRACKED_USER_FIELDS = ('timezone', 'first_name', 'last_name', 'email')
+PUBLIC_USER_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def get_tracked_fields(user: CustomUser) -> Dict[str, Any]:
+    """
+    Возвращает значения отслеживаемых полей пользователя. Отложенные поля не загружаются (None).
+
+    :param user: Пользователь.
+    """
+    return {field: user.__dict__.get(field) for field in TRACKED_USER_FIELDS}
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_user_fields(sender: type, instance: CustomUser, **kwargs: Any) -> None:
+    """
+    Запоминает отслеживаемые поля загруженного пользователя, чтобы после сохранения определить, что изменилось.
+
+    :param sender: Модель пользователя.
+    :param instance: Пользователь.
+    """
+    instance._saved_fields = get_tracked_fields(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_habits_on_user_change(sender: type, instance: CustomUser, created: bool, **kwargs: Any) -> None:
+    """
+    После смены часового пояса пользователя пересчитывает время следующего напоминания его привычек
+    (в транзакции, сохраняющей пользователя). После изменения данных, показываемых в ленте,
+    сбрасывает кеш ленты публичных привычек, если у пользователя есть публичные привычки.
+
+    :param sender: Модель пользователя.
+    :param instance: Сохраненный пользователь.
+    :param created: Пользователь создан.
+    """
+    saved_fields, instance._saved_fields = instance._saved_fields, get_tracked_fields(instance)
+    if created:
+        return
+    changed = {field for field, value in saved_fields.items()
+               if value is not None and value != instance._saved_fields[field]}
+
+    if 'timezone' in changed:
+        ReminderService.reschedule_user_habits(instance)
+    if changed.intersection(PUBLIC_USER_FIELDS) and Habit.objects.filter(user=instance, is_public=True).exists():
+        transaction.on_commit(PublicHabitsCacheService.invalidate)
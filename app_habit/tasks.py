@@ -1,39 +1,136 @@
-import requests
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
 from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .services.completion_service import HabitCompletionService
+from .services.dedup_service import ReminderDedupService
+from .services.delivery_service import AsyncDeliveryService
+from .services.habit_event_service import HabitEventService
+from .services.reminder_service import ReminderService
+from .services.stats_service import HabitStatsService
+from .services.telegram_service import get_telegram_service
 
-from config.settings import BOT_TOKEN
-from .models import Habit
+logger = logging.getLogger(__name__)
 
 
-def send_message_to_user(user_tg_id: int, message: str) -> None:
+@shared_task
+def send_reminders(habit_ids: List[int], slot: Optional[int] = None) -> None:
     """
-    Отправка сообщения пользователю в Telegram.
-    :param user_tg_id: ID пользователя в Telegram
-    :param message: Текст сообщения.
-    :return:
+    Задача Celery для отправки пачки напоминаний.
+    Напоминания, уже отправленные в этот слот, отбрасываются до обращения к БД,
+    остальные передаются в Telegram одной задачей вместе со слотом.
+
+    :param habit_ids: Список ID привычек, для которых нужно отправить напоминания.
+    :param slot: Слот расписания. Если передан, повторная отправка в этот слот отбрасывается.
     """
-    token = BOT_TOKEN
-    url = f'https://api.telegram.org/bot{token}/sendMessage'
-    data = {'chat_id': user_tg_id, 'text': message}
-    requests.post(url, data=data)
+    if slot is not None:
+        habit_ids = ReminderDedupService.filter_sent(habit_ids, slot)
+    if not habit_ids:
+        return
+    payloads = ReminderService.build_payloads(habit_ids)
+    if payloads:
+        send_telegram_messages.delay(payloads, slot)
 
 
 @shared_task
-def send_reminder(habit_id: int) -> None:
+def send_telegram_messages(payloads: List[Dict[str, Any]], slot: Optional[int] = None) -> None:
+    """
+    Задача Celery для отправки пачки напоминаний в Telegram через общую HTTP-сессию.
+    Задача направляется в отдельную очередь telegram, чтобы лимиты Telegram
+    соблюдал один воркер. Если передан слот, каждое напоминание отмечается перед отправкой
+    (повторная доставка задачи его не отправит), а с неотправленных напоминаний отметка снимается.
+
+    :param payloads: Напоминания из ReminderService.build_payloads.
+    :param slot: Слот расписания.
+    """
+    if slot is not None:
+        claimed = set(ReminderDedupService.claim([payload['habit_id'] for payload in payloads], slot))
+        payloads = [payload for payload in payloads if payload['habit_id'] in claimed]
+
+    service = get_telegram_service()
+    failed = [payload['habit_id'] for payload in payloads
+              if not service.send_message(payload['tg_id'], payload['message'])]
+    if slot is not None:
+        ReminderDedupService.release(failed, slot)
+    logger.info(f'Отправлено сообщений в Telegram: {len(payloads) - len(failed)} из {len(payloads)}')
+
+
+def enqueue_reminders(batches: Iterable[Tuple[int, List[int]]]) -> int:
     """
-    Задача Celery для отправки напоминания пользователю.
+    Ставит пачки напоминаний в очередь доставки. Возвращает количество напоминаний.
+    При REMINDER_DELIVERY='async' пачки попадают в очередь Redis, которую обрабатывает
+    команда deliver_reminders (единственный потребитель очереди),
+    иначе каждая пачка отправляется отдельной задачей send_reminders.
 
-    :param habit_id: ID привычки, для которой нужно отправить напоминание.
+    :param batches: Пары (слот расписания, пачка ID привычек). Слот - unix-время минуты,
+                    на которую запланированы напоминания.
     """
-    habit = Habit.objects.get(id=habit_id)
-    user = habit.user
-    message = (f"⏰ Пора выполнить привычку: {habit.action}\n"
-               f"📍 {habit.place}\n")
+    count = 0
+    for slot, habit_ids in batches:
+        if settings.REMINDER_DELIVERY == 'async':
+            AsyncDeliveryService.enqueue(habit_ids, slot)
+        else:
+            send_reminders.delay(habit_ids, slot)
+        count += len(habit_ids)
+    return count
+
 
-    if habit.related_habit:
-        message += f"После этого ты сможешь {habit.related_habit.action} 🙂\n"
+@shared_task
+def dispatch_due_reminders() -> None:
+    """
+    Задача Celery, запускаемая celery beat раз в минуту.
+    Выбирает привычки, время напоминания о которых наступило, сдвигает им время
+    следующего напоминания и ставит напоминания в очередь пачками вместе со слотом расписания.
+    Если напоминания планирует колесо таймеров (REMINDER_SCHEDULER='wheel'), задача ничего не делает.
+    """
+    if settings.REMINDER_SCHEDULER != 'beat':
+        return
+    moment = timezone.localtime().replace(second=0, microsecond=0)
+    reminders = enqueue_reminders(ReminderService.iter_due_batches(moment))
+    logger.info(f'Напоминания на {moment:%H:%M}: поставлено в очередь напоминаний: {reminders}')
 
-    if habit.reward:
-        message += f" 🎁 Твое вознаграждение: {habit.reward}"
 
-    send_message_to_user(user.tg_id, message)
+@shared_task
+def process_habit_events() -> None:
+    """
+    Задача Celery, запускаемая celery beat каждые HABIT_EVENTS_INTERVAL секунд.
+    Обрабатывает накопившиеся события изменения привычек пачками, пока они не закончатся.
+    """
+    processed = 0
+    while True:
+        count = HabitEventService.process()
+        processed += count
+        if count < settings.HABIT_EVENTS_BATCH_SIZE:
+            break
+    if processed:
+        logger.info(f'Обработано событий изменения привычек: {processed}')
+
+
+@shared_task
+def flush_habit_completions() -> None:
+    """
+    Задача Celery, запускаемая celery beat каждые HABIT_COMPLETIONS_FLUSH_INTERVAL секунд.
+    Записывает в БД отметки о выполнении привычек из буфера пачками, пока буфер не опустеет.
+    """
+    flushed = 0
+    while True:
+        count = HabitCompletionService.flush()
+        flushed += count
+        if count < settings.HABIT_COMPLETIONS_BATCH_SIZE:
+            break
+    if flushed:
+        logger.info(f'Записано из буфера отметок о выполнении привычек: {flushed}')
+
+
+@shared_task
+def rebuild_completion_stats() -> None:
+    """
+    Задача Celery, запускаемая celery beat раз в сутки.
+    Пересчитывает статистику выполнений привычек и пользователей по журналу выполнений:
+    исправляет серии после отметок, записанных задним числом, и статистику удаленных привычек.
+    """
+    habits_count, users_count = HabitStatsService.rebuild()
+    logger.info(f'Пересчитана статистика выполнений: привычек {habits_count}, пользователей {users_count}')
@@ -1,12 +1,36 @@
-from unittest.mock import patch
-
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from unittest.mock import patch, Mock
+from zoneinfo import ZoneInfo
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings, SimpleTestCase
+from django.utils import timezone
 from django_celery_beat.models import PeriodicTask
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
-from app_habit.models import Habit
-from app_habit.tasks import send_reminder
+from app_habit.models import Habit, HabitCompletion, HabitEvent, HabitStats, UserStats
+from app_habit.serializers import PublicHabitSerializer, PublicHabitListSerializer, PUBLIC_HABIT_VALUES
+from app_habit.services.completion_service import HabitCompletionService
+from app_habit.services.dedup_service import ReminderDedupService
+from app_habit.services.delivery_service import AsyncDeliveryService
+from app_habit.services.habit_event_service import HabitEventService
+from app_habit.services.metrics_service import MetricsService
+from app_habit.services.public_habits_cache import PublicHabitsCacheService
+from app_habit.services.scheduler_service import ReminderScheduler
+from app_habit.services.reminder_service import ReminderService
+from app_habit.services.telegram_service import TelegramService, TokenBucket
+from app_habit.services.timing_wheel import TimingWheel
+from app_habit.tasks import (dispatch_due_reminders, send_reminders, send_telegram_messages, flush_habit_completions,
+                             rebuild_completion_stats)
 from app_user.models import CustomUser
+from config.redis import get_redis
 
 
 class BaseTestCase(APITestCase):
@@ -242,7 +266,7 @@ class HabitCreateAPITestCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_success_create_habit(self):
-        """Успешное создание привычки и периодического напоминания"""
+        """Успешное создание привычки без отдельной периодической задачи для напоминания"""
         data = {
             "place": "Работа",
             "time": "09:00:00",
@@ -256,10 +280,6 @@ class HabitCreateAPITestCase(BaseTestCase):
         response = self.user_clients[0].post(self.url, data)
         response_data = response.json()
         habits = self.user_clients[0].get(self.url).json().get('results')
-        habit = Habit.objects.get(id=response_data.get('id'))
-        periodic_tasks = PeriodicTask.objects.filter(
-            args__contains=str(habit.id))
-        task = periodic_tasks[0]
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(response_data.get('id'))
@@ -274,8 +294,7 @@ class HabitCreateAPITestCase(BaseTestCase):
         self.assertEqual(response_data.get('user'), self.user_1.id)
         self.assertEqual(len(habits), 3)
 
-        self.assertEqual(len(periodic_tasks), 1)
-        self.assertEqual(task.name, f"reminder_for_habit_{response_data.get('id')}")
+        self.assertFalse(PeriodicTask.objects.filter(name__startswith='reminder_for_habit_').exists())
 
 
 class HabitReadAPITestCase(BaseTestCase):
@@ -368,7 +387,6 @@ class HabitUpdateAPITestCase(BaseTestCase):
     def test_user_can_edit_his_habit(self):
         """
         Пользователь может редактировать свою привычку по ID.
-        Также изменяется и связанная с привычкой периодическая задача.
         """
         new_habit_data = {
             "place": "Дом",
@@ -387,7 +405,6 @@ class HabitUpdateAPITestCase(BaseTestCase):
             self.assertEqual(response.status_code, status.HTTP_200_OK)
 
             response_data = response.json()
-            task = PeriodicTask.objects.get(name=f"reminder_for_habit_{habit_id}")
 
             self.assertEqual(response_data.get('place'), new_habit_data.get('place'))
             self.assertEqual(response_data.get('time'), new_habit_data.get('time'))
@@ -396,7 +413,7 @@ class HabitUpdateAPITestCase(BaseTestCase):
             self.assertEqual(response_data.get('periodicity'), new_habit_data.get('periodicity'))
             self.assertEqual(response_data.get('time_for_action'), new_habit_data.get('time_for_action'))
             self.assertEqual(response_data.get('is_public'), new_habit_data.get('is_public'))
-            self.assertEqual(task.crontab.minute, f'*/{new_habit_data["periodicity"]}')
+            self.assertEqual(response_data.get('periodicity'), new_habit_data.get('periodicity'))
 
     def test_user_cannot_edit_other_users_habit(self):
         """
@@ -421,7 +438,6 @@ class HabitUpdateAPITestCase(BaseTestCase):
     def test_user_can_partially_update_his_habit(self):
         """
         Пользователь может частично обновить свою привычку по ID.
-        Также изменяется и связанная с привычкой периодическая задача.
         """
         new_habit_data = {"place": "Дом", "periodicity": 4}
 
@@ -429,11 +445,50 @@ class HabitUpdateAPITestCase(BaseTestCase):
             habit_id = self.habit_ids[i]
             response = user_client.patch(f"{self.url}{habit_id}/", new_habit_data)
             response_data = response.json()
-            task = PeriodicTask.objects.get(name=f"reminder_for_habit_{habit_id}")
 
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.assertEqual(response_data.get('place'), new_habit_data.get('place'))
-            self.assertEqual(task.crontab.minute, f'*/{new_habit_data["periodicity"]}')
+            self.assertEqual(response_data.get('periodicity'), new_habit_data.get('periodicity'))
+
+    def test_next_reminder_is_recomputed_on_time_change(self):
+        """
+        Время следующего напоминания пересчитывается при изменении времени привычки и только тогда.
+        """
+        habit_id = self.habit_ids[0]
+        next_reminder_at = Habit.objects.get(id=habit_id).next_reminder_at
+
+        self.user_clients[0].patch(f"{self.url}{habit_id}/", {"place": "Дом"})
+        unchanged = Habit.objects.get(id=habit_id).next_reminder_at
+        response = self.user_clients[0].patch(f"{self.url}{habit_id}/", {"time": "09:30:00"})
+        changed = Habit.objects.get(id=habit_id).next_reminder_at
+
+        self.assertEqual(unchanged, next_reminder_at)
+        self.assertEqual(changed, Habit.get_first_reminder_at('09:30'))
+        self.assertEqual(response.json().get('next_reminder_at'), timezone.localtime(changed).isoformat())
+
+    def test_user_can_keep_action_of_his_habit(self):
+        """
+        Пользователь может обновить привычку, передав ее же действие.
+        """
+        response = self.user_clients[0].patch(f"{self.url}{self.habit_ids[0]}/",
+                                              {"action": "Почистить спам", "place": "Дом"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().get('place'), "Дом")
+
+    def test_user_cannot_rename_habit_to_existing_action(self):
+        """
+        Нельзя переименовать привычку в действие другой своей привычки.
+        """
+        habit = Habit.objects.create(user=self.user_1, place="Дом", time="10:00", action="Зарядка",
+                                     is_pleasant=False, time_for_action=60)
+
+        response = self.user_clients[0].patch(f"{self.url}{habit.id}/", {"action": "Почистить спам"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json().get('non_field_errors')[0],
+                         'У вас уже есть привычка с таким действием')
+        self.assertEqual(Habit.objects.get(id=habit.id).action, "Зарядка")
 
     def test_user_cannot_partially_update_other_users_habit(self):
         """
@@ -474,14 +529,12 @@ class HabitDeleteAPITestCase(BaseTestCase):
     def test_user_can_delete_own_habit(self):
         """
         Пользователь может удалить свою привычку.
-        Также удаляется связанная с ней периодическая задача о напоминании.
         """
         for i, user_client in enumerate(self.user_clients):
             response = user_client.delete(f"{self.url}{self.habit_ids[i]}/")
 
             self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
             self.assertFalse(Habit.objects.filter(id=self.habit_ids[i]).exists())
-            self.assertFalse(PeriodicTask.objects.filter(name=f"reminder_for_habit_{self.habit_ids[i]}").exists())
 
     def test_user_cannot_delete_other_user_habit(self):
         """Пользователь не может удалить чужую привычку"""
@@ -491,11 +544,483 @@ class HabitDeleteAPITestCase(BaseTestCase):
             self.assertTrue(Habit.objects.filter(id=self.habit_ids[i + 1]).exists())
 
 
+class HabitBulkAPITestCase(BaseTestCase):
+    """Пакетные операции над привычками"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = '/api/habits/bulk/'
+        self.pleasant_habit = Habit.objects.create(user=self.user_1, place="Дом", time="10:00", action="Выпить кофе",
+                                                   is_pleasant=True, time_for_action=60)
+
+    def get_habits_data(self, count, **extra):
+        return [
+            dict({
+                "place": "Работа",
+                "time": "09:00:00",
+                "action": f"Привычка {i}",
+                "is_pleasant": False,
+                "periodicity": 1,
+                "time_for_action": 60,
+                "related_habit": self.pleasant_habit.id,
+            }, **extra)
+            for i in range(count)
+        ]
+
+    def count_create_queries(self, count):
+        with CaptureQueriesContext(connection) as context:
+            response = self.user_clients[0].post(self.url, self.get_habits_data(count), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        Habit.objects.filter(user=self.user_1, is_pleasant=False).delete()
+        return len(context.captured_queries)
+
+    def test_bulk_create(self):
+        """Пачка привычек создается одним запросом и возвращается с ID"""
+        with patch('app_habit.views.PublicHabitsCacheService.invalidate') as mock_invalidate:
+            response = self.user_clients[0].post(self.url, self.get_habits_data(3, is_public=True), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([habit['action'] for habit in response.json()], ["Привычка 0", "Привычка 1", "Привычка 2"])
+        self.assertTrue(all(habit['id'] for habit in response.json()))
+        self.assertEqual(Habit.objects.filter(user=self.user_1, related_habit=self.pleasant_habit).count(), 3)
+        mock_invalidate.assert_called_once_with()
+
+    def test_bulk_create_queries_do_not_depend_on_batch_size(self):
+        """Количество запросов к БД не зависит от размера пачки"""
+        self.assertEqual(self.count_create_queries(2), self.count_create_queries(20))
+
+    def test_bulk_create_with_duplicate_actions(self):
+        """Повторы действий внутри пачки и с существующими привычками отклоняются, ничего не создается"""
+        habits_data = self.get_habits_data(3)
+        habits_data[1]['action'] = "Привычка 0"
+        habits_data[2]['action'] = "Выпить кофе"
+
+        response = self.user_clients[0].post(self.url, habits_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{'action': ['У вас уже есть привычка с таким действием']}] * 3)
+        self.assertEqual(Habit.objects.filter(user=self.user_1).count(), 1)
+
+    def test_bulk_create_is_limited(self):
+        """Размер пачки ограничен сервером"""
+        with self.settings(HABIT_BULK_MAX_SIZE=2):
+            response = self.user_clients[0].post(self.url, self.get_habits_data(3), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Пачка привычек частично обновляется одним запросом"""
+        habits = [Habit.objects.create(user=self.user_1, **dict(data, related_habit=self.pleasant_habit))
+                  for data in self.get_habits_data(2)]
+
+        response = self.user_clients[0].patch(self.url, [
+            {"id": habits[0].id, "place": "Дом"},
+            {"id": habits[1].id, "action": "Привычка 2", "periodicity": 3},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        habits[0].refresh_from_db()
+        habits[1].refresh_from_db()
+        self.assertEqual((habits[0].place, habits[0].action), ("Дом", "Привычка 0"))
+        self.assertEqual((habits[1].action, habits[1].periodicity), ("Привычка 2", 3))
+
+    def test_bulk_update_other_users_habit(self):
+        """Нельзя обновить в пачке чужую привычку"""
+        other_habit = Habit.objects.create(user=self.user_2, place="Дом", time="10:00", action="Зарядка",
+                                           is_pleasant=False, time_for_action=60)
+
+        response = self.user_clients[0].patch(self.url, [
+            {"id": self.pleasant_habit.id, "place": "Работа"},
+            {"id": other_habit.id, "place": "Работа"},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{}, {'id': ['Привычка не найдена']}])
+        self.assertEqual(Habit.objects.get(id=self.pleasant_habit.id).place, "Дом")
+
+    def test_bulk_update_without_id(self):
+        """ID обязателен для каждой привычки пачки"""
+        response = self.user_clients[0].patch(self.url, [
+            {"id": self.pleasant_habit.id, "place": "Работа"},
+            {"place": "Работа"},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{}, {'id': ['Обязательное поле.']}])
+        self.assertEqual(Habit.objects.get(id=self.pleasant_habit.id).place, "Дом")
+
+    def test_bulk_update_with_duplicate_ids(self):
+        """Привычка не может повторяться в пачке"""
+        response = self.user_clients[0].patch(self.url, [
+            {"id": self.pleasant_habit.id, "place": "Работа"},
+            {"id": self.pleasant_habit.id, "place": "Парк"},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{'id': ['Привычка повторяется в пачке']}] * 2)
+        self.assertEqual(Habit.objects.get(id=self.pleasant_habit.id).place, "Дом")
+
+    def test_bulk_update_to_existing_action(self):
+        """Нельзя переименовать привычку в пачке в действие другой привычки пользователя"""
+        habit = Habit.objects.create(user=self.user_1, **dict(self.get_habits_data(1)[0], related_habit=None))
+
+        response = self.user_clients[0].patch(self.url, [{"id": habit.id, "action": "Выпить кофе"}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{'action': ['У вас уже есть привычка с таким действием']}])
+
+    def test_bulk_delete(self):
+        """Удаляются только привычки пользователя из списка"""
+        habits = [Habit.objects.create(user=self.user_1, **dict(data, related_habit=None))
+                  for data in self.get_habits_data(2)]
+        other_habit = Habit.objects.create(user=self.user_2, place="Дом", time="10:00", action="Зарядка",
+                                           is_pleasant=False, time_for_action=60)
+
+        response = self.user_clients[0].delete(self.url, {"ids": [habits[0].id, other_habit.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Habit.objects.filter(id=habits[0].id).exists())
+        self.assertTrue(Habit.objects.filter(id=habits[1].id).exists())
+        self.assertTrue(Habit.objects.filter(id=other_habit.id).exists())
+
+
+class HabitEventTestCase(BaseTestCase):
+    """События изменения привычек (transactional outbox)"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = '/api/habits/'
+        self.habit_data = {
+            "place": "Работа",
+            "time": "09:00:00",
+            "action": "Почистить спам",
+            "is_pleasant": False,
+            "periodicity": 1,
+            "time_for_action": 60,
+        }
+        self.stream_key_patcher = patch.object(HabitEventService, 'stream_key', 'test:habits:changes')
+        self.stream_key_patcher.start()
+
+    def tearDown(self):
+        get_redis().delete('test:habits:changes')
+        self.stream_key_patcher.stop()
+
+    def get_events(self):
+        return list(HabitEvent.objects.order_by('id').values_list('habit_id', flat=True))
+
+    def test_habit_writes_record_events(self):
+        """Создание, обновление и удаление привычки через API записывают по одному событию"""
+        habit_id = self.user_clients[0].post(self.url, self.habit_data).json()['id']
+        self.user_clients[0].patch(f'{self.url}{habit_id}/', {'time': '10:00'})
+        self.user_clients[0].delete(f'{self.url}{habit_id}/')
+
+        self.assertEqual(self.get_events(), [habit_id] * 3)
+
+    def test_failed_write_does_not_record_event(self):
+        """Если привычка не записана, событие тоже не записывается"""
+        self.user_clients[0].post(self.url, self.habit_data)
+        response = self.user_clients[0].post(self.url, dict(self.habit_data, time_for_action=121))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.get_events()), 1)
+
+    def test_bulk_create_records_events(self):
+        """Пакетное создание записывает события для всех привычек пачки"""
+        habits_data = [dict(self.habit_data, action=f'Привычка {i}') for i in range(3)]
+
+        response = self.user_clients[0].post(f'{self.url}bulk/', habits_data, format='json')
+
+        self.assertEqual(self.get_events(), [habit['id'] for habit in response.json()])
+
+    def test_process_collapses_events(self):
+        """Повторные изменения одной привычки схлопываются в одно сообщение, события удаляются"""
+        habit = Habit.objects.create(user=self.user_1, **dict(self.habit_data, action='Зарядка'))
+        deleted_habit = Habit.objects.create(user=self.user_1, **self.habit_data)
+        HabitEventService.record([habit.id, deleted_habit.id, habit.id])
+        deleted_habit_id = deleted_habit.id
+        deleted_habit.delete()
+
+        processed = HabitEventService.process()
+
+        messages = [fields for _, fields in get_redis().xrange('test:habits:changes')]
+        self.assertEqual(processed, 3)
+        self.assertEqual(messages, [
+            {b'op': b'upsert', b'habit_id': str(habit.id).encode(),
+             b'next_reminder_at': str(int(habit.next_reminder_at.timestamp())).encode()},
+            {b'op': b'delete', b'habit_id': str(deleted_habit_id).encode()},
+        ])
+        self.assertEqual(self.get_events(), [])
+
+    def test_process_without_events(self):
+        """Если событий нет, в поток ничего не публикуется"""
+        self.assertEqual(HabitEventService.process(), 0)
+        self.assertEqual(get_redis().xlen('test:habits:changes'), 0)
+
+
+class HabitCompletionTestCase(BaseTestCase):
+    """Отметки о выполнении привычек: буфер в Redis и запись пачками через COPY"""
+
+    def setUp(self):
+        super().setUp()
+        self.habit = Habit.objects.create(user=self.user_1, place='Дом', time='09:00', action='Зарядка',
+                                          is_pleasant=False, periodicity=1, time_for_action=60)
+        self.url = f'/api/habits/{self.habit.id}/complete/'
+        self.patchers = [patch.object(HabitCompletionService, 'buffer_key', 'test:habits:completions'),
+                         patch.object(HabitCompletionService, 'lock_key', 'test:habits:completions:lock'),
+                         patch.object(HabitCompletionService, 'known_partitions', set())]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        get_redis().delete('test:habits:completions', 'test:habits:completions:lock')
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def get_completions(self):
+        return list(HabitCompletion.objects.order_by('completed_at').values_list('habit_id', 'user_id',
+                                                                                 'completed_at'))
+
+    def test_complete_is_buffered(self):
+        """Отметка принимается без записи в БД и попадает в буфер"""
+        completed_at = (timezone.now() - timedelta(days=1)).replace(microsecond=0)
+
+        with self.assertNumQueries(2):
+            response = self.user_clients[0].post(self.url, {'completed_at': completed_at.isoformat()})
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['habit'], self.habit.id)
+        buffered = get_redis().lrange('test:habits:completions', 0, -1)
+        self.assertEqual([HabitCompletionService.parse(item)[1:] for item in buffered],
+                         [(self.habit.id, self.user_1.id, completed_at)])
+
+    def test_complete_validation(self):
+        """Чужую привычку отметить нельзя, время выполнения не может быть в будущем"""
+        response = self.user_clients[1].post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.user_clients[0].post(self.url, {'completed_at': (timezone.now() + timedelta(hours=1))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_redis().llen('test:habits:completions'), 0)
+
+    def test_complete_too_old(self):
+        """Выполнение нельзя отметить раньше допустимого срока (секция месяца не создается)"""
+        with self.settings(HABIT_COMPLETION_BACKDATE_DAYS=7):
+            response = self.user_clients[0].post(self.url, {'completed_at': timezone.now() - timedelta(days=8)})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('completed_at', response.json())
+
+            response = self.user_clients[0].post(self.url, {'completed_at': '1975-03-01T10:00:00Z'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(get_redis().llen('test:habits:completions'), 0)
+
+            response = self.user_clients[0].post(self.url, {'completed_at': timezone.now() - timedelta(days=6)})
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_flush(self):
+        """Буфер записывается в секции месяцев пачками, отметки удаленных привычек пропускаются"""
+        deleted_habit = Habit.objects.create(user=self.user_1, place='Дом', time='10:00', action='Чтение',
+                                             is_pleasant=False, periodicity=1, time_for_action=60)
+        moments = [datetime(2023, 6, 30, 23, 0, tzinfo=dt_timezone.utc),
+                   datetime(2023, 7, 1, 1, 0, tzinfo=dt_timezone.utc)]
+        for moment in moments:
+            HabitCompletionService.record(self.habit.id, self.user_1.id, moment)
+        HabitCompletionService.record(deleted_habit.id, self.user_1.id, moments[1])
+        deleted_habit.delete()
+
+        self.assertEqual(HabitCompletionService.flush(batch_size=2), 2)
+        self.assertEqual(HabitCompletionService.flush(batch_size=2), 1)
+        self.assertEqual(HabitCompletionService.flush(batch_size=2), 0)
+
+        self.assertEqual(self.get_completions(), [(self.habit.id, self.user_1.id, moment) for moment in moments])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relname FROM pg_class "
+                           "WHERE relkind = 'r' AND relname LIKE 'habit_completions_2023_%' ORDER BY relname")
+            self.assertEqual([row[0] for row in cursor.fetchall()],
+                             ['habit_completions_2023_06', 'habit_completions_2023_07'])
+        self.assertEqual(get_redis().llen('test:habits:completions'), 0)
+
+    def test_flush_skips_when_locked(self):
+        """Пока буфер записывает другой обработчик, пачка не забирается"""
+        HabitCompletionService.record(self.habit.id, self.user_1.id)
+        get_redis().set('test:habits:completions:lock', 'other')
+
+        self.assertEqual(HabitCompletionService.flush(), 0)
+        self.assertEqual(get_redis().llen('test:habits:completions'), 1)
+
+    def test_flush_replay_is_idempotent(self):
+        """Пачка, повторно записанная после сбоя, не дублирует отметки, отметки без ключа тоже"""
+        HabitCompletionService.record(self.habit.id, self.user_1.id)
+        legacy_item = f'{self.habit.id},{self.user_1.id},{timezone.now().timestamp():.6f}'
+        get_redis().rpush('test:habits:completions', legacy_item)
+        items = get_redis().lrange('test:habits:completions', 0, -1)
+
+        self.assertEqual(HabitCompletionService.flush(), 2)
+        get_redis().rpush('test:habits:completions', *items)
+        self.assertEqual(HabitCompletionService.flush(), 2)
+
+        self.assertEqual(len(self.get_completions()), 2)
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).total_completions, 2)
+        self.assertEqual(get_redis().llen('test:habits:completions'), 0)
+
+    def test_flush_lost_lock(self):
+        """Если блокировка истекла и ее взял другой обработчик, пачка не записывается и остается в буфере"""
+        HabitCompletionService.record(self.habit.id, self.user_1.id)
+        write = HabitCompletionService.write
+
+        def slow_write(rows):
+            get_redis().set('test:habits:completions:lock', 'other')
+            return write(rows)
+
+        with patch.object(HabitCompletionService, 'write', side_effect=slow_write), \
+                self.assertLogs('app_habit.services.completion_service', level='WARNING'):
+            self.assertEqual(HabitCompletionService.flush(), 0)
+
+        self.assertEqual(self.get_completions(), [])
+        self.assertFalse(HabitStats.objects.filter(habit=self.habit).exists())
+        self.assertEqual(get_redis().llen('test:habits:completions'), 1)
+        self.assertEqual(get_redis().get('test:habits:completions:lock'), b'other')
+
+    @override_settings(HABIT_COMPLETIONS_BATCH_SIZE=2)
+    def test_flush_task_drains_buffer(self):
+        """Задача записывает буфер пачками, пока он не опустеет"""
+        for _ in range(5):
+            HabitCompletionService.record(self.habit.id, self.user_1.id)
+
+        flush_habit_completions()
+
+        self.assertEqual(len(self.get_completions()), 5)
+        self.assertEqual(get_redis().llen('test:habits:completions'), 0)
+
+
+class CompletionStatsTestCase(SimpleTestCase):
+    """Инкрементальный расчет серий и доли выполнений"""
+
+    def setUp(self):
+        self.day = datetime(2023, 7, 1).date()
+
+    def add_days(self, stats, offsets, periodicity=1):
+        for offset in offsets:
+            stats.add_day(self.day + timedelta(days=offset), periodicity)
+        return stats
+
+    def test_streaks(self):
+        """Серия растет по дням подряд, повтор в тот же день не продлевает серию, пропуск начинает новую"""
+        stats = self.add_days(HabitStats(), [0, 1, 1, 2, 4])
+
+        self.assertEqual((stats.current_streak, stats.best_streak, stats.total_completions), (1, 3, 5))
+        self.assertEqual(stats.get_current_streak(self.day + timedelta(days=5)), 1)
+        self.assertEqual(stats.get_current_streak(self.day + timedelta(days=6)), 0)
+
+    def test_periodicity(self):
+        """Для привычки раз в N дней серия не прерывается между повторениями, доля считается от повторений"""
+        stats = self.add_days(HabitStats(), [0, 2, 4], periodicity=2)
+        today = self.day + timedelta(days=6)
+
+        self.assertEqual(stats.get_current_streak(today, periodicity=2), 3)
+        self.assertEqual(stats.get_completion_rate(today, 7, periodicity=2), 0.75)
+        self.assertEqual(stats.get_completion_rate(today, 30, periodicity=2), 0.2)
+
+    def test_recent_days(self):
+        """В доле выполнений учитываются только дни окна, отметки задним числом попадают в окно"""
+        stats = self.add_days(HabitStats(), [0, 40, 45, 43])
+        today = self.day + timedelta(days=46)
+
+        self.assertEqual(stats.get_completed_days(today, 7), 3)
+        self.assertEqual(stats.get_completed_days(today, 30), 3)
+        self.assertEqual(stats.get_completed_days(today + timedelta(days=5), 7), 1)
+        self.assertEqual(stats.get_completed_days(today + timedelta(days=30), 30), 0)
+        self.assertEqual(stats.current_streak, 1)
+
+
+class HabitStatsTestCase(BaseTestCase):
+    """Статистика выполнений: обновление при записи отметок, пересчет и эндпоинты"""
+
+    def setUp(self):
+        super().setUp()
+        self.habit = self.create_habit(self.user_1, 'Зарядка')
+        self.now = timezone.now()
+        self.today = timezone.localtime(self.now).date()
+        self.patchers = [patch.object(HabitCompletionService, 'buffer_key', 'test:habits:completions'),
+                         patch.object(HabitCompletionService, 'lock_key', 'test:habits:completions:lock'),
+                         patch.object(HabitCompletionService, 'known_partitions', set())]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        get_redis().delete('test:habits:completions', 'test:habits:completions:lock')
+        for patcher in self.patchers:
+            patcher.stop()
+
+    @staticmethod
+    def create_habit(user, action):
+        return Habit.objects.create(user=user, place='Дом', time='09:00', action=action, is_pleasant=False,
+                                    periodicity=1, time_for_action=60)
+
+    def complete(self, habit, days_ago):
+        HabitCompletionService.record(habit.id, habit.user_id, self.now - timedelta(days=days_ago))
+
+    def test_flush_updates_stats(self):
+        """Запись пачки отметок обновляет статистику привычки и пользователя, чтение - одним запросом"""
+        for days_ago in [2, 1, 0]:
+            self.complete(self.habit, days_ago)
+        other_habit = self.create_habit(self.user_1, 'Чтение')
+        self.complete(other_habit, 0)
+        HabitCompletionService.flush()
+
+        with self.assertNumQueries(2):
+            response = self.user_clients[0].get(f'/api/habits/{self.habit.id}/stats/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'current_streak': 3, 'best_streak': 3, 'total_completions': 3,
+            'last_completed_on': self.today.isoformat(), 'completion_rate_7d': 0.43, 'completion_rate_30d': 0.1,
+        })
+
+        with self.assertNumQueries(2):
+            response = self.user_clients[0].get('/api/stats/')
+
+        self.assertEqual(response.json()['current_streak'], 3)
+        self.assertEqual(response.json()['total_completions'], 4)
+
+    def test_stats_without_completions(self):
+        """У привычки без отметок нулевая статистика, статистика чужой привычки недоступна"""
+        response = self.user_clients[0].get(f'/api/habits/{self.habit.id}/stats/')
+        self.assertEqual(response.json(), {
+            'current_streak': 0, 'best_streak': 0, 'total_completions': 0,
+            'last_completed_on': None, 'completion_rate_7d': 0.0, 'completion_rate_30d': 0.0,
+        })
+        self.assertEqual(self.user_clients[1].get('/api/stats/').json()['total_completions'], 0)
+
+        response = self.user_clients[1].get(f'/api/habits/{self.habit.id}/stats/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(HABIT_STATS_REBUILD_BATCH_SIZE=1)
+    def test_rebuild(self):
+        """Пересчет по журналу исправляет серии после отметок задним числом и не дублирует выполнения"""
+        other_habit = self.create_habit(self.user_2, 'Чтение')
+        self.complete(self.habit, 0)
+        self.complete(other_habit, 0)
+        HabitCompletionService.flush()
+        self.complete(self.habit, 1)
+        HabitCompletionService.flush()
+
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).current_streak, 1)
+
+        rebuild_completion_stats()
+
+        habit_stats = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual((habit_stats.current_streak, habit_stats.best_streak, habit_stats.total_completions),
+                         (2, 2, 2))
+        self.assertEqual(UserStats.objects.get(user=self.user_1).current_streak, 2)
+        self.assertEqual(HabitStats.objects.get(habit=other_habit).total_completions, 1)
+
+
 class PublicHabitsListAPITestCase(BaseTestCase):
     """Просмотр публичных привычек"""
 
     def setUp(self):
         super().setUp()
+        cache.clear()
         self.url = '/api/habits/public'
         self.habit_data = {
             "place": "Работа",
@@ -506,16 +1031,18 @@ class PublicHabitsListAPITestCase(BaseTestCase):
             "time_for_action": 60,
         }
 
-    def create_habit(self, user, is_public):
+    def create_habit(self, user, is_public, action=None):
         habit_data = self.habit_data.copy()
         habit_data['user'] = user
         habit_data['is_public'] = is_public
+        if action:
+            habit_data['action'] = action
         return Habit.objects.create(**habit_data)
 
     def test_public_habits_list(self):
         """Всем авторизованным пользователям доступен список публичных привычек"""
         self.create_habit(self.user_1, is_public=True)
-        self.create_habit(self.user_1, is_public=True)
+        self.create_habit(self.user_1, is_public=True, action='Разобрать почту')
         self.create_habit(self.user_2, is_public=False)
 
         response = self.user_clients[0].get(self.url)
@@ -530,25 +1057,845 @@ class PublicHabitsListAPITestCase(BaseTestCase):
         self.assertEqual(first_habit['user']['first_name'], self.user_1.first_name)
         self.assertEqual(first_habit['user']['last_name'], self.user_1.last_name)
 
+    def test_public_habits_list_queries(self):
+        """Количество запросов к БД не зависит от количества привычек и пользователей на странице"""
+        for i in range(5):
+            user = CustomUser.objects.create(email=f'user_{i}@mail.ru', first_name=f'User {i}')
+            habit_data = dict(self.habit_data, related_habit=None)
+            Habit.objects.create(user=user, is_public=True, **habit_data)
+
+        with self.assertNumQueries(3):
+            response = self.user_clients[0].get(self.url)
+
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_lean_serializer_matches_model_serializer(self):
+        """Облегченный сериализатор возвращает те же данные, что и PublicHabitSerializer"""
+        pleasant_habit = self.create_habit(self.user_2, is_public=True)
+        habit_data = dict(self.habit_data, action='Прогулка', reward=None, related_habit=pleasant_habit)
+        Habit.objects.create(user=self.user_1, is_public=True, **habit_data)
+        queryset = Habit.objects.filter(is_public=True).order_by('id')
+
+        expected = PublicHabitSerializer(queryset, many=True).data
+        actual = PublicHabitListSerializer(queryset.values(*PUBLIC_HABIT_VALUES), many=True).data
+
+        self.assertEqual(actual, expected)
+
+    def test_public_habits_list_is_cached(self):
+        """Список берется из кеша, пока публичные привычки не изменятся через API"""
+        self.create_habit(self.user_1, is_public=True)
+        self.user_clients[0].get(self.url)
+
+        habit_data = dict(self.habit_data, action='Не через API')
+        Habit.objects.create(user=self.user_1, is_public=True, **habit_data)
+        cached_response = self.user_clients[0].get(self.url)
+
+        habit_data = dict(self.habit_data, action='Через API', is_public=True)
+        self.user_clients[1].post('/api/habits/', habit_data)
+        fresh_response = self.user_clients[0].get(self.url)
+
+        self.assertEqual(len(cached_response.json()['results']), 1)
+        self.assertEqual(len(fresh_response.json()['results']), 3)
+
+    def test_public_habits_not_modified(self):
+        """Повторный запрос с ETag получает 304, пока привычка не станет приватной"""
+        habit = self.create_habit(self.user_1, is_public=True)
+
+        response = self.user_clients[0].get(self.url)
+        etag = response['ETag']
+        not_modified_response = self.user_clients[0].get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.user_clients[0].patch(f'/api/habits/{habit.id}/', {'is_public': False})
+        modified_response = self.user_clients[0].get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertEqual(not_modified_response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(modified_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(modified_response.json()['results'], [])
+
+    def test_public_habits_cache_is_per_host(self):
+        """Страница, закешированная для одного хоста, не отдается с его ссылками другому хосту"""
+        for i in range(3):
+            self.create_habit(self.user_1, is_public=True, action=f'Привычка {i}')
+        params = {'pagination': 'keyset', 'page_size': 1}
+
+        first_host = self.user_clients[0].get(self.url, params, HTTP_HOST='web:8000').json()
+        second_host = self.user_clients[0].get(self.url, params, HTTP_HOST='localhost').json()
+
+        self.assertTrue(first_host['next'].startswith('http://web:8000/'))
+        self.assertTrue(second_host['next'].startswith('http://localhost/'))
+
+    def test_public_habits_last_modified_increases(self):
+        """После изменения в ту же секунду Last-Modified новее, чем у полученной ранее ленты"""
+        habit = self.create_habit(self.user_1, is_public=True)
+
+        with patch('app_habit.services.public_habits_cache.time') as mock_time:
+            mock_time.time.return_value = 1700000000.2
+            PublicHabitsCacheService.invalidate()
+            response = self.user_clients[0].get(self.url)
+            self.user_clients[0].patch(f'/api/habits/{habit.id}/', {'is_public': False})
+            modified_response = self.user_clients[0].get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(modified_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(modified_response.json()['results'], [])
+
+    def test_profile_change_invalidates_public_habits(self):
+        """Изменение данных пользователя, показываемых в ленте, сбрасывает кеш ленты"""
+        self.create_habit(self.user_1, is_public=True)
+        self.user_clients[0].get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_clients[0].patch('/api/profile/', {'first_name': 'Новое имя'}, format='json')
+        response = self.user_clients[0].get(self.url)
+
+        self.assertEqual(response.json()['results'][0]['user']['first_name'], 'Новое имя')
+
+    def test_public_habits_keyset_pagination(self):
+        """Пагинация по ключу: страницы идут по возрастанию ID, без подсчета общего количества"""
+        habit_ids = []
+        for i in range(7):
+            habit_data = dict(self.habit_data, action=f'Привычка {i}')
+            habit_ids.append(Habit.objects.create(user=self.user_1, is_public=True, **habit_data).id)
+        self.create_habit(self.user_2, is_public=False)
+
+        response = self.user_clients[0].get(self.url, {'pagination': 'keyset', 'page_size': 3})
+        first_page = response.json()
+        second_page = self.user_clients[0].get(first_page['next']).json()
+        third_page = self.user_clients[0].get(second_page['next']).json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', first_page)
+        self.assertEqual(len(first_page['results']), 3)
+        self.assertIn(f'after={habit_ids[2]}', first_page['next'])
+        self.assertEqual(len(second_page['results']), 3)
+        self.assertEqual(len(third_page['results']), 1)
+        self.assertIsNone(third_page['next'])
+
+    def test_public_habits_page_size_is_capped(self):
+        """Размер страницы, запрошенный клиентом, ограничен сервером"""
+        with patch('app_habit.pagination.KeysetPagination.max_page_size', 2):
+            for i in range(3):
+                habit_data = dict(self.habit_data, action=f'Привычка {i}')
+                Habit.objects.create(user=self.user_1, is_public=True, **habit_data)
+
+            response = self.user_clients[0].get(self.url, {'pagination': 'keyset', 'page_size': 1000})
+
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+@override_settings(BOT_SERVICE_TOKEN='service-token')
+class TelegramHabitsAPITestCase(APITestCase):
+    """Внутренний API привычек для Telegram-бота"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='ivan@mail.ru', tg_id=123456789, is_connected_to_tg=True)
+        other_user = CustomUser.objects.create(email='max@mail.ru', tg_id=987654321, is_connected_to_tg=True)
+        self.url = f'/api/internal/telegram/{self.user.tg_id}/habits/'
+        self.headers = {'HTTP_X_SERVICE_TOKEN': 'service-token'}
+        self.moment = timezone.make_aware(datetime(2023, 7, 1, 12, 0))
+        self.daily = self.create_habit(self.user, '09:00', 1, timezone.make_aware(datetime(2023, 7, 2, 9, 0)))
+        self.every_other_day = self.create_habit(self.user, '08:00', 2,
+                                                 timezone.make_aware(datetime(2023, 7, 2, 8, 0)))
+        self.create_habit(other_user, '10:00', 1, timezone.make_aware(datetime(2023, 7, 2, 10, 0)))
+
+    @staticmethod
+    def create_habit(user, time, periodicity, next_reminder_at):
+        return Habit.objects.create(user=user, place='Дом', time=time, periodicity=periodicity,
+                                    action=f'Привычка {time}', is_pleasant=False, time_for_action=60,
+                                    next_reminder_at=next_reminder_at)
+
+    def test_service_token_required(self):
+        """Без сервисного токена или с неверным токеном доступ запрещен, JWT не нужен"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(self.url, HTTP_X_SERVICE_TOKEN='wrong')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(BOT_SERVICE_TOKEN='')
+    def test_disabled_without_token_setting(self):
+        """Если токен не настроен, внутренний API закрыт"""
+        response = self.client.get(self.url, HTTP_X_SERVICE_TOKEN='')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_habits(self):
+        """Возвращаются только привычки пользователя и только поля для бота, одним запросом"""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [
+            {'id': self.every_other_day.id, 'action': 'Привычка 08:00', 'place': 'Дом', 'time': '08:00'},
+            {'id': self.daily.id, 'action': 'Привычка 09:00', 'place': 'Дом', 'time': '09:00'},
+        ])
+
+    @patch('app_habit.services.bot_habit_service.timezone.now')
+    def test_today_habits(self, mock_now):
+        """Сегодняшние привычки - с учетом периодичности, в том числе уже отправленные сегодня"""
+        mock_now.return_value = self.moment
+
+        response = self.client.get(self.url, {'today': 1}, **self.headers)
+
+        self.assertEqual([habit['id'] for habit in response.json()], [self.daily.id])
+
+        mock_now.return_value = self.moment + timedelta(days=1)
+        response = self.client.get(self.url, {'today': 1}, **self.headers)
+
+        self.assertEqual([habit['id'] for habit in response.json()], [self.every_other_day.id, self.daily.id])
+
+    @patch.object(HabitCompletionService, 'buffer_key', 'test:habits:completions')
+    def test_complete_habit(self):
+        """Бот отмечает выполнение только привычки этого пользователя, с сервисным токеном"""
+        url = f'{self.url}{self.daily.id}/done/'
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.assertNumQueries(1):
+            response = self.client.post(url, **self.headers)
+        other_url = f'/api/internal/telegram/987654321/habits/{self.daily.id}/done/'
+        other_response = self.client.post(other_url, **self.headers)
+        buffered = get_redis().lrange('test:habits:completions', 0, -1)
+        get_redis().delete('test:habits:completions')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(other_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual([HabitCompletionService.parse(item)[1:3] for item in buffered],
+                         [(self.daily.id, self.user.id)])
+
+
+class HabitQueryPlanTestCase(APITestCase):
+    """Планы запросов к привычкам используют индексы"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='ivan@mail.ru')
+
+    @staticmethod
+    def explain(queryset):
+        """
+        Возвращает план запроса. Последовательное сканирование отключено, чтобы на пустой
+        тестовой таблице планировщик выбирал индекс так же, как на больших данных.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_duplicate_action_lookup_uses_unique_index(self):
+        plan = self.explain(Habit.objects.filter(user=self.user, action='Почистить спам'))
+        self.assertIn('habits_user_action_uniq', plan)
+
+    def test_public_habits_use_partial_index(self):
+        plan = self.explain(Habit.objects.filter(is_public=True).order_by('id').values(*PUBLIC_HABIT_VALUES))
+        self.assertIn('habits_public_id_idx', plan)
+
+    def test_due_habits_use_next_reminder_at_index(self):
+        moment = timezone.make_aware(datetime(2023, 7, 1, 9, 0))
+        plan = self.explain(ReminderService.get_due_habits(moment))
+        self.assertIn('habits_next_reminder_at_idx', plan)
+
 
 class SendReminderTestCase(APITestCase):
     """Отправка напоминания"""
 
-    @patch('app_habit.models.Habit.objects.get')
-    @patch('app_habit.tasks.send_message_to_user')
-    def test_send_reminder(self, mock_send_message, mock_habit_get):
-        """Функция отправки напоминания вызывается с правильным сообщением"""
-        mock_habit = mock_habit_get.return_value
-        mock_habit.action = "Тестовая привычка"
-        mock_habit.place = "Тестовое место"
-        mock_habit.related_habit = None
-        mock_habit.reward = "Тестовое вознаграждение"
-        mock_habit.user.tg_id = 123456789
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='ivan@mail.ru', tg_id=123456789, is_connected_to_tg=True)
+        self.pleasant_habit = Habit.objects.create(place="Дом", time="09:00", action="Выпить кофе",
+                                                   is_pleasant=True, time_for_action=60, user=self.user)
 
-        send_reminder(1)
+    def test_build_messages_with_reward(self):
+        """Напоминание о привычке с вознаграждением содержит вознаграждение"""
+        habit = Habit.objects.create(place="Тестовое место", time="09:00", action="Тестовая привычка",
+                                     is_pleasant=False, reward="Тестовое вознаграждение", time_for_action=60,
+                                     user=self.user)
 
         message = ("⏰ Пора выполнить привычку: Тестовая привычка\n"
                    "📍 Тестовое место\n "
                    "🎁 Твое вознаграждение: Тестовое вознаграждение")
 
-        mock_send_message.assert_called_once_with(123456789, message)
+        self.assertEqual(ReminderService.build_messages([habit.id]), [(123456789, message)])
+
+    def test_build_payloads_with_one_query(self):
+        """Напоминания для пачки привычек собираются одним запросом к БД"""
+        other_user = CustomUser.objects.create(email='max@mail.ru', tg_id=987654321, is_connected_to_tg=True)
+        habit_ids = [
+            Habit.objects.create(place="Работа", time="09:00", action=f"Привычка {i}", is_pleasant=False,
+                                 related_habit=self.pleasant_habit, time_for_action=60,
+                                 user=self.user if i % 2 else other_user).id
+            for i in range(10)
+        ]
+
+        with self.assertNumQueries(1):
+            payloads = ReminderService.build_payloads(habit_ids)
+
+        self.assertEqual([payload['habit_id'] for payload in payloads], habit_ids)
+        self.assertEqual(payloads[0]['tg_id'], 987654321)
+        self.assertEqual(payloads[1]['tg_id'], 123456789)
+        self.assertEqual(payloads[0]['message'], "⏰ Пора выполнить привычку: Привычка 0\n"
+                                                 "📍 Работа\n"
+                                                 "После этого ты сможешь Выпить кофе 🙂\n")
+
+    def test_build_payloads_skips_users_without_telegram(self):
+        """Привычки пользователей без Telegram пропускаются"""
+        user = CustomUser.objects.create(email='max@mail.ru')
+        habit = Habit.objects.create(place="Дом", time="09:00", action="Зарядка", is_pleasant=False,
+                                     time_for_action=60, user=user)
+
+        self.assertEqual(ReminderService.build_payloads([habit.id]), [])
+
+    @patch('app_habit.tasks.send_telegram_messages.delay')
+    def test_send_reminders(self, mock_delay):
+        """Напоминания о пачке привычек передаются в Telegram одной задачей"""
+        habits = [
+            Habit.objects.create(place="Дом", time="09:00", action=action, is_pleasant=False,
+                                 time_for_action=60, user=self.user)
+            for action in ("Зарядка", "Чтение")
+        ]
+
+        send_reminders([habit.id for habit in habits])
+
+        mock_delay.assert_called_once_with([
+            {'habit_id': habits[0].id, 'tg_id': 123456789, 'message': "⏰ Пора выполнить привычку: Зарядка\n📍 Дом\n"},
+            {'habit_id': habits[1].id, 'tg_id': 123456789, 'message': "⏰ Пора выполнить привычку: Чтение\n📍 Дом\n"},
+        ], None)
+
+
+class DispatchDueRemindersTestCase(APITestCase):
+    """Выбор привычек, напоминания о которых нужно отправить в текущую минуту"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='ivan@mail.ru', tg_id=123456789, is_connected_to_tg=True)
+        self.habit_data = {
+            "place": "Работа",
+            "is_pleasant": False,
+            "time_for_action": 60,
+            "user": self.user,
+        }
+        self.start = self.aware(2023, 7, 1, 8, 59)
+        self.moment = self.aware(2023, 7, 1, 9, 0)
+        self.slot = int(self.moment.timestamp())
+
+    @staticmethod
+    def aware(*args):
+        return timezone.make_aware(datetime(*args))
+
+    def create_habit(self, time, periodicity, next_reminder_at=None):
+        action = f'Привычка {Habit.objects.count()}'
+        next_reminder_at = next_reminder_at or Habit.get_first_reminder_at(time, self.start)
+        return Habit.objects.create(time=time, periodicity=periodicity, action=action,
+                                    next_reminder_at=next_reminder_at, **self.habit_data)
+
+    def test_first_reminder_at(self):
+        """Первое напоминание - ближайшее наступление времени привычки"""
+        self.assertEqual(Habit.get_first_reminder_at('09:00', self.start), self.moment)
+        self.assertEqual(Habit.get_first_reminder_at('09:00', self.moment), self.aware(2023, 7, 2, 9, 0))
+
+    def test_following_reminder_at(self):
+        """Следующее напоминание через периодичность дней, без сброса в начале месяца"""
+        reminder_at = self.aware(2023, 7, 31, 9, 0)
+        nine = reminder_at.time()
+
+        self.assertEqual(ReminderService.get_following_reminder_at(reminder_at, nine, 1, reminder_at),
+                         self.aware(2023, 8, 1, 9, 0))
+        self.assertEqual(ReminderService.get_following_reminder_at(reminder_at, nine, 2, reminder_at),
+                         self.aware(2023, 8, 2, 9, 0))
+        self.assertEqual(ReminderService.get_following_reminder_at(reminder_at, nine, 3,
+                                                                   self.aware(2023, 8, 5, 12, 0)),
+                         self.aware(2023, 8, 6, 9, 0))
+
+    def test_first_reminder_in_user_timezone(self):
+        """Время привычки считается по часовому поясу пользователя и хранится в UTC"""
+        vladivostok = ZoneInfo('Asia/Vladivostok')
+
+        reminder_at = Habit.get_first_reminder_at('09:00', self.start, vladivostok)
+
+        self.assertEqual(reminder_at, datetime(2023, 7, 1, 23, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(reminder_at.astimezone(vladivostok).time(), dt_time(9, 0))
+
+    def test_following_reminder_across_dst(self):
+        """При переводе часов местное время напоминания сохраняется, меняется только UTC-время"""
+        new_york = ZoneInfo('America/New_York')
+        reminder_at = datetime(2023, 3, 11, 14, 0, tzinfo=dt_timezone.utc)
+
+        following = ReminderService.get_following_reminder_at(reminder_at, dt_time(9, 0), 1, reminder_at, new_york)
+
+        self.assertEqual(following, datetime(2023, 3, 12, 13, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(following.astimezone(new_york).time(), dt_time(9, 0))
+
+    def test_reminder_in_dst_gap(self):
+        """Несуществующее из-за перевода часов время сдвигается, на следующий день время прежнее"""
+        new_york = ZoneInfo('America/New_York')
+        moment = datetime(2023, 3, 12, 5, 0, tzinfo=dt_timezone.utc)
+
+        reminder_at = Habit.get_first_reminder_at('02:30', moment, new_york)
+        following = ReminderService.get_following_reminder_at(reminder_at, dt_time(2, 30), 1, reminder_at, new_york)
+
+        self.assertEqual(reminder_at.astimezone(new_york).time(), dt_time(3, 30))
+        self.assertEqual(following.astimezone(new_york), datetime(2023, 3, 13, 2, 30, tzinfo=new_york))
+
+    def test_due_habits_of_all_timezones(self):
+        """Один проход выбирает привычки всех часовых поясов и сдвигает их по часовому поясу владельца"""
+        user = CustomUser.objects.create(email='john@mail.com', tg_id=987654321, timezone='America/New_York')
+        local = self.create_habit('09:00', 1)
+        new_york = Habit.objects.create(user=user, place='Дом', time='02:00', action='Привычка', is_pleasant=False,
+                                        time_for_action=60, next_reminder_at=self.moment)
+
+        batches = list(ReminderService.iter_due_batches(self.moment))
+
+        self.assertEqual(batches, [(self.slot, [local.id, new_york.id])])
+        new_york.refresh_from_db()
+        self.assertEqual(new_york.next_reminder_at, datetime(2023, 7, 2, 6, 0, tzinfo=dt_timezone.utc))
+
+    def test_due_habits(self):
+        """Выбираются привычки, время напоминания о которых наступило"""
+        daily = self.create_habit('09:00', 1)
+        every_other_day = self.create_habit('09:00', 2)
+        self.create_habit('09:01', 1)
+
+        self.assertEqual(list(ReminderService.get_due_habits(self.moment)), [daily, every_other_day])
+
+    def test_due_habits_are_advanced(self):
+        """После выбора время напоминания сдвигается на периодичность, повторно привычки не выбираются"""
+        daily = self.create_habit('09:00', 1)
+        every_other_day = self.create_habit('09:00', 2)
+
+        batches = list(ReminderService.iter_due_batches(self.moment))
+
+        self.assertEqual(batches, [(self.slot, [daily.id, every_other_day.id])])
+        self.assertEqual(list(ReminderService.iter_due_batches(self.moment)), [])
+        daily.refresh_from_db()
+        every_other_day.refresh_from_db()
+        self.assertEqual(daily.next_reminder_at, self.aware(2023, 7, 2, 9, 0))
+        self.assertEqual(every_other_day.next_reminder_at, self.aware(2023, 7, 3, 9, 0))
+
+    @override_settings(REMINDER_BATCH_SIZE=2)
+    def test_due_habits_are_split_into_batches(self):
+        """ID привычек раздаются пачками размером REMINDER_BATCH_SIZE"""
+        habit_ids = [self.create_habit('09:00', 1).id for _ in range(5)]
+
+        batches = list(ReminderService.iter_due_batches(self.moment))
+
+        self.assertEqual(batches, [(self.slot, habit_ids[:2]), (self.slot, habit_ids[2:4]), (self.slot, habit_ids[4:])])
+
+    @override_settings(REMINDER_CATCH_UP_MINUTES=60)
+    def test_stale_reminders_are_skipped(self):
+        """Напоминания, опоздавшие больше чем на REMINDER_CATCH_UP_MINUTES, не отправляются, но сдвигаются"""
+        late = self.create_habit('08:30', 1, next_reminder_at=self.aware(2023, 7, 1, 8, 30))
+        stale = self.create_habit('06:00', 1, next_reminder_at=self.aware(2023, 6, 29, 6, 0))
+
+        batches = list(ReminderService.iter_due_batches(self.moment))
+
+        self.assertEqual(batches, [(int(late.next_reminder_at.timestamp()), [late.id])])
+        stale.refresh_from_db()
+        self.assertEqual(stale.next_reminder_at, self.aware(2023, 7, 2, 6, 0))
+
+    @patch('app_habit.tasks.send_reminders.delay')
+    @patch('django.utils.timezone.now')
+    def test_dispatch_due_reminders(self, mock_now, mock_delay):
+        """Задача ставит в очередь напоминания только о привычках текущей минуты"""
+        habit = self.create_habit('09:00', 1)
+        self.create_habit('10:00', 1)
+        mock_now.return_value = self.aware(2023, 7, 1, 9, 0, 12)
+
+        dispatch_due_reminders()
+
+        mock_delay.assert_called_once_with([habit.id], self.slot)
+
+    @override_settings(REMINDER_DELIVERY='async')
+    @patch('app_habit.tasks.send_reminders.delay')
+    @patch('app_habit.tasks.AsyncDeliveryService.enqueue')
+    @patch('django.utils.timezone.now')
+    def test_dispatch_due_reminders_to_async_queue(self, mock_now, mock_enqueue, mock_delay):
+        """При асинхронной доставке напоминания попадают в очередь Redis, задачи Celery не ставятся"""
+        habit = self.create_habit('09:00', 1)
+        mock_now.return_value = self.aware(2023, 7, 1, 9, 0, 12)
+
+        dispatch_due_reminders()
+
+        mock_enqueue.assert_called_once_with([habit.id], self.slot)
+        mock_delay.assert_not_called()
+
+
+class TimingWheelTestCase(SimpleTestCase):
+    """Иерархическое колесо таймеров"""
+
+    def advance(self, wheel, to_minute):
+        return list(wheel.advance(to_minute))
+
+    def test_timers_fire_at_their_minute(self):
+        """Таймеры всех уровней срабатывают в свою минуту"""
+        wheel = TimingWheel(current=0)
+        timers = {1: 5, 2: 59, 3: 60, 4: 61, 5: 1439, 6: 1440, 7: 3 * 1440 + 17, 8: 30 * 1440}
+        for key, minute in timers.items():
+            wheel.add(key, minute)
+
+        fired = self.advance(wheel, 31 * 1440)
+
+        self.assertEqual(fired, [(minute, [key]) for key, minute in sorted(timers.items(), key=lambda item: item[1])])
+        self.assertEqual(len(wheel), 0)
+
+    def test_timers_fire_in_steps(self):
+        """Таймер не срабатывает раньше времени"""
+        wheel = TimingWheel(current=100)
+        wheel.add(1, 250)
+
+        self.assertEqual(self.advance(wheel, 249), [])
+        self.assertEqual(self.advance(wheel, 250), [(250, [1])])
+
+    def test_remove_and_reschedule(self):
+        """Удаленный таймер не срабатывает, перенесенный срабатывает только в новую минуту"""
+        wheel = TimingWheel(current=0)
+        wheel.add(1, 10)
+        wheel.add(2, 10)
+        wheel.add(2, 2000)
+        wheel.remove(1)
+
+        self.assertEqual(self.advance(wheel, 1999), [])
+        self.assertEqual(self.advance(wheel, 2000), [(2000, [2])])
+
+    def test_past_timer_fires_on_next_advance(self):
+        """Таймер на уже прошедшую минуту срабатывает при следующем сдвиге"""
+        wheel = TimingWheel(current=10)
+        wheel.add(1, 5)
+
+        self.assertEqual(self.advance(wheel, 10), [(5, [1])])
+
+
+def count_reminders(batches):
+    return sum(len(habit_ids) for _, habit_ids in batches)
+
+
+class ReminderSchedulerTestCase(APITestCase):
+    """Планировщик напоминаний на колесе таймеров"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='ivan@mail.ru', tg_id=123456789, is_connected_to_tg=True)
+        self.stream_key_patcher = patch.object(HabitEventService, 'stream_key', 'test:habits:changes')
+        self.stream_key_patcher.start()
+        self.scheduler = ReminderScheduler(catch_up_minutes=30)
+        self.start = timezone.make_aware(datetime(2023, 7, 1, 8, 58))
+
+    def tearDown(self):
+        get_redis().delete('test:habits:changes')
+        self.stream_key_patcher.stop()
+
+    def create_habit(self, time, periodicity, next_reminder_at=None):
+        action = f'Привычка {Habit.objects.count()}'
+        next_reminder_at = next_reminder_at or Habit.get_first_reminder_at(time, self.start)
+        return Habit.objects.create(user=self.user, place='Работа', time=time, periodicity=periodicity,
+                                    action=action, is_pleasant=False, time_for_action=60,
+                                    next_reminder_at=next_reminder_at)
+
+    def get_minute(self, *args):
+        return ReminderScheduler.to_minute(timezone.make_aware(datetime(*args)))
+
+    def get_slot(self, *args):
+        return int(timezone.make_aware(datetime(*args)).timestamp())
+
+    @patch('app_habit.services.scheduler_service.enqueue_reminders', side_effect=count_reminders)
+    def test_tick_dispatches_due_habits(self, mock_enqueue):
+        """Напоминания ставятся в очередь в свою минуту, таймеры переставляются на следующее напоминание"""
+        daily = self.create_habit('09:00', 1)
+        every_other_day = self.create_habit('09:00', 2)
+        later = self.create_habit('09:01', 1)
+        self.scheduler.load(self.get_minute(2023, 7, 1, 8, 58))
+
+        self.scheduler.tick(self.get_minute(2023, 7, 1, 9, 0))
+        self.scheduler.tick(self.get_minute(2023, 7, 1, 9, 1))
+
+        self.assertEqual([list(enqueue_call.args[0]) for enqueue_call in mock_enqueue.call_args_list], [
+            [(self.get_slot(2023, 7, 1, 9, 0), [daily.id, every_other_day.id])],
+            [(self.get_slot(2023, 7, 1, 9, 1), [later.id])],
+        ])
+        self.assertEqual(self.scheduler.wheel.get(daily.id), self.get_minute(2023, 7, 2, 9, 0))
+        self.assertEqual(self.scheduler.wheel.get(every_other_day.id), self.get_minute(2023, 7, 3, 9, 0))
+        every_other_day.refresh_from_db()
+        self.assertEqual(every_other_day.next_reminder_at, timezone.make_aware(datetime(2023, 7, 3, 9, 0)))
+
+    @patch('app_habit.services.scheduler_service.enqueue_reminders', return_value=0)
+    def test_apply_changes_from_stream(self, mock_enqueue):
+        """Изменения привычек из потока Redis переставляют и удаляют таймеры"""
+        moved = self.create_habit('09:00', 1)
+        deleted = self.create_habit('09:00', 1)
+        self.scheduler.load(self.get_minute(2023, 7, 1, 8, 58))
+
+        moved.next_reminder_at = timezone.make_aware(datetime(2023, 7, 1, 9, 30))
+        moved.save()
+        HabitEventService.record([moved.id, deleted.id])
+        deleted.delete()
+        HabitEventService.process()
+        self.scheduler.apply_changes()
+
+        self.assertEqual(self.scheduler.wheel.get(moved.id), self.get_minute(2023, 7, 1, 9, 30))
+        self.assertNotIn(deleted.id, self.scheduler.wheel)
+
+    @patch('app_habit.services.scheduler_service.enqueue_reminders', side_effect=count_reminders)
+    def test_fired_habit_changed_in_db_is_rescheduled(self, mock_enqueue):
+        """Если привычка уже перенесена в БД, а изменение еще не дошло через поток, таймер берется из БД"""
+        habit = self.create_habit('09:00', 1)
+        self.scheduler.load(self.get_minute(2023, 7, 1, 8, 58))
+        Habit.objects.filter(id=habit.id).update(next_reminder_at=timezone.make_aware(datetime(2023, 7, 1, 10, 0)))
+
+        dispatched = self.scheduler.tick(self.get_minute(2023, 7, 1, 9, 0))
+
+        self.assertEqual(dispatched, 0)
+        self.assertEqual(self.scheduler.wheel.get(habit.id), self.get_minute(2023, 7, 1, 10, 0))
+
+    @patch('app_habit.services.scheduler_service.enqueue_reminders', side_effect=count_reminders)
+    def test_catch_up_after_downtime(self, mock_enqueue):
+        """После простоя отправляются только напоминания, опоздавшие не больше чем на catch_up_minutes"""
+        stale = self.create_habit('08:00', 1, timezone.make_aware(datetime(2023, 7, 1, 8, 0)))
+        missed = self.create_habit('08:45', 1, timezone.make_aware(datetime(2023, 7, 1, 8, 45)))
+        now_minute = self.get_minute(2023, 7, 1, 9, 0)
+
+        self.scheduler.load(now_minute - 1)
+        dispatched = self.scheduler.tick(now_minute)
+
+        self.assertEqual(dispatched, 1)
+        self.assertEqual(list(mock_enqueue.call_args.args[0]), [(self.get_slot(2023, 7, 1, 8, 45), [missed.id])])
+        self.assertEqual(self.scheduler.wheel.get(stale.id), self.get_minute(2023, 7, 2, 8, 0))
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    """Ограничение частоты запросов"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.bucket = TokenBucket(rate=2, clock=lambda: self.now)
+
+    def test_reserve(self):
+        """Пока есть токены, ждать не нужно, затем время ожидания растет на 1/rate"""
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0.5)
+        self.assertEqual(self.bucket.reserve(), 1.0)
+
+    def test_tokens_are_refilled(self):
+        """Токены восстанавливаются со временем, но не больше capacity"""
+        self.bucket.reserve()
+        self.bucket.reserve()
+        self.now = 10.0
+
+        self.assertTrue(self.bucket.is_full())
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0.5)
+
+
+@override_settings(TELEGRAM_GLOBAL_RATE_LIMIT=1000, TELEGRAM_CHAT_RATE_LIMIT=1000, TELEGRAM_MAX_RETRIES=2)
+@patch('app_habit.services.telegram_service.time.sleep')
+class TelegramServiceTestCase(SimpleTestCase):
+    """Отправка сообщений через Telegram Bot API"""
+
+    @staticmethod
+    def create_response(status_code, json=None):
+        response = Mock(status_code=status_code, headers={}, text='')
+        response.json.return_value = json or {}
+        return response
+
+    def test_send_messages_over_one_session(self, mock_sleep):
+        """Пачка сообщений отправляется через одну сессию"""
+        session = Mock()
+        session.post.return_value = self.create_response(200)
+        service = TelegramService(session=session)
+
+        sent = service.send_messages([(1, 'Первое'), (2, 'Второе')])
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(session.post.call_count, 2)
+        self.assertEqual(session.post.call_args.kwargs['data'], {'chat_id': 2, 'text': 'Второе'})
+
+    def test_retry_on_too_many_requests(self, mock_sleep):
+        """При ответе 429 сообщение отправляется повторно после retry_after секунд"""
+        session = Mock()
+        session.post.side_effect = [
+            self.create_response(429, {'parameters': {'retry_after': 3}}),
+            self.create_response(200),
+        ]
+        service = TelegramService(session=session)
+
+        self.assertTrue(service.send_message(1, 'Текст'))
+        self.assertEqual(session.post.call_count, 2)
+        mock_sleep.assert_called_with(3.0)
+
+    def test_give_up_after_retries(self, mock_sleep):
+        """При постоянных ошибках 5xx отправка прекращается после TELEGRAM_MAX_RETRIES повторов"""
+        session = Mock()
+        session.post.return_value = self.create_response(502)
+        service = TelegramService(session=session)
+
+        self.assertFalse(service.send_message(1, 'Текст'))
+        self.assertEqual(session.post.call_count, 3)
+
+    def test_no_retry_on_client_error(self, mock_sleep):
+        """Ошибки 4xx, кроме 429, не повторяются"""
+        session = Mock()
+        session.post.return_value = self.create_response(403)
+        service = TelegramService(session=session)
+
+        self.assertFalse(service.send_message(1, 'Текст'))
+        self.assertEqual(session.post.call_count, 1)
+
+
+@override_settings(TELEGRAM_GLOBAL_RATE_LIMIT=1000, TELEGRAM_CHAT_RATE_LIMIT=1000, TELEGRAM_RETRY_BACKOFF=0)
+@patch.object(AsyncDeliveryService, 'queue_key', 'test:reminders:queue')
+@patch.object(AsyncDeliveryService, 'processing_key', 'test:reminders:processing')
+@patch.object(AsyncDeliveryService, 'lock_key', 'test:reminders:delivery-lock')
+class AsyncDeliveryServiceTestCase(APITestCase):
+    """Асинхронная доставка напоминаний из очереди"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='ivan@mail.ru', tg_id=123456789, is_connected_to_tg=True)
+        self.habits = [
+            Habit.objects.create(place="Дом", time="09:00", action=f"Привычка {i}", is_pleasant=False,
+                                 time_for_action=60, user=self.user)
+            for i in range(3)
+        ]
+        self.received = []
+        self.responses = []
+        self.slot = time.time_ns()
+
+    def tearDown(self):
+        get_redis().delete('test:reminders:queue', 'test:reminders:processing', 'test:reminders:delivery-lock')
+        get_redis().delete(*(ReminderDedupService.get_key(habit.id, self.slot) for habit in self.habits))
+
+    async def handle_send_message(self, request):
+        self.received.append(dict(await request.post()))
+        if self.responses:
+            payload, status_code = self.responses.pop(0)
+            return web.json_response(payload, status=status_code)
+        return web.json_response({'ok': True})
+
+    def deliver(self):
+        async def run():
+            app = web.Application()
+            app.router.add_post('/bot{token}/sendMessage', self.handle_send_message)
+            server = TestServer(app)
+            await server.start_server()
+            try:
+                with override_settings(TELEGRAM_API_URL=str(server.make_url('')).rstrip('/')):
+                    return await AsyncDeliveryService(concurrency=2, batch_size=2).run(drain=True)
+            finally:
+                await server.close()
+
+        return async_to_sync(run)()
+
+    def test_deliver_queued_reminders(self):
+        """Все напоминания из очереди доставляются, очередь опустошается"""
+        AsyncDeliveryService.enqueue([habit.id for habit in self.habits], self.slot)
+
+        sent = self.deliver()
+
+        self.assertEqual(sent, 3)
+        expected_messages = ReminderService.build_messages([habit.id for habit in self.habits])
+        self.assertEqual(sorted(message['text'] for message in self.received),
+                         [message for _, message in expected_messages])
+        self.assertEqual(get_redis().llen('test:reminders:queue'), 0)
+        self.assertEqual(get_redis().llen('test:reminders:processing'), 0)
+
+    def test_retry_on_server_error(self):
+        """Сообщение, на которое Telegram ответил ошибкой 5xx, отправляется повторно"""
+        self.responses.append(({'ok': False}, 502))
+        AsyncDeliveryService.enqueue([self.habits[0].id], self.slot)
+
+        sent = self.deliver()
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(len(self.received), 2)
+
+    def test_duplicates_are_dropped(self):
+        """Повторно поставленное в очередь напоминание на тот же слот не отправляется"""
+        AsyncDeliveryService.enqueue([self.habits[0].id], self.slot)
+        AsyncDeliveryService.enqueue([self.habits[0].id], self.slot)
+
+        sent = self.deliver()
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(len(self.received), 1)
+        self.assertEqual(get_redis().llen('test:reminders:processing'), 0)
+
+    def test_unacknowledged_reminders_are_restored(self):
+        """Напоминания, забранные из очереди упавшим потребителем, доставляются при следующем запуске"""
+        ReminderDedupService.claim([self.habits[0].id], self.slot)
+        get_redis().rpush('test:reminders:processing', f'{self.habits[0].id}:{self.slot}')
+        AsyncDeliveryService.enqueue([self.habits[1].id], self.slot)
+
+        sent = self.deliver()
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(self.received), 2)
+        self.assertEqual(get_redis().llen('test:reminders:processing'), 0)
+
+    def test_single_consumer(self):
+        """Пока очередь обрабатывает другой потребитель, запуск с drain ничего не забирает"""
+        AsyncDeliveryService.enqueue([self.habits[0].id], self.slot)
+        get_redis().set('test:reminders:delivery-lock', 'other-consumer', ex=30)
+
+        sent = self.deliver()
+
+        self.assertEqual(sent, 0)
+        self.assertEqual(self.received, [])
+        self.assertEqual(get_redis().llen('test:reminders:queue'), 1)
+
+    def test_failed_send_is_released(self):
+        """Неотправленное напоминание удаляется из обработки, отметка об отправке снимается"""
+        self.responses.append(({'ok': False, 'description': 'Bad Request: chat not found'}, 400))
+        AsyncDeliveryService.enqueue([self.habits[0].id], self.slot)
+
+        sent = self.deliver()
+
+        self.assertEqual(sent, 0)
+        self.assertEqual(get_redis().llen('test:reminders:processing'), 0)
+        self.assertFalse(get_redis().exists(ReminderDedupService.get_key(self.habits[0].id, self.slot)))
+
+
+class ReminderDedupServiceTestCase(SimpleTestCase):
+    """Защита от повторной отправки напоминаний"""
+
+    def setUp(self):
+        self.slot = time.time_ns()
+        self.habit_ids = [1, 2, 3]
+
+    def tearDown(self):
+        get_redis().delete(*(ReminderDedupService.get_key(habit_id, self.slot) for habit_id in self.habit_ids))
+
+    def test_claim(self):
+        """Напоминание в слот можно отправить только один раз, повторы учитываются в метрике"""
+        hits_before = MetricsService.get(ReminderDedupService.hits_metric)
+
+        self.assertEqual(ReminderDedupService.claim([1, 2], self.slot), [1, 2])
+        self.assertEqual(ReminderDedupService.claim([1, 2, 3], self.slot), [3])
+        self.assertEqual(ReminderDedupService.claim([1], self.slot + 60), [1])
+
+        get_redis().delete(ReminderDedupService.get_key(1, self.slot + 60))
+        self.assertEqual(MetricsService.get(ReminderDedupService.hits_metric) - hits_before, 2)
+
+    @patch('app_habit.tasks.ReminderService.build_messages')
+    def test_send_reminders_drops_duplicates_before_db(self, mock_build_messages):
+        """Повторная задача на тот же слот завершается без обращения к БД"""
+        ReminderDedupService.claim(self.habit_ids, self.slot)
+
+        send_reminders(self.habit_ids, self.slot)
+
+        mock_build_messages.assert_not_called()
+
+    @patch('app_habit.tasks.get_telegram_service')
+    def test_send_telegram_messages_drops_redelivered(self, mock_get_service):
+        """Повторно доставленная задача отправки не отправляет напоминания второй раз"""
+        mock_get_service.return_value.send_message.return_value = True
+        payloads = [{'habit_id': habit_id, 'tg_id': 100 + habit_id, 'message': 'Текст'} for habit_id in self.habit_ids]
+
+        send_telegram_messages(payloads, self.slot)
+        send_telegram_messages(payloads, self.slot)
+
+        self.assertEqual(mock_get_service.return_value.send_message.call_count, 3)
+
+    @patch('app_habit.tasks.get_telegram_service')
+    def test_failed_send_releases_reminder(self, mock_get_service):
+        """Если напоминание не отправлено, отметка снимается и повторная доставка его отправляет"""
+        send_message = mock_get_service.return_value.send_message
+        send_message.side_effect = lambda chat_id, text: chat_id != 102
+        payloads = [{'habit_id': habit_id, 'tg_id': 100 + habit_id, 'message': 'Текст'} for habit_id in self.habit_ids]
+
+        send_telegram_messages(payloads, self.slot)
+        self.assertFalse(get_redis().exists(ReminderDedupService.get_key(2, self.slot)))
+
+        send_message.reset_mock(side_effect=True)
+        send_message.return_value = True
+        send_telegram_messages(payloads, self.slot)
+
+        send_message.assert_called_once_with(102, 'Текст')
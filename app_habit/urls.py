@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import HabitViewSet, PublicHabitsAPIView
+from .views import (HabitViewSet, PublicHabitsAPIView, UserStatsAPIView, TelegramHabitsAPIView,
+                    TelegramHabitCompleteAPIView)
 
 router = DefaultRouter()
 router.register(r'habits', HabitViewSet, basename='habit')
@@ -9,4 +10,8 @@ router.register(r'habits', HabitViewSet, basename='habit')
 urlpatterns = [
     path('', include(router.urls)),
     path('habits/public', PublicHabitsAPIView.as_view(), name='public_habits'),
+    path('stats/', UserStatsAPIView.as_view(), name='user_stats'),
+    path('internal/telegram/<int:tg_id>/habits/', TelegramHabitsAPIView.as_view(), name='telegram_habits'),
+    path('internal/telegram/<int:tg_id>/habits/<int:habit_id>/done/', TelegramHabitCompleteAPIView.as_view(),
+         name='telegram_habit_complete'),
 ]
@@ -1,19 +1,29 @@
-from typing import List
+from typing import Any, Dict, List, Tuple
 
-from rest_framework import viewsets, status
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Habit
-from .serializers import HabitSerializer, PublicHabitSerializer
-from .services import ReminderService
-
-
-class CustomPageNumberPagination(PageNumberPagination):
-    page_size = 5
+from .models import Habit, HabitStats, UserStats
+from .pagination import HabitPagination
+from .permissions import HasServiceToken
+from .serializers import (HabitSerializer, HabitBulkUpdateSerializer, HabitBulkDeleteSerializer,
+                          HabitCompletionSerializer, CompletionStatsSerializer, PublicHabitSerializer,
+                          PublicHabitListSerializer, PUBLIC_HABIT_VALUES, parse_ids)
+from .services.bot_habit_service import BotHabitService
+from .services.completion_service import HabitCompletionService
+from .services.habit_event_service import HabitEventService
+from .services.public_habits_cache import PublicHabitsCacheService
+from .services.stats_service import HabitStatsService
 
 
 class HabitViewSet(viewsets.ModelViewSet):
@@ -24,7 +34,7 @@ class HabitViewSet(viewsets.ModelViewSet):
     queryset = Habit.get_all_habits()
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = HabitPagination
 
     def get_queryset(self) -> List[Habit]:
         """
@@ -34,78 +44,259 @@ class HabitViewSet(viewsets.ModelViewSet):
         В противном случае возвращается пустой QuerySet.
         """
         if self.request.user.is_authenticated:
-            return self.queryset.filter(user=self.request.user)
+            queryset = self.queryset.filter(user=self.request.user)
+            if self.action == 'stats':
+                queryset = queryset.select_related('stats')
+            return queryset
         return Habit.objects.none()
 
-    def create(self, request: Request, *args, **kwargs) -> Response:
+    def perform_create(self, serializer: HabitSerializer) -> None:
         """
-        Создание новой привычки и связанного с ней напоминания.
+        Выполняет создание привычки и автоматически присваивает ее текущему пользователю.
+        В той же транзакции записывает событие изменения привычки для планировщика напоминаний.
+        Если привычка публичная, сбрасывает кеш ленты публичных привычек.
 
-        :param request: HTTP-запрос.
+        :param serializer: Сериализатор для привычки.
         """
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        instance = Habit.objects.get(id=serializer.data['id'])
-        reminder_service = ReminderService(instance)
-        reminder_service.create_test_reminder()
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        with transaction.atomic():
+            habit = serializer.save(user=self.request.user)
+            HabitEventService.record([habit.id])
+        if habit.is_public:
+            PublicHabitsCacheService.invalidate()
 
-    def perform_create(self, serializer: HabitSerializer) -> None:
+    def perform_update(self, serializer: HabitSerializer) -> None:
         """
-        Выполняет создание привычки и автоматически присваивает ее текущему пользователю.
+        Выполняет обновление привычки.
+        В той же транзакции записывает событие изменения привычки для планировщика напоминаний.
+        Если привычка была или стала публичной, сбрасывает кеш ленты публичных привычек.
 
         :param serializer: Сериализатор для привычки.
         """
+        was_public = serializer.instance.is_public
+        with transaction.atomic():
+            habit = serializer.save()
+            HabitEventService.record([habit.id])
+        if was_public or habit.is_public:
+            PublicHabitsCacheService.invalidate()
 
-        serializer.save(user=self.request.user)
+    def perform_destroy(self, instance: Habit) -> None:
+        """
+        Выполняет удаление привычки.
+        В той же транзакции записывает событие изменения привычки для планировщика напоминаний.
+        Если привычка была публичной, сбрасывает кеш ленты публичных привычек.
 
-    def destroy(self, request: Request, *args, **kwargs) -> Response:
+        :param instance: Удаляемая привычка.
         """
-        Удаление привычки и связанного с ней напоминания.
+        habit_id = instance.id
+        with transaction.atomic():
+            instance.delete()
+            HabitEventService.record([habit_id])
+        if instance.is_public:
+            PublicHabitsCacheService.invalidate()
 
-        :param request: HTTP-запрос.
+    @swagger_auto_schema(request_body=HabitCompletionSerializer, responses={202: HabitCompletionSerializer})
+    @action(detail=True, methods=['post'])
+    def complete(self, request: Request, pk: int = None) -> Response:
+        """
+        Отмечает выполнение привычки. Отметка записывается в БД фоновой задачей,
+        поэтому ответ 202 возвращается без записи в журнал выполнений.
+
+        :param request: HTTP-запрос с необязательным временем выполнения completed_at.
+        :param pk: ID привычки.
         """
-        instance = self.get_object()
-        reminder_service = ReminderService(instance)
-        reminder_service.delete_reminder()
-        return super().destroy(request, *args, **kwargs)
+        habit = self.get_object()
+        serializer = HabitCompletionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        completed_at = HabitCompletionService.record(habit.id, habit.user_id,
+                                                     serializer.validated_data.get('completed_at'))
+        return Response({'habit': habit.id, 'completed_at': serializer.fields['completed_at'].to_representation(
+            completed_at)}, status=status.HTTP_202_ACCEPTED)
 
-    def update(self, request: Request, *args, **kwargs) -> Response:
+    @swagger_auto_schema(responses={200: CompletionStatsSerializer})
+    @action(detail=True, methods=['get'])
+    def stats(self, request: Request, pk: int = None) -> Response:
         """
-        Обновление привычки и связанного с ней напоминания.
+        Возвращает статистику выполнений привычки: текущую и лучшую серии, количество выполнений
+        и долю выполненных повторений за 7 и 30 дней. Статистика читается одной строкой вместе с привычкой.
 
         :param request: HTTP-запрос.
+        :param pk: ID привычки.
         """
-        response = super().update(request, *args, **kwargs)
-        if response.status_code == 200:
-            instance = self.get_object()
-            reminder_service = ReminderService(instance)
-            reminder_service.update_test_reminder()
-        return response
+        habit = self.get_object()
+        try:
+            stats = habit.stats
+        except HabitStats.DoesNotExist:
+            stats = HabitStats(habit=habit)
+        summary = stats.get_summary(HabitStatsService.get_today(request.user), habit.periodicity)
+        return Response(CompletionStatsSerializer(summary).data)
 
-    def partial_update(self, request: Request, *args, **kwargs) -> Response:
+    @swagger_auto_schema(method='post', request_body=HabitSerializer(many=True),
+                         responses={201: HabitSerializer(many=True)})
+    @swagger_auto_schema(method='patch', request_body=HabitBulkUpdateSerializer(many=True),
+                         responses={200: HabitBulkUpdateSerializer(many=True)})
+    @swagger_auto_schema(method='delete', request_body=HabitBulkDeleteSerializer, responses={204: ''})
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request: Request) -> Response:
         """
-        Частичное обновление привычки и связанного с ней напоминания.
+        Пакетные операции над привычками текущего пользователя:
+        POST - создание списка привычек;
+        PATCH - частичное обновление списка привычек, каждая с id;
+        DELETE - удаление привычек по списку ids.
+        Все изменения вместе с событиями изменения привычек выполняются в одной транзакции,
+        кеш ленты публичных привычек сбрасывается не больше одного раза.
 
         :param request: HTTP-запрос.
         """
-        response = super().partial_update(request, *args, **kwargs)
-        if response.status_code == 200:
-            instance = self.get_object()
-            reminder_service = ReminderService(instance)
-            reminder_service.update_test_reminder()
+        handlers = {
+            'POST': self.bulk_create_habits,
+            'PATCH': self.bulk_update_habits,
+            'DELETE': self.bulk_destroy_habits,
+        }
+        with transaction.atomic():
+            response, public_changed = handlers[request.method](request)
+        if public_changed:
+            PublicHabitsCacheService.invalidate()
         return response
 
+    def bulk_create_habits(self, request: Request) -> Tuple[Response, bool]:
+        """
+        Создает пачку привычек. Возвращает ответ и признак того, что среди них есть публичные.
+
+        :param request: HTTP-запрос со списком привычек.
+        """
+        serializer = self.get_serializer(data=request.data, many=True, max_length=settings.HABIT_BULK_MAX_SIZE)
+        serializer.is_valid(raise_exception=True)
+        habits = serializer.save()
+        HabitEventService.record(habit.id for habit in habits)
+        return Response(serializer.data, status=status.HTTP_201_CREATED), any(habit.is_public for habit in habits)
+
+    def bulk_update_habits(self, request: Request) -> Tuple[Response, bool]:
+        """
+        Частично обновляет пачку привычек.
+        Возвращает ответ и признак того, что среди привычек были или стали публичные.
+
+        :param request: HTTP-запрос со списком привычек, каждая с id.
+        """
+        ids = parse_ids(item.get('id') for item in request.data if isinstance(item, dict)) \
+            if isinstance(request.data, list) else []
+        habits = self.get_queryset().in_bulk(ids[:settings.HABIT_BULK_MAX_SIZE])
+        was_public = any(habit.is_public for habit in habits.values())
+
+        serializer = HabitBulkUpdateSerializer(habits, data=request.data, many=True, partial=True,
+                                               max_length=settings.HABIT_BULK_MAX_SIZE,
+                                               context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        habits = serializer.save()
+        HabitEventService.record(habit.id for habit in habits)
+        return Response(serializer.data), was_public or any(habit.is_public for habit in habits)
+
+    def bulk_destroy_habits(self, request: Request) -> Tuple[Response, bool]:
+        """
+        Удаляет привычки по списку ID. Чужие и несуществующие ID пропускаются.
+        Возвращает ответ и признак того, что среди удаленных привычек были публичные.
+
+        :param request: HTTP-запрос со списком ids.
+        """
+        serializer = HabitBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        habits = list(self.get_queryset().filter(id__in=serializer.validated_data['ids'])
+                      .values_list('id', 'is_public'))
+        habit_ids = [habit_id for habit_id, _ in habits]
+        Habit.objects.filter(id__in=habit_ids).delete()
+        HabitEventService.record(habit_ids)
+        return Response(status=status.HTTP_204_NO_CONTENT), any(is_public for _, is_public in habits)
+
 
 class PublicHabitsAPIView(ListAPIView):
-    """Просмотр списка публичных привычек"""
-    serializer_class = PublicHabitSerializer
-    pagination_class = CustomPageNumberPagination
+    """
+    Просмотр списка публичных привычек.
+    Страницы списка кешируются, ответы содержат ETag и Last-Modified,
+    чтобы клиенты могли получать 304 Not Modified.
+    """
+    serializer_class = PublicHabitListSerializer
+    pagination_class = HabitPagination
 
-    def get_queryset(self) -> List[Habit]:
+    def get_serializer_class(self):
+        """
+        Возвращает облегченный сериализатор для строк values().
+        Для генерации документации возвращает PublicHabitSerializer, описывающий те же поля.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return PublicHabitSerializer
+        return self.serializer_class
+
+    def get_queryset(self) -> List[Dict[str, Any]]:
+        """
+        Возвращает QuerySet публичных привычек вместе с данными пользователя.
+        Выбирает только нужные для ответа столбцы одним запросом.
+        """
+        return Habit.objects.filter(is_public=True).order_by('id').values(*PUBLIC_HABIT_VALUES)
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
         """
-        Возвращает QuerySet публичных привычек.
+        Возвращает страницу списка публичных привычек из кеша,
+        а если список не изменился с прошлого запроса клиента - ответ 304.
+
+        :param request: HTTP-запрос.
         """
-        return Habit.objects.filter(is_public=True).order_by('id')
+        version, last_modified = PublicHabitsCacheService.get_state()
+        etag = f'"{version}"'
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        url = request.build_absolute_uri()
+        data = PublicHabitsCacheService.get_page(version, url)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            PublicHabitsCacheService.set_page(version, url, data)
+
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class UserStatsAPIView(APIView):
+    """
+    Статистика выполнений всех привычек текущего пользователя. Серии считаются по дням,
+    в которые выполнена хотя бы одна привычка.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(responses={200: CompletionStatsSerializer})
+    def get(self, request: Request) -> Response:
+        stats = UserStats.objects.filter(user=request.user).first() or UserStats(user=request.user)
+        summary = stats.get_summary(HabitStatsService.get_today(request.user))
+        return Response(CompletionStatsSerializer(summary).data)
+
+
+class TelegramHabitsAPIView(APIView):
+    """
+    Внутренний API для Telegram-бота: компактный список привычек пользователя по ID в Telegram.
+    Доступен только с сервисным токеном, параметр today=1 оставляет сегодняшние привычки.
+    """
+    authentication_classes = []
+    permission_classes = [HasServiceToken]
+    swagger_schema = None
+
+    def get(self, request: Request, tg_id: int) -> Response:
+        today = request.query_params.get('today') in ('1', 'true')
+        return Response(BotHabitService.get_habits(tg_id, today=today))
+
+
+class TelegramHabitCompleteAPIView(APIView):
+    """
+    Внутренний API для Telegram-бота: отметка о выполнении привычки пользователя по ID в Telegram.
+    Доступен только с сервисным токеном.
+    """
+    authentication_classes = []
+    permission_classes = [HasServiceToken]
+    swagger_schema = None
+
+    def post(self, request: Request, tg_id: int, habit_id: int) -> Response:
+        completed_at = BotHabitService.complete(tg_id, habit_id)
+        if completed_at is None:
+            return Response({'detail': 'Привычка не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'habit': habit_id, 'completed_at': completed_at.isoformat()}, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 с количеством итераций из настройки PASSWORD_PBKDF2_ITERATIONS.
+    Хеши с другим количеством итераций пересчитываются при входе пользователя.
+    """
+
+    @property
+    def iterations(self) -> int:
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2 (argon2-cffi) с параметрами из настроек PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_COST (КиБ)
+    и PASSWORD_ARGON2_PARALLELISM. Хеши с другими параметрами пересчитываются при входе пользователя.
+    """
+
+    @property
+    def time_cost(self) -> int:
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self) -> int:
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self) -> int:
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """
+    bcrypt (с предварительным SHA-256) с количеством раундов (log2) из настройки PASSWORD_BCRYPT_ROUNDS.
+    Хеши с другим количеством раундов пересчитываются при входе пользователя.
+    """
+
+    @property
+    def rounds(self) -> int:
+        return settings.PASSWORD_BCRYPT_ROUNDS
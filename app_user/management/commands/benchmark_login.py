@@ -0,0 +1,83 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+
+from app_user.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Замер пропускной способности эндпоинта авторизации с каждым алгоритмом хеширования паролей '
+            '(сложность - из настроек PASSWORD_*). Запросы выполняются в процессе команды, '
+            'в --threads потоков; результат приводится к одному ядру процессора. '
+            'Для замера в настроенной БД создается и затем удаляется тестовый пользователь')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', choices=list(settings.PASSWORD_HASHER_CHOICES),
+                            default=list(settings.PASSWORD_HASHER_CHOICES), help='Алгоритмы хеширования')
+        parser.add_argument('--requests', type=int, default=20, help='Количество входов с каждым алгоритмом')
+        parser.add_argument('--threads', type=int, default=1, help='Количество одновременных входов')
+        parser.add_argument('--path', default='/api/login/', help='Путь эндпоинта авторизации')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Не запрашивать подтверждение перед созданием тестового пользователя')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError('Количество входов и потоков должно быть положительным')
+        if options['interactive']:
+            answer = input(f"Команда создаст и удалит тестового пользователя в БД "
+                           f"{settings.DATABASES['default']['NAME']}. Продолжить? (yes/no): ")
+            if answer != 'yes':
+                raise CommandError('Замер отменен')
+        cores = min(options['threads'], os.cpu_count() or 1)
+
+        for name in options['hashers']:
+            preferred = settings.PASSWORD_HASHER_CHOICES[name]
+            hashers = [preferred] + [hasher for hasher in settings.PASSWORD_HASHERS if hasher != preferred]
+            with override_settings(PASSWORD_HASHERS=hashers):
+                started_at = time.perf_counter()
+                password_hash = make_password('benchmark-password')
+                hash_time = time.perf_counter() - started_at
+
+                user = CustomUser.objects.create(email=f'benchmark-{uuid.uuid4().hex}@example.com',
+                                                 password=password_hash, is_connected_to_tg=True)
+                try:
+                    statuses, elapsed = self.run_logins(options['path'], user.email, options['requests'],
+                                                        options['threads'])
+                finally:
+                    user.delete()
+
+            errors = sum(status_code != 200 for status_code in statuses)
+            rps = len(statuses) / elapsed
+            self.stdout.write(f'{name}: {rps:.1f} входов/с, {rps / cores:.1f} входов/с на ядро, '
+                              f'хеширование {hash_time * 1000:.0f} мс, ошибок: {errors}')
+
+    @staticmethod
+    def run_logins(path: str, email: str, requests_count: int, threads: int) -> tuple:
+        """
+        Выполняет requests_count входов в threads потоков. Возвращает статусы ответов и время выполнения.
+
+        :param path: Путь эндпоинта авторизации.
+        :param email: Электронная почта пользователя.
+        :param requests_count: Количество входов.
+        :param threads: Количество одновременных входов.
+        """
+        def login(_) -> int:
+            try:
+                return Client(HTTP_HOST='localhost').post(
+                    path, {'email': email, 'password': 'benchmark-password'}, content_type='application/json'
+                ).status_code
+            finally:
+                connections.close_all()
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            statuses: List[int] = list(executor.map(login, range(requests_count)))
+        return statuses, time.perf_counter() - started_at
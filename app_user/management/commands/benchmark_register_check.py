@@ -0,0 +1,89 @@
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест эндпоинта проверки регистрации, который вызывает Telegram-бот. '
+            'Сравнивает развертывания (например, gunicorn с синхронными воркерами и ASGI), '
+            'отправляя одинаковую нагрузку на каждое')
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+',
+                            help='Развертывания в виде имя=URL сервера, например wsgi=http://web:8000')
+        parser.add_argument('--requests', type=int, default=2000, help='Количество запросов к каждому серверу')
+        parser.add_argument('--concurrency', type=int, default=100, help='Количество одновременных запросов')
+        parser.add_argument('--telegram-id', type=int, default=1, help='ID пользователя в Telegram в запросах')
+        parser.add_argument('--path', default='/api/register/check/', help='Путь эндпоинта')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets']:
+            name, separator, url = target.partition('=')
+            if not separator or not url:
+                raise CommandError(f'Ожидается имя=URL, получено: {target}')
+            targets.append((name, url.rstrip('/') + options['path']))
+
+        for name, url in targets:
+            latencies, errors, elapsed = asyncio.run(self.run_load(
+                url, options['requests'], options['concurrency'], {'telegram_id': options['telegram_id']}))
+            self.report(name, latencies, errors, elapsed)
+
+    @staticmethod
+    async def run_load(url: str, requests_count: int, concurrency: int,
+                       payload: dict) -> Tuple[List[float], int, float]:
+        """
+        Отправляет requests_count POST-запросов, не больше concurrency одновременно.
+        Возвращает время ответа успешных запросов, количество ошибок и общее время теста.
+
+        :param url: Адрес эндпоинта.
+        :param requests_count: Количество запросов.
+        :param concurrency: Количество одновременных запросов.
+        :param payload: Тело запроса (JSON).
+        """
+        latencies = []
+        errors = 0
+        queue = iter(range(requests_count))
+
+        async def worker(session: aiohttp.ClientSession) -> None:
+            nonlocal errors
+            for _ in queue:
+                started_at = time.perf_counter()
+                try:
+                    async with session.post(url, json=payload) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started_at)
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            started_at = time.perf_counter()
+            await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started_at
+        return latencies, errors, elapsed
+
+    def report(self, name: str, latencies: List[float], errors: int, elapsed: float) -> None:
+        """
+        Выводит пропускную способность и перцентили времени ответа.
+
+        :param name: Название развертывания.
+        :param latencies: Время ответа успешных запросов в секундах.
+        :param errors: Количество неуспешных запросов.
+        :param elapsed: Общее время теста в секундах.
+        """
+        if not latencies:
+            self.stdout.write(f'{name}: все запросы завершились ошибкой ({errors})')
+            return
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(f'{name}: {len(latencies) / elapsed:.0f} запросов/с, '
+                          f'p50 {percentiles[49] * 1000:.1f} мс, p95 {percentiles[94] * 1000:.1f} мс, '
+                          f'p99 {percentiles[98] * 1000:.1f} мс, ошибок: {errors}')
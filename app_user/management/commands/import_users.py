@@ -0,0 +1,130 @@
+import csv
+import uuid
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from app_user.models import CustomUser
+from app_user.services.email_service import EmailService
+
+Row = Tuple[int, Dict[str, str]]
+
+
+class Command(BaseCommand):
+    help = ('Импорт пользователей прежней системы из CSV-файла с колонками email, first_name, last_name, '
+            'timezone и password (хеш пароля в формате Django; пустой - пароль не задан). '
+            'Пользователи создаются пачками через bulk_create, приветственные письма ставятся в очередь '
+            'одной командой на пачку после ее коммита')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество пользователей в пачке')
+        parser.add_argument('--delimiter', default=',', help='Разделитель колонок CSV')
+        parser.add_argument('--no-welcome-email', action='store_true', help='Не отправлять приветственные письма')
+
+    def handle(self, *args, **options):
+        created = skipped = 0
+        seen: Set[str] = set()
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as file:
+                reader = csv.DictReader(file, delimiter=options['delimiter'])
+                if 'email' not in (reader.fieldnames or []):
+                    raise CommandError('В файле нет колонки email')
+                for batch in self.get_batches(enumerate(reader, start=2), options['batch_size']):
+                    users = self.build_users(batch, seen)
+                    skipped += len(batch) - len(users)
+                    created += self.create_users(users, not options['no_welcome_email'])
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+
+        self.stdout.write(f'Создано пользователей: {created}, пропущено строк: {skipped}')
+
+    @staticmethod
+    def get_batches(rows: Iterable[Row], batch_size: int) -> Iterator[List[Row]]:
+        """
+        Разбивает строки файла на пачки.
+
+        :param rows: Пары (номер строки, строка).
+        :param batch_size: Размер пачки.
+        """
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+    def build_users(self, batch: List[Row], seen: Set[str]) -> List[CustomUser]:
+        """
+        Проверяет строки пачки и возвращает пользователей для создания. Строки с ошибками,
+        повторяющиеся в файле и уже зарегистрированные адреса пропускаются (с сообщением в stderr).
+
+        :param batch: Пары (номер строки, строка).
+        :param seen: Адреса электронной почты, уже встреченные в файле.
+        """
+        users = []
+        for line, row in batch:
+            try:
+                user = self.build_user(row)
+            except ValidationError as error:
+                self.stderr.write(f'Строка {line}: {"; ".join(error.messages)}')
+                continue
+            if user.email in seen:
+                self.stderr.write(f'Строка {line}: адрес {user.email} повторяется в файле')
+                continue
+            seen.add(user.email)
+            users.append(user)
+
+        existing = set(CustomUser.objects.filter(email__in=[user.email for user in users])
+                       .values_list('email', flat=True))
+        for email in existing:
+            self.stderr.write(f'Пользователь {email} уже зарегистрирован')
+        return [user for user in users if user.email not in existing]
+
+    @staticmethod
+    def build_user(row: Dict[str, str]) -> CustomUser:
+        """
+        Создает (без записи в БД) пользователя по строке файла и проверяет его поля.
+
+        :param row: Строка файла.
+        """
+        password = (row.get('password') or '').strip()
+        if password:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                raise ValidationError('неизвестный формат хеша пароля')
+        user = CustomUser(
+            email=CustomUser.objects.normalize_email((row.get('email') or '').strip()),
+            password=password or make_password(None),
+            first_name=(row.get('first_name') or '').strip(),
+            last_name=(row.get('last_name') or '').strip(),
+            timezone=(row.get('timezone') or '').strip() or settings.TIME_ZONE,
+            connection_code=uuid.uuid4().hex,
+        )
+        user.clean_fields()
+        return user
+
+    @staticmethod
+    def create_users(users: List[CustomUser], welcome_email: bool) -> int:
+        """
+        Создает пользователей пачки одним запросом и после коммита ставит в очередь
+        их приветственные письма. Возвращает количество созданных пользователей.
+
+        :param users: Пользователи.
+        :param welcome_email: Отправить приветственные письма.
+        """
+        if not users:
+            return 0
+        try:
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create(users)
+                if welcome_email:
+                    transaction.on_commit(partial(EmailService.queue_welcome_emails, [user.id for user in users]))
+        except IntegrityError as error:
+            raise CommandError(f'Не удалось создать пачку пользователей {users[0].email} - {users[-1].email}: '
+                               f'{error}')
+        return len(users)
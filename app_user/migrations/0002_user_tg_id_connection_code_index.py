@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='connection_code',
+            field=models.CharField(blank=True, db_index=True, max_length=36, null=True, verbose_name='Уникальный код подключения'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='tg_id',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='ID пользователя в телеграмме'),
+        ),
+    ]
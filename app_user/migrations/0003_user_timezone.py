@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 19:19
+
+import app_user.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_user', '0002_user_tg_id_connection_code_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='timezone',
+            field=models.CharField(default='Europe/Moscow', max_length=64, validators=[app_user.models.validate_timezone], verbose_name='Часовой пояс'),
+        ),
+    ]
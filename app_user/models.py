@@ -1,6 +1,10 @@
-from typing import List, Optional
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+from zoneinfo import ZoneInfo, available_timezones
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.db import models
 
 from .managers import CustomUserManager
@@ -8,6 +12,24 @@ from .managers import CustomUserManager
 NULLABLE = {'blank': True, 'null': True}
 
 
+@lru_cache(maxsize=None)
+def get_available_timezones() -> FrozenSet[str]:
+    """
+    Возвращает названия часовых поясов из базы IANA (читается один раз за процесс).
+    """
+    return frozenset(available_timezones())
+
+
+def validate_timezone(value: str) -> None:
+    """
+    Проверяет, что значение - название часового пояса из базы IANA (например, Europe/Moscow).
+
+    :param value: Название часового пояса.
+    """
+    if value not in get_available_timezones():
+        raise ValidationError('Неизвестный часовой пояс')
+
+
 class CustomUser(AbstractUser):
     """
     Модель, описывающая пользователя.
@@ -17,9 +39,12 @@ class CustomUser(AbstractUser):
 
     username = None
     email = models.EmailField(unique=True, verbose_name='Электронная почта')
-    connection_code = models.CharField(max_length=36, **NULLABLE, verbose_name='Уникальный код подключения')
-    tg_id = models.IntegerField(**NULLABLE, verbose_name='ID пользователя в телеграмме')
+    connection_code = models.CharField(max_length=36, **NULLABLE, db_index=True,
+                                       verbose_name='Уникальный код подключения')
+    tg_id = models.IntegerField(**NULLABLE, db_index=True, verbose_name='ID пользователя в телеграмме')
     is_connected_to_tg = models.BooleanField(default=False, verbose_name='Подключен к Telegram')
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE, validators=[validate_timezone],
+                                verbose_name='Часовой пояс')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -32,6 +57,12 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
 
+    def get_timezone(self) -> ZoneInfo:
+        """
+        Возвращает часовой пояс пользователя, в котором задано время его привычек.
+        """
+        return ZoneInfo(self.timezone)
+
     @classmethod
     def get_all_users(cls) -> List['CustomUser']:
         """
@@ -60,3 +91,13 @@ class CustomUser(AbstractUser):
             return cls.objects.get(connection_code=connection_code)
         except cls.DoesNotExist:
             return None
+
+    @classmethod
+    async def aget_user_by_connection_code(cls, connection_code: str) -> Optional['CustomUser']:
+        """
+        Асинхронная версия get_user_by_connection_code.
+        """
+        try:
+            return await cls.objects.aget(connection_code=connection_code)
+        except cls.DoesNotExist:
+            return None
@@ -1,11 +1,17 @@
 import uuid
+from functools import partial
 from typing import Dict, Any
 
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from .models import CustomUser
-from .tasks import send_welcome_email_task
+from .services.email_service import EmailService
 
 
 class RegisterUserSerializer(serializers.ModelSerializer):
@@ -18,13 +24,14 @@ class RegisterUserSerializer(serializers.ModelSerializer):
     - password2: Строка с подтверждением пароля пользователя.
     - first_name: Строка с именем пользователя.
     - last_name: Строка с фамилией пользователя.
+    - timezone: Часовой пояс пользователя (необязательно, по умолчанию TIME_ZONE).
     """
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'password', 'password2', 'first_name', 'last_name']
+        fields = ['id', 'email', 'password', 'password2', 'first_name', 'last_name', 'timezone']
         extra_kwargs = {
             'first_name': {'required': True},
             'last_name': {'required': True}
@@ -44,25 +51,23 @@ class RegisterUserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data: Dict[str, Any]) -> CustomUser:
         """
-        Создает новый экземпляр модели CustomUser с переданными данными.
-        Устанавливает пароль пользователя.
-        Сохраняет пользователя в базе данных.
-        Отправляет пользователю приветственное письмо на указанный email
+        Создает новый экземпляр модели CustomUser с переданными данными
+        и уже хешированным паролем, поэтому пользователь записывается одним INSERT.
+        После коммита транзакции ставит в очередь приветственное письмо на указанный email
         со ссылкой на телеграмм-бот.
 
         :param validated_data: Валидированные данные сериализатора.
         """
-        user = CustomUser.objects.create(
-            email=validated_data['email'],
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            connection_code=uuid.uuid4().hex
-        )
-
-        user.set_password(validated_data['password'])
-        user.save()
-
-        send_welcome_email_task.delay(user.id)
+        with transaction.atomic():
+            user = CustomUser.objects.create(
+                email=validated_data['email'],
+                password=make_password(validated_data['password']),
+                first_name=validated_data['first_name'],
+                last_name=validated_data['last_name'],
+                timezone=validated_data.get('timezone', settings.TIME_ZONE),
+                connection_code=uuid.uuid4().hex
+            )
+            transaction.on_commit(partial(EmailService.queue_welcome_emails, [user.id]))
 
         return user
 
@@ -83,6 +88,54 @@ class RegisterCheckSerializer(serializers.Serializer):
     telegram_id = serializers.IntegerField()
 
 
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Сериализатор авторизации: проверяет учетные данные и подключение пользователя к Telegram
+    за одну проверку пароля.
+    """
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Возвращает пару токенов для пользователя, подключенного к Telegram.
+
+        :param attrs: Электронная почта и пароль.
+        """
+        data = super().validate(attrs)
+        if not self.user.is_connected_to_tg:
+            raise AuthenticationFailed({"error": "Пользователь не подключен к Telegram"})
+        return data
+
+
+class LoginSerializer(serializers.Serializer):
+    """
+    Сериализатор учетных данных для асинхронной авторизации.
+    """
+    email = serializers.CharField()
+    password = serializers.CharField(trim_whitespace=False)
+
+
+class ProfileSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для просмотра и изменения профиля текущего пользователя.
+    Профиль сохраняется в транзакции, чтобы в нее попали изменения обработчиков сохранения пользователя
+    (например, пересчет времени напоминаний привычек при смене часового пояса).
+    """
+
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'email', 'first_name', 'last_name', 'timezone']
+        read_only_fields = ['email']
+
+    def update(self, instance: CustomUser, validated_data: Dict[str, Any]) -> CustomUser:
+        """
+        Обновление профиля пользователя.
+        :param instance: Текущий пользователь.
+        :param validated_data: Валидные данные для обновления профиля.
+        """
+        with transaction.atomic():
+            return super().update(instance, validated_data)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения данных пользователя в списке публичных привычек"""
 
@@ -1,9 +1,11 @@
 import logging
+from typing import Iterable, Optional, Tuple
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 
 from app_user.models import CustomUser
+from config.redis import get_redis
 
 logger = logging.getLogger(__name__)
 
@@ -11,27 +13,109 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """
     Сервис, описывающий отправку писем.
+
+    Приветственные письма не отправляются при регистрации: ID пользователя попадает в очередь Redis
+    queue_key, а периодическая задача отправляет письма пачками через одно SMTP-соединение.
+    Письмо, которое не удалось отправить, возвращается в очередь, пока не исчерпаны попытки
+    (WELCOME_EMAIL_MAX_ATTEMPTS), после этого ID пользователя переносится в список failed_key.
+    Пачка читается из очереди без удаления (LRANGE), а каждый ID удаляется из очереди только после
+    обработки письма, поэтому при сбое обработчика письма не теряются (повторно может уйти только
+    письмо, отправка которого прервалась). Пачки отправляются под блокировкой lock_key.
     """
+    queue_key = 'users:welcome-emails'
+    failed_key = 'users:welcome-emails:failed'
+    lock_key = 'users:welcome-emails:send-lock'
+    lock_timeout = 120
+    welcome_subject = "Добро пожаловать в наш трекер привычек!"
+
+    @classmethod
+    def queue_welcome_emails(cls, user_ids: Iterable[int]) -> None:
+        """
+        Ставит приветственные письма пользователей в очередь отправки одной командой Redis.
+
+        :param user_ids: ID пользователей.
+        """
+        user_ids = list(user_ids)
+        if user_ids:
+            get_redis().rpush(cls.queue_key, *user_ids)
+
+    @classmethod
+    def get_queue_length(cls) -> int:
+        """
+        Возвращает количество писем в очереди отправки.
+        """
+        return get_redis().llen(cls.queue_key)
 
     @staticmethod
-    def send_welcome_email(user: CustomUser) -> None:
+    def parse(item: bytes) -> Tuple[int, int]:
         """
-        Отправляет приветственное письмо новому пользователю.
+        Разбирает элемент очереди. Возвращает ID пользователя и количество неудачных попыток отправки.
+
+        :param item: Строка "user_id" или "user_id,попытки".
+        """
+        user_id, _, attempts = item.decode().partition(',')
+        return int(user_id), int(attempts or 0)
+
+    @classmethod
+    def build_welcome_email(cls, user: CustomUser, connection=None) -> EmailMessage:
+        """
+        Формирует приветственное письмо новому пользователю.
         В письме отправляется ссылка на Telegram-бот и код для подключения.
 
         :param user: Объект пользователя, которому необходимо отправить письмо.
+        :param connection: Соединение с почтовым сервером.
         """
-        user_name = user.first_name if user.first_name else user.email
-        subject = "Добро пожаловать в наш трекер привычек!"
         message = f"Привет, {user.first_name}!\n" \
                   f"Спасибо за регистрацию.\nПожалуйста, перейдите по следующей ссылке, " \
                   f"чтобы начать взаимодействовать с нашим ботом в Telegram: https://t.me/SkyproHabitTrackerBot\n" \
                   f"Для подключения к боту используйте код {user.connection_code}"
-        from_email = settings.EMAIL_HOST_USER
-        to_list = [user.email]
+        return EmailMessage(cls.welcome_subject, message, settings.EMAIL_HOST_USER, [user.email],
+                            connection=connection)
+
+    @classmethod
+    def send_welcome_emails(cls, batch_size: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Отправляет пачку приветственных писем из очереди через одно соединение с почтовым сервером.
+        Ошибка отправки учитывается для каждого письма отдельно: соединение переоткрывается,
+        а письмо возвращается в очередь или, если попытки исчерпаны, переносится в список failed_key.
+        Возвращает количество отправленных и неотправленных писем ((0, 0), если очередь пуста
+        или ее обрабатывает другой обработчик).
+
+        :param batch_size: Максимальное количество писем в пачке.
+        """
+        batch_size = batch_size or settings.WELCOME_EMAIL_BATCH_SIZE
+        redis = get_redis()
+        lock = redis.lock(cls.lock_key, timeout=cls.lock_timeout, blocking=False)
+        if not lock.acquire():
+            return 0, 0
 
+        sent = errors = 0
+        connection = get_connection(fail_silently=False)
         try:
-            logger.info(f'Отправка письма для {user_name}')
-            send_mail(subject, message, from_email, to_list, fail_silently=True)
-        except Exception as error:
-            logger.error(f'Ошибка отправки письма: {error}')
+            queue = [cls.parse(item) for item in redis.lrange(cls.queue_key, 0, batch_size - 1)]
+            users = CustomUser.objects.in_bulk({user_id for user_id, _ in queue})
+            for user_id, attempts in queue:
+                pipeline = redis.pipeline()
+                pipeline.lpop(cls.queue_key)
+                user = users.get(user_id)
+                if user is not None:
+                    try:
+                        connection.open()
+                        sent += connection.send_messages([cls.build_welcome_email(user, connection)])
+                    except Exception as error:
+                        logger.error(f'Ошибка отправки письма для {user.email}: {error}')
+                        connection.close()
+                        errors += 1
+                        if attempts + 1 < settings.WELCOME_EMAIL_MAX_ATTEMPTS:
+                            pipeline.rpush(cls.queue_key, f'{user_id},{attempts + 1}')
+                        else:
+                            pipeline.rpush(cls.failed_key, user_id)
+                pipeline.execute()
+                lock.reacquire()
+        finally:
+            connection.close()
+            lock.release()
+
+        if sent or errors:
+            logger.info(f'Отправлено приветственных писем: {sent}, ошибок: {errors}')
+        return sent, errors
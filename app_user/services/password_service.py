@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+from app_user.models import CustomUser
+
+
+class PasswordService:
+    """
+    Сервис, описывающий проверку паролей при входе под ASGI.
+
+    Хеширование пароля занимает процессор на десятки и сотни миллисекунд, но argon2-cffi, bcrypt
+    и hashlib отпускают GIL, поэтому проверки выполняются параллельно в отдельном пуле из
+    LOGIN_HASHING_THREADS потоков, не блокируя цикл событий. Размер пула ограничивает количество
+    одновременных хеширований (Argon2 занимает PASSWORD_ARGON2_MEMORY_COST КиБ памяти на каждое),
+    остальные входы ждут в очереди пула. Запросы к БД выполняются асинхронным ORM вне пула.
+    """
+    executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """
+        Возвращает пул потоков хеширования (создается при первом входе).
+        """
+        if cls.executor is None:
+            cls.executor = ThreadPoolExecutor(max_workers=settings.LOGIN_HASHING_THREADS or None,
+                                              thread_name_prefix='password-hashing')
+        return cls.executor
+
+    @classmethod
+    async def run(cls, func: Callable[..., Any], *args) -> Any:
+        """
+        Выполняет функцию в пуле потоков хеширования.
+
+        :param func: Функция.
+        :param args: Аргументы функции.
+        """
+        return await asyncio.get_running_loop().run_in_executor(cls.get_executor(), partial(func, *args))
+
+    @staticmethod
+    def must_update(encoded: str) -> bool:
+        """
+        Проверяет, нужно ли пересчитать хеш пароля: хеш получен другим алгоритмом или с другой сложностью.
+
+        :param encoded: Хеш пароля.
+        """
+        preferred = get_hasher()
+        return identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+    @classmethod
+    async def aauthenticate(cls, email: str, password: str) -> Optional[CustomUser]:
+        """
+        Возвращает активного пользователя с указанными электронной почтой и паролем или None.
+        Если хеш пароля получен другим алгоритмом или с другой сложностью, пароль хешируется заново.
+        Для несуществующего пользователя пароль тоже хешируется, чтобы время ответа не выдавало,
+        зарегистрирован ли адрес.
+
+        :param email: Электронная почта.
+        :param password: Пароль.
+        """
+        user = await CustomUser.objects.filter(email=email).afirst()
+        if user is None:
+            await cls.run(make_password, password)
+            return None
+        if not await cls.run(check_password, password, user.password) or not user.is_active:
+            return None
+
+        if cls.must_update(user.password):
+            user.password = await cls.run(make_password, password)
+            await user.asave(update_fields=['password'])
+        return user
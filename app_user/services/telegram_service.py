@@ -20,3 +20,16 @@ class TelegramService:
         user.connection_code = None
         user.is_connected_to_tg = True
         user.save()
+
+    @staticmethod
+    async def alink_telegram_account(user: CustomUser, tg_id: int) -> None:
+        """
+        Асинхронная версия link_telegram_account: сохраняет только изменившиеся поля.
+
+        :param user: Объект CustomUser, для которого надо привязать аккаунт в Telegram.
+        :param tg_id: ID пользователя в Telegram.
+        """
+        user.tg_id = tg_id
+        user.connection_code = None
+        user.is_connected_to_tg = True
+        await user.asave(update_fields=['tg_id', 'connection_code', 'is_connected_to_tg'])
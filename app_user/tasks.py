@@ -1,18 +1,18 @@
 from celery import shared_task
+from django.conf import settings
 
-from .models import CustomUser
 from .services.email_service import EmailService
 
 
 @shared_task
-def send_welcome_email_task(user_id: int) -> None:
+def send_welcome_emails_task() -> None:
     """
-    Задача Celery для отправки приветственного письма пользователю.
-    Эта задача использует Celery для асинхронной отправки приветственного письма
-    пользователю.
-
-    :param user_id: ID пользователя, которому необходимо отправить приветственное письмо.
+    Задача Celery, запускаемая celery beat каждые WELCOME_EMAILS_INTERVAL секунд.
+    Отправляет приветственные письма из очереди пачками через одно соединение с почтовым сервером.
+    За один запуск отправляются письма, которые были в очереди на момент запуска,
+    письма, возвращенные в очередь после ошибки, повторяются при следующем запуске.
     """
-    user = CustomUser.get_user_by_id(user_id)
-    if user is not None:
-        EmailService.send_welcome_email(user)
+    remaining = EmailService.get_queue_length()
+    while remaining > 0:
+        EmailService.send_welcome_emails()
+        remaining -= settings.WELCOME_EMAIL_BATCH_SIZE
@@ -1,12 +1,32 @@
-from unittest import TestCase, mock
-
+import json
+import os
+import tempfile
+from datetime import time
+from io import StringIO
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
 from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
+from app_habit.models import Habit, HabitEvent
 from app_user.models import CustomUser
 from app_user.services.email_service import EmailService
-from app_user.tasks import send_welcome_email_task
+from app_user.tasks import send_welcome_emails_task
+from app_user.views import AsyncLoginView, CustomTokenObtainPairView
+from config.redis import get_redis
 
 
 class RegistrationAPITestCase(APITestCase):
@@ -30,7 +50,8 @@ class RegistrationAPITestCase(APITestCase):
             "password": "qwerty123!",
             "password2": "qwerty123!",
             "first_name": "Ivan",
-            "last_name": "Ivanov"
+            "last_name": "Ivanov",
+            "timezone": "Asia/Yekaterinburg"
         }
 
         response = self.client.post(url, data, format='json')
@@ -42,6 +63,7 @@ class RegistrationAPITestCase(APITestCase):
         self.assertTrue(new_user.connection_code)
         self.assertFalse(new_user.tg_id)
         self.assertFalse(new_user.is_connected_to_tg)
+        self.assertEqual(new_user.timezone, data['timezone'])
 
     def test_user_registration_with_non_matching_passwords(self):
         """
@@ -119,6 +141,16 @@ class RegistrationConfirmAPITestCase(APITestCase):
         self.assertTrue(self.user.connection_code)
         self.assertFalse(self.user.is_connected_to_tg)
 
+    async def test_confirm_registration_via_asgi(self):
+        """Подтверждение регистрации обрабатывается асинхронно через ASGI"""
+        data = {'connection_code': self.connection_code, 'telegram_id': self.telegram_id}
+        response = await self.async_client.post(self.url, data, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = await CustomUser.objects.aget(id=self.user.id)
+        self.assertEqual(user.tg_id, self.telegram_id)
+        self.assertTrue(user.is_connected_to_tg)
+
 
 class RegistrationCheckAPITestCase(APITestCase):
     """Проверка регистрации"""
@@ -156,6 +188,21 @@ class RegistrationCheckAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(response.json()['is_connected'])
 
+    def test_check_with_invalid_telegram_id(self):
+        """Некорректный telegram_id возвращает 400 с ошибками сериализатора"""
+        response = self.client.post(self.url, {'telegram_id': 'abc'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('telegram_id', response.json())
+
+    async def test_check_via_asgi(self):
+        """Проверка регистрации обрабатывается асинхронно через ASGI"""
+        response = await self.async_client.post(self.url, {'telegram_id': self.user.tg_id},
+                                                content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['is_connected'])
+
 
 class CustomTokenObtainPairViewTestCase(APITestCase):
     """Проверка авторизации"""
@@ -201,47 +248,367 @@ class CustomTokenObtainPairViewTestCase(APITestCase):
         self.assertNotIn('access', response.data)
         self.assertEqual(response.data['error'], "Пользователь не подключен к Telegram")
 
+    def login(self, email: str, password: str = 'qwerty123!'):
+        """
+        Выполняет вход, подсчитывая проверки пароля хешером. Возвращает ответ и количество проверок.
+
+        :param email: Электронная почта.
+        :param password: Пароль.
+        """
+        hasher = type(get_hasher())
+        with mock.patch.object(hasher, 'verify', autospec=True, side_effect=hasher.verify) as verify:
+            with self.assertNumQueries(1):
+                response = self.client.post(self.url, {"email": email, "password": password}, format='json')
+        return response, verify.call_count
+
+    def test_login_checks_password_once(self):
+        """
+        Проверка того, что при входе пароль проверяется один раз, а пользователь загружается одним запросом.
+        """
+        response, verify_count = self.login(self.user_connected_to_tg.email)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(verify_count, 1)
+
+        response, verify_count = self.login(self.user_not_connected_to_tg.email)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['error'], "Пользователь не подключен к Telegram")
+        self.assertEqual(verify_count, 1)
+
+        response, verify_count = self.login(self.user_connected_to_tg.email, 'wrong-password')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('access', response.data)
+        self.assertEqual(verify_count, 1)
+
 
-class EmailServiceTest(TestCase):
-    """Отправка письма"""
+class PasswordHashingTestCase(APITestCase):
+    """Настраиваемые алгоритмы хеширования паролей и пересчет хешей при входе"""
+    fast_costs = {'PASSWORD_PBKDF2_ITERATIONS': 1000, 'PASSWORD_ARGON2_TIME_COST': 1,
+                  'PASSWORD_ARGON2_MEMORY_COST': 1024, 'PASSWORD_ARGON2_PARALLELISM': 1, 'PASSWORD_BCRYPT_ROUNDS': 4}
 
     def setUp(self):
-        self.user = CustomUser.objects.create(
-            email='ivan@mail.ru',
-            first_name='Ivan',
-            last_name='Ivanov',
-            connection_code='1234567890',
-        )
+        self.settings_override = override_settings(**self.fast_costs)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = CustomUser.objects.create(email='anna@mail.ru', password=make_password('qwerty123!'),
+                                              is_connected_to_tg=True)
+        self.data = {'email': self.user.email, 'password': 'qwerty123!'}
+
+    @staticmethod
+    def prefer(name):
+        preferred = settings.PASSWORD_HASHER_CHOICES[name]
+        return override_settings(PASSWORD_HASHERS=[preferred] + [
+            hasher for hasher in settings.PASSWORD_HASHERS if hasher != preferred])
+
+    def test_hasher_costs(self):
+        """Сложность хеширования берется из настроек"""
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.prefer('argon2'):
+            self.assertIn('$v=19$m=1024,t=1,p=1$', make_password('qwerty123!'))
+        with self.prefer('bcrypt'):
+            self.assertTrue(make_password('qwerty123!').startswith('bcrypt_sha256$$2b$04$'))
+
+    def test_rehash_on_login(self):
+        """При входе хеш пересчитывается выбранным алгоритмом и с текущей сложностью"""
+        with self.prefer('argon2'):
+            self.assertEqual(self.client.post('/api/login/', self.data).status_code, status.HTTP_200_OK)
+            self.user.refresh_from_db()
+            self.assertIn('$m=1024,t=1,p=1$', self.user.password)
+
+            with override_settings(PASSWORD_ARGON2_TIME_COST=2):
+                self.assertEqual(self.client.post('/api/login/', self.data).status_code, status.HTTP_200_OK)
+            self.user.refresh_from_db()
+            self.assertIn('$m=1024,t=2,p=1$', self.user.password)
+            self.assertTrue(self.user.check_password('qwerty123!'))
+
+    @override_settings(LOGIN_HASHING_THREADS=4)
+    def test_login_routes(self):
+        """/api/login/ всегда обслуживает представление DRF, асинхронный вход доступен по /api/login/async/"""
+        self.assertIs(resolve('/api/login/').func.view_class, CustomTokenObtainPairView)
+        self.assertIs(resolve('/api/login/async/').func.view_class, AsyncLoginView)
+
+        response = self.client.post('/api/login/async/', self.data, format='json')
 
-        self.email_service = EmailService()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()), {'refresh', 'access'})
+
+    async def test_async_login(self):
+        """Асинхронный вход проверяет пароль в пуле потоков и пересчитывает устаревший хеш"""
+        factory = AsyncRequestFactory()
+        view = AsyncLoginView.as_view()
+        with self.prefer('bcrypt'):
+            response = await view(factory.post('/api/login/', self.data, content_type='application/json'))
+            wrong_password = await view(factory.post('/api/login/', dict(self.data, password='wrong'),
+                                                     content_type='application/json'))
+            unknown_user = await view(factory.post('/api/login/', dict(self.data, email='nobody@mail.ru'),
+                                                   content_type='application/json'))
 
-    def test_send_welcome_email(self):
-        """Тестирование отправки приветственного письма"""
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(json.loads(response.content)), {'refresh', 'access'})
+        self.assertEqual(wrong_password.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(unknown_user.status_code, status.HTTP_401_UNAUTHORIZED)
+        user = await CustomUser.objects.aget(id=self.user.id)
+        self.assertTrue(user.password.startswith('bcrypt_sha256$'))
 
-        self.email_service.send_welcome_email(self.user)
-        self.assertEqual(len(mail.outbox), 1)
-        self.assertEqual(mail.outbox[0].subject, 'Добро пожаловать в наш трекер привычек!')
+    async def test_async_login_requires_telegram(self):
+        """Асинхронный вход, как и синхронный, недоступен без подключения к Telegram"""
+        await CustomUser.objects.filter(id=self.user.id).aupdate(is_connected_to_tg=False)
 
+        response = await AsyncLoginView.as_view()(
+            AsyncRequestFactory().post('/api/login/', self.data, content_type='application/json'))
 
-class TestCeleryTasks(TestCase):
-    """Выполнение задачи celery на отправку письма"""
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(response.content), {'error': 'Пользователь не подключен к Telegram'})
+
+
+class ProfileAPITestCase(APITestCase):
+    """Профиль пользователя и часовой пояс"""
 
     def setUp(self):
-        self.user = CustomUser.objects.create(
-            email='max@mail.ru',
-            first_name='Max',
-            last_name='Maximov',
-            connection_code='1234567890',
-        )
+        self.user = CustomUser.objects.create(email='ivan@mail.ru', tg_id=123456789, is_connected_to_tg=True)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/profile/'
+
+    def test_default_timezone(self):
+        """По умолчанию часовой пояс пользователя - TIME_ZONE"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['timezone'], 'Europe/Moscow')
+
+    def test_invalid_timezone(self):
+        """Неизвестный часовой пояс не принимается"""
+        response = self.client.patch(self.url, {'timezone': 'Mars/Olympus'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('timezone', response.data)
 
-    @mock.patch.object(EmailService, 'send_welcome_email')
-    def test_send_welcome_email_task(self, mock_send_welcome_email):
+    def test_timezone_change_reschedules_habits(self):
+        """При смене часового пояса пересчитывается время напоминаний только привычек пользователя"""
+        habit = Habit.objects.create(user=self.user, place='Дом', time='09:00', action='Привычка',
+                                     is_pleasant=False, time_for_action=60)
+        other_user = CustomUser.objects.create(email='petr@mail.ru')
+        other_habit = Habit.objects.create(user=other_user, place='Дом', time='09:00', action='Привычка',
+                                           is_pleasant=False, time_for_action=60)
+
+        response = self.client.patch(self.url, {'timezone': 'Asia/Vladivostok'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        habit_reminder_at = habit.next_reminder_at
+        habit.refresh_from_db()
+        vladivostok = ZoneInfo('Asia/Vladivostok')
+        self.assertNotEqual(habit.next_reminder_at, habit_reminder_at)
+        self.assertEqual(habit.next_reminder_at.astimezone(vladivostok).time(), time(9, 0))
+        self.assertEqual(Habit.objects.get(id=other_habit.id).next_reminder_at, other_habit.next_reminder_at)
+        self.assertEqual(list(HabitEvent.objects.values_list('habit_id', flat=True)), [habit.id])
+
+    def test_profile_change_without_timezone_does_not_reschedule(self):
+        """Изменение профиля без смены часового пояса не трогает напоминания привычек"""
+        Habit.objects.create(user=self.user, place='Дом', time='09:00', action='Привычка',
+                             is_pleasant=False, time_for_action=60)
+
+        response = self.client.patch(self.url, {'first_name': 'Иван', 'timezone': 'Europe/Moscow'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(HabitEvent.objects.exists())
+
+
+class UserQueryPlanTestCase(APITestCase):
+    """Поиск пользователя по ID в Telegram и коду подключения использует индексы"""
+
+    @staticmethod
+    def explain(queryset):
         """
-        Проверка выполнения задачи celery на отправку письма.
-        Используется mock для имитации реальной функции send_welcome_email.
-        Вызывается задача Celery send_welcome_email_task с id пользователя.
-        Далее проверяется, что mock функция send_welcome_email была вызвана один раз
-        и с правильными аргументами (с объектом пользователя, который создан в этом тесте).
+        Возвращает план запроса. Последовательное сканирование отключено, чтобы на пустой
+        тестовой таблице планировщик выбирал индекс так же, как на больших данных.
         """
-        send_welcome_email_task.apply(args=[self.user.id])
-        mock_send_welcome_email.assert_called_once_with(self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_tg_id_lookup_uses_index(self):
+        plan = self.explain(CustomUser.objects.filter(tg_id=123456789))
+        self.assertRegex(plan, r'Index Scan (using|on) users_tg_id_')
+
+    def test_connection_code_lookup_uses_index(self):
+        plan = self.explain(CustomUser.objects.filter(connection_code='0b6e1c5c-3f0a-4f44-9f55-0d9c2f1f2a11'))
+        self.assertRegex(plan, r'Index Scan (using|on) users_connection_code_')
+
+
+class EmailServiceTest(APITestCase):
+    """Отправка приветственных писем пачками из очереди"""
+
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create(email=f'user{i}@mail.ru', first_name=f'User{i}', connection_code=f'code{i}')
+            for i in range(3)
+        ]
+        self.patchers = [mock.patch.object(EmailService, 'queue_key', 'test:users:welcome-emails'),
+                         mock.patch.object(EmailService, 'failed_key', 'test:users:welcome-emails:failed'),
+                         mock.patch.object(EmailService, 'lock_key', 'test:users:welcome-emails:send-lock')]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        get_redis().delete('test:users:welcome-emails', 'test:users:welcome-emails:failed',
+                           'test:users:welcome-emails:send-lock')
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_registration_queues_email(self):
+        """Регистрация записывает пользователя одним INSERT и ставит письмо в очередь только после коммита"""
+        data = {'email': 'ivan@mail.ru', 'password': 'qwerty123!', 'password2': 'qwerty123!',
+                'first_name': 'Ivan', 'last_name': 'Ivanov'}
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/register/', data)
+
+        writes = [query['sql'] for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT',
+                                                                                   'RELEASE SAVEPOINT'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT INTO "users"'))
+        self.assertEqual(EmailService.get_queue_length(), 0)
+
+        for callback in callbacks:
+            callback()
+
+        user = CustomUser.objects.get(email='ivan@mail.ru')
+        self.assertTrue(user.check_password('qwerty123!'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(get_redis().lrange('test:users:welcome-emails', 0, -1), [str(user.id).encode()])
+
+    def test_send_welcome_emails(self):
+        """Письма пачки отправляются через одно соединение, письма удаленных пользователей пропускаются"""
+        deleted_user = CustomUser.objects.create(email='deleted@mail.ru')
+        EmailService.queue_welcome_emails([user.id for user in self.users] + [deleted_user.id])
+        deleted_user.delete()
+
+        with mock.patch('app_user.services.email_service.get_connection', wraps=get_connection) as connection:
+            self.assertEqual(EmailService.send_welcome_emails(), (3, 0))
+
+        connection.assert_called_once_with(fail_silently=False)
+        self.assertEqual([message.to for message in mail.outbox], [[user.email] for user in self.users])
+        self.assertEqual(mail.outbox[0].subject, 'Добро пожаловать в наш трекер привычек!')
+        self.assertIn('code0', mail.outbox[0].body)
+        self.assertEqual(EmailService.get_queue_length(), 0)
+
+    @override_settings(WELCOME_EMAIL_MAX_ATTEMPTS=2)
+    def test_failed_emails_are_retried(self):
+        """Ошибка отправки одного письма не мешает остальным, письмо повторяется, пока не исчерпаны попытки"""
+        send_messages = locmem.EmailBackend.send_messages
+
+        def fail_for_first_user(backend, messages):
+            if messages[0].to == [self.users[0].email]:
+                raise SMTPRecipientsRefused({self.users[0].email: (550, b'No such user')})
+            return send_messages(backend, messages)
+
+        EmailService.queue_welcome_emails([user.id for user in self.users])
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', fail_for_first_user):
+            self.assertEqual(EmailService.send_welcome_emails(), (2, 1))
+            self.assertEqual(get_redis().lrange('test:users:welcome-emails', 0, -1), [f'{self.users[0].id},1'.encode()])
+
+            self.assertEqual(EmailService.send_welcome_emails(), (0, 1))
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EmailService.get_queue_length(), 0)
+        failed = get_redis().lrange('test:users:welcome-emails:failed', 0, -1)
+        self.assertEqual(failed, [str(self.users[0].id).encode()])
+
+    def test_worker_crash_does_not_lose_emails(self):
+        """Если обработчик упал посреди пачки, неотправленные письма остаются в очереди"""
+        build_welcome_email = EmailService.build_welcome_email
+
+        def crash_on_second_email(user, connection=None):
+            if user == self.users[1]:
+                raise SystemExit('worker lost')
+            return build_welcome_email(user, connection)
+
+        EmailService.queue_welcome_emails([user.id for user in self.users])
+        with mock.patch.object(EmailService, 'build_welcome_email', side_effect=crash_on_second_email):
+            with self.assertRaises(SystemExit):
+                EmailService.send_welcome_emails()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(get_redis().lrange('test:users:welcome-emails', 0, -1),
+                         [str(user.id).encode() for user in self.users[1:]])
+
+        self.assertEqual(EmailService.send_welcome_emails(), (2, 0))
+        self.assertEqual([message.to for message in mail.outbox], [[user.email] for user in self.users])
+
+    @override_settings(WELCOME_EMAIL_BATCH_SIZE=2)
+    def test_send_welcome_emails_task(self):
+        """Задача отправляет все письма очереди пачками"""
+        EmailService.queue_welcome_emails([user.id for user in self.users])
+
+        send_welcome_emails_task.apply()
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailService.get_queue_length(), 0)
+
+
+class ImportUsersCommandTestCase(APITestCase):
+    """Импорт пользователей прежней системы"""
+
+    def setUp(self):
+        CustomUser.objects.create(email='existing@mail.ru')
+        self.password_hash = make_password('secret123!')
+        self.queue_patcher = mock.patch.object(EmailService, 'queue_key', 'test:users:welcome-emails')
+        self.queue_patcher.start()
+
+    def tearDown(self):
+        get_redis().delete('test:users:welcome-emails')
+        self.queue_patcher.stop()
+
+    def write_csv(self, content):
+        file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        file.write(content)
+        file.close()
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_import_users(self):
+        """Пользователи создаются пачками, ошибочные и повторяющиеся строки пропускаются, письма - в очереди"""
+        path = self.write_csv(
+            'email,first_name,last_name,timezone,password\n'
+            f'ivan@mail.ru,Ivan,Ivanov,Asia/Tokyo,{self.password_hash}\n'
+            'max@mail.ru,Max,,,\n'
+            'existing@mail.ru,Old,User,,\n'
+            'not-an-email,Bad,Email,,\n'
+            'olga@mail.ru,Olga,,Mars/Olympus,\n'
+            'anna@mail.ru,Anna,,,plain-password\n'
+            'ivan@mail.ru,Ivan,Duplicate,,\n'
+            'petr@mail.ru,Petr,,,\n'
+        )
+        stdout, stderr = StringIO(), StringIO()
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            call_command('import_users', path, batch_size=4, stdout=stdout, stderr=stderr)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "users"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertIn('Создано пользователей: 3, пропущено строк: 5', stdout.getvalue())
+        self.assertEqual(len(stderr.getvalue().splitlines()), 5)
+
+        users = {user.email: user for user in CustomUser.objects.exclude(email='existing@mail.ru')}
+        self.assertEqual(set(users), {'ivan@mail.ru', 'max@mail.ru', 'petr@mail.ru'})
+        self.assertTrue(users['ivan@mail.ru'].check_password('secret123!'))
+        self.assertEqual(users['ivan@mail.ru'].timezone, 'Asia/Tokyo')
+        self.assertFalse(users['max@mail.ru'].has_usable_password())
+        self.assertTrue(users['max@mail.ru'].connection_code)
+        queued = [EmailService.parse(item)[0] for item in get_redis().lrange('test:users:welcome-emails', 0, -1)]
+        self.assertEqual(sorted(queued), sorted(user.id for user in users.values()))
+
+    def test_import_without_welcome_email(self):
+        """С --no-welcome-email письма в очередь не ставятся"""
+        path = self.write_csv('email\nivan@mail.ru\n')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_users', path, no_welcome_email=True, stdout=StringIO())
+
+        self.assertTrue(CustomUser.objects.filter(email='ivan@mail.ru').exists())
+        self.assertEqual(EmailService.get_queue_length(), 0)
+
+    def test_missing_email_column(self):
+        """Файл без колонки email не импортируется"""
+        path = self.write_csv('name\nIvan\n')
+
+        with self.assertRaises(CommandError):
+            call_command('import_users', path, stdout=StringIO())
@@ -5,13 +5,17 @@ from .views import (
     RegisterView,
     RegisterConfirmView,
     RegisterCheckView,
-    CustomTokenObtainPairView
+    CustomTokenObtainPairView,
+    AsyncLoginView,
+    ProfileView
 )
 
 urlpatterns = [
     path('login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('login/async/', AsyncLoginView.as_view(), name='token_obtain_pair_async'),
     path('login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('register/', RegisterView.as_view(), name='register'),
     path('register/confirm/', RegisterConfirmView.as_view(), name='register_confirm'),
     path('register/check/', RegisterCheckView.as_view(), name='register_check'),
+    path('profile/', ProfileView.as_view(), name='profile'),
 ]
@@ -1,14 +1,25 @@
-from drf_yasg.utils import swagger_auto_schema
+import json
+from typing import Any, Dict
+
+from django.http import HttpRequest, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny
-from rest_framework.request import Request
-from rest_framework.response import Response
-from rest_framework.views import APIView
-from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .models import CustomUser
-from .serializers import RegisterUserSerializer, RegisterConfirmSerializer, RegisterCheckSerializer
+from .serializers import (
+    RegisterUserSerializer,
+    RegisterConfirmSerializer,
+    RegisterCheckSerializer,
+    CustomTokenObtainPairSerializer,
+    LoginSerializer,
+    ProfileSerializer
+)
+from .services.password_service import PasswordService
 from .services.telegram_service import TelegramService
 
 
@@ -19,65 +30,109 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterUserSerializer
 
 
-class RegisterConfirmView(APIView):
-    """Подтверждение регистрации через Telegram"""
-    permission_classes = (AllowAny,)
+class ProfileView(generics.RetrieveUpdateAPIView):
+    """Профиль текущего пользователя"""
+    serializer_class = ProfileSerializer
+    http_method_names = ['get', 'patch']
 
-    @swagger_auto_schema(
-        operation_description="This endpoint is for confirming registration",
-        request_body=RegisterConfirmSerializer,
-        responses={
-            200: 'Telegram account successfully linked',
-            404: 'User with this connection code does not exist'
-        },
-    )
-    def post(self, request: Request, *args, **kwargs) -> Response:
-        serializer = RegisterConfirmSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+    def get_object(self) -> CustomUser:
+        return self.request.user
 
-        user = CustomUser.get_user_by_connection_code(serializer.validated_data['connection_code'])
 
-        if user:
-            TelegramService.link_telegram_account(user, serializer.validated_data['telegram_id'])
-            return Response({"detail": "Telegram account successfully linked"}, status=status.HTTP_200_OK)
-        return Response({"detail": "User with this connection code does not exist"}, status=status.HTTP_404_NOT_FOUND)
+class AsyncJSONView(View):
+    """
+    Базовый асинхронный обработчик POST-запросов без DRF (DRF не поддерживает асинхронные представления).
+    Данные проверяются сериализаторами DRF, ответы возвращаются в JSON.
+    """
+    http_method_names = ['post']
 
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
 
-class RegisterCheckView(APIView):
-    """Проверка статуса регистрации"""
-    permission_classes = (AllowAny,)
+    @staticmethod
+    def get_data(request: HttpRequest) -> Dict[str, Any]:
+        """
+        Возвращает данные запроса в формате JSON или формы.
 
-    @swagger_auto_schema(
-        operation_description="This endpoint checks if the user is registered",
-        request_body=RegisterCheckSerializer,
-        responses={200: 'Returns a JSON object with "is_connected" boolean field'},
-    )
-    def post(self, request: Request, *args, **kwargs) -> Response:
-        serializer = RegisterCheckSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        :param request: HTTP-запрос.
+        """
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b'{}')
+            except ValueError:
+                return {}
+        return request.POST
 
-        telegram_id = serializer.validated_data['telegram_id']
-        user = CustomUser.objects.filter(tg_id=telegram_id).first()
 
-        if user and user.is_connected_to_tg:
-            return Response({"is_connected": True}, status=status.HTTP_200_OK)
-        return Response({"is_connected": False}, status=status.HTTP_200_OK)
+class AsyncBotView(AsyncJSONView):
+    """
+    Базовый асинхронный обработчик запросов Telegram-бота.
 
+    Запросы бота приходят на каждую команду /start и каждый код подключения, поэтому
+    эти эндпоинты работают без DRF и обслуживаются ASGI-сервером: ожидание БД
+    не занимает синхронный воркер gunicorn.
+    """
 
-class CustomTokenObtainPairView(TokenObtainPairView):
-    """Авторизация"""
 
-    def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
+class RegisterConfirmView(AsyncBotView):
+    """Подтверждение регистрации через Telegram"""
+
+    async def post(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
+        serializer = RegisterConfirmSerializer(data=self.get_data(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            serializer.is_valid(raise_exception=True)
-        except InvalidToken:
-            raise AuthenticationFailed("Неверные учетные данные")
+        user = await CustomUser.aget_user_by_connection_code(serializer.validated_data['connection_code'])
 
-        user = serializer.user
+        if user:
+            await TelegramService.alink_telegram_account(user, serializer.validated_data['telegram_id'])
+            return JsonResponse({"detail": "Telegram account successfully linked"}, status=status.HTTP_200_OK)
+        return JsonResponse({"detail": "User with this connection code does not exist"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+
+class RegisterCheckView(AsyncBotView):
+    """Проверка статуса регистрации"""
+
+    async def post(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
+        serializer = RegisterCheckSerializer(data=self.get_data(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        is_connected = await CustomUser.objects.filter(
+            tg_id=serializer.validated_data['telegram_id'],
+            is_connected_to_tg=True,
+        ).aexists()
+        return JsonResponse({"is_connected": is_connected}, status=status.HTTP_200_OK)
+
+
+class CustomTokenObtainPairView(TokenObtainPairView):
+    """Авторизация (только для пользователей, подключенных к Telegram)"""
+    serializer_class = CustomTokenObtainPairSerializer
+
+
+class AsyncLoginView(AsyncJSONView):
+    """
+    Авторизация под ASGI: проверка пароля выполняется в пуле потоков хеширования (PasswordService),
+    поэтому входы в пик нагрузки не блокируют цикл событий и проверяются параллельно.
+    Подключается по желанию: nginx направляет /api/login/ на этот эндпоинт сервиса web-asgi.
+    Проверяет только электронную почту и пароль (как ModelBackend), AUTHENTICATION_BACKENDS не используются.
+    """
+
+    async def post(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
+        serializer = LoginSerializer(data=self.get_data(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = await PasswordService.aauthenticate(serializer.validated_data['email'],
+                                                   serializer.validated_data['password'])
+        if user is None:
+            return JsonResponse({"detail": TokenObtainSerializer.default_error_messages['no_active_account']},
+                                status=status.HTTP_401_UNAUTHORIZED)
         if not user.is_connected_to_tg:
-            return Response({"error": "Пользователь не подключен к Telegram"},
-                            status=status.HTTP_401_UNAUTHORIZED)
+            return JsonResponse({"error": "Пользователь не подключен к Telegram"},
+                                status=status.HTTP_401_UNAUTHORIZED)
 
-        return super().post(request, *args, **kwargs)
+        refresh = RefreshToken.for_user(user)
+        return JsonResponse({"refresh": str(refresh), "access": str(refresh.access_token)}, status=status.HTTP_200_OK)
@@ -0,0 +1,12 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis:
+    """
+    Возвращает общий для процесса клиент Redis, подключенный к REDIS_URL.
+    """
+    return redis.Redis.from_url(settings.REDIS_URL)
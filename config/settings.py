@@ -2,6 +2,7 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,7 +15,7 @@ SECRET_KEY = 'django-insecure-c-oobgg+^8%i^c8t!nq^b35x91lu(=01md_*^dtu435r-^^zat
 
 DEBUG = True
 
-ALLOWED_HOSTS = ['web', 'web:8000', '0.0.0.0', 'localhost', '127.0.0.1', '0.0.0.0']
+ALLOWED_HOSTS = ['web', 'web:8000', 'web-asgi', 'web-asgi:8001', '0.0.0.0', 'localhost', '127.0.0.1', '0.0.0.0']
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -93,6 +94,28 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'app_user.CustomUser'
 
+# Алгоритм хеширования новых паролей: pbkdf2, argon2 или bcrypt. Хеши остальных алгоритмов
+# по-прежнему проверяются и пересчитываются выбранным алгоритмом при входе пользователя.
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'app_user.hashers.PBKDF2PasswordHasher',
+    'argon2': 'app_user.hashers.Argon2PasswordHasher',
+    'bcrypt': 'app_user.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 600000))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 8))
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+# Количество потоков для проверки паролей асинхронным входом /api/login/async/ (0 - по количеству ядер)
+LOGIN_HASHING_THREADS = int(os.getenv('LOGIN_HASHING_THREADS', 0))
+
 LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'Europe/Moscow'
@@ -106,6 +129,22 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://redis_habit:6379/1'),
+    }
+}
+
+PUBLIC_HABITS_CACHE_TIMEOUT = int(os.getenv('PUBLIC_HABITS_CACHE_TIMEOUT', 60 * 5))
+
+HABIT_BULK_MAX_SIZE = int(os.getenv('HABIT_BULK_MAX_SIZE', 100))
+HABIT_EVENTS_BATCH_SIZE = int(os.getenv('HABIT_EVENTS_BATCH_SIZE', 1000))
+HABIT_COMPLETIONS_BATCH_SIZE = int(os.getenv('HABIT_COMPLETIONS_BATCH_SIZE', 5000))
+# На сколько дней назад можно отметить выполнение привычки (не больше окна статистики - 30 дней)
+HABIT_COMPLETION_BACKDATE_DAYS = int(os.getenv('HABIT_COMPLETION_BACKDATE_DAYS', 30))
+HABIT_STATS_REBUILD_BATCH_SIZE = int(os.getenv('HABIT_STATS_REBUILD_BATCH_SIZE', 1000))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -134,20 +173,59 @@ SIMPLE_JWT = {
 }
 
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
+REDIS_URL = os.getenv('REDIS_URL', CELERY_BROKER_URL)
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-due-reminders': {
+        'task': 'app_habit.tasks.dispatch_due_reminders',
+        'schedule': crontab(),
+    },
+    'process-habit-events': {
+        'task': 'app_habit.tasks.process_habit_events',
+        'schedule': float(os.getenv('HABIT_EVENTS_INTERVAL', 5)),
+    },
+    'flush-habit-completions': {
+        'task': 'app_habit.tasks.flush_habit_completions',
+        'schedule': float(os.getenv('HABIT_COMPLETIONS_FLUSH_INTERVAL', 2)),
+    },
+    'rebuild-completion-stats': {
+        'task': 'app_habit.tasks.rebuild_completion_stats',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    'send-welcome-emails': {
+        'task': 'app_user.tasks.send_welcome_emails_task',
+        'schedule': float(os.getenv('WELCOME_EMAILS_INTERVAL', 10)),
+    },
+}
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+CELERY_TASK_ROUTES = {
+    'app_habit.tasks.send_telegram_messages': {'queue': 'telegram'},
+}
+
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 500))
+REMINDER_DEDUP_TTL = int(os.getenv('REMINDER_DEDUP_TTL', 60 * 60 * 24))
+REMINDER_DELIVERY = os.getenv('REMINDER_DELIVERY', 'celery')
+REMINDER_SCHEDULER = os.getenv('REMINDER_SCHEDULER', 'beat')
+REMINDER_CATCH_UP_MINUTES = int(os.getenv('REMINDER_CATCH_UP_MINUTES', 60))
+REMINDER_DELIVERY_CONCURRENCY = int(os.getenv('REMINDER_DELIVERY_CONCURRENCY', 100))
+
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
 EMAIL_HOST = 'smtp.yandex.ru'
 EMAIL_PORT = 465
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = False
 EMAIL_USE_SSL = True
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
+
+WELCOME_EMAIL_BATCH_SIZE = int(os.getenv('WELCOME_EMAIL_BATCH_SIZE', 100))
+WELCOME_EMAIL_MAX_ATTEMPTS = int(os.getenv('WELCOME_EMAIL_MAX_ATTEMPTS', 5))
 
 LOGGING = {
     'version': 1,
@@ -170,6 +248,14 @@ LOGGING = {
 }
 
 BOT_TOKEN = os.getenv('TG_BOT_TOKEN')
+BOT_SERVICE_TOKEN = os.getenv('BOT_SERVICE_TOKEN', '')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_GLOBAL_RATE_LIMIT = float(os.getenv('TELEGRAM_GLOBAL_RATE_LIMIT', 30))
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv('TELEGRAM_CHAT_RATE_LIMIT', 1))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 3))
+TELEGRAM_RETRY_BACKOFF = float(os.getenv('TELEGRAM_RETRY_BACKOFF', 0.5))
+TELEGRAM_REQUEST_TIMEOUT = float(os.getenv('TELEGRAM_REQUEST_TIMEOUT', 10))
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', 10))
 
 CORS_ALLOWED_ORIGINS = ['http://localhost:5001']
 CORS_ALLOW_ALL_ORIGINS = False
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+SERVER_URL = os.getenv('DJANGO_SERVER_URL')
+API_TIMEOUT = float(os.getenv('DJANGO_API_TIMEOUT', 10))
+API_CONNECT_TIMEOUT = float(os.getenv('DJANGO_API_CONNECT_TIMEOUT', 3))
+API_CONNECTIONS = int(os.getenv('DJANGO_API_CONNECTIONS', 50))
+API_KEEPALIVE = float(os.getenv('DJANGO_API_KEEPALIVE', 30))
+SERVICE_TOKEN = os.getenv('BOT_SERVICE_TOKEN', '')
+
+logger = logging.getLogger(__name__)
+
+
+class DjangoAPIClient:
+    """
+    Клиент API сервиса привычек с одной HTTP-сессией на все время работы бота.
+
+    Сессия создается при запуске бота и закрывается при остановке. Соединения с Django
+    переиспользуются (keep-alive), их количество ограничено пулом, а у каждого запроса
+    есть таймаут, поэтому медленный API не копит бесконечно висящие запросы.
+    Ошибки соединения, таймауты и ответы не в JSON (например, страница 502 от nginx)
+    не пробрасываются: тело ответа в таком случае - None.
+    """
+
+    def __init__(self, base_url: str, timeout: float = API_TIMEOUT, connect_timeout: float = API_CONNECT_TIMEOUT,
+                 connections: int = API_CONNECTIONS, keepalive: float = API_KEEPALIVE,
+                 service_token: str = SERVICE_TOKEN) -> None:
+        """
+        Инициализация клиента.
+        :param base_url: Адрес сервера Django.
+        :param timeout: Таймаут запроса в секундах.
+        :param connect_timeout: Таймаут установки соединения в секундах.
+        :param connections: Максимальное количество одновременных соединений.
+        :param keepalive: Сколько секунд держать простаивающее соединение открытым.
+        :param service_token: Сервисный токен внутреннего API.
+        """
+        self.base_url = (base_url or '').rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.connections = connections
+        self.keepalive = keepalive
+        self.service_token = service_token
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        """
+        Создает HTTP-сессию. Вызывается при запуске бота.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=self.keepalive)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        """
+        Закрывает HTTP-сессию и ее соединения. Вызывается при остановке бота.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method: str, path: str, **kwargs) -> Tuple[Optional[int], Any]:
+        """
+        Отправляет запрос к API. Возвращает статус ответа и тело ответа в JSON.
+        Если API недоступен, возвращает (None, None), а если ответ не в JSON - (статус, None).
+
+        :param method: HTTP-метод.
+        :param path: Путь эндпоинта.
+        :param kwargs: Параметры запроса aiohttp.
+        """
+        await self.start()
+        try:
+            async with self.session.request(method, f'{self.base_url}{path}', **kwargs) as response:
+                try:
+                    return response.status, await response.json(content_type=None)
+                except ValueError:
+                    logger.warning(f'API вернул ответ не в JSON: {method} {path} {response.status}')
+                    return response.status, None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            logger.warning(f'API недоступен: {method} {path}: {error!r}')
+            return None, None
+
+    async def post(self, path: str, **kwargs) -> Tuple[Optional[int], Any]:
+        """
+        Отправляет POST-запрос к API. Возвращает статус ответа и тело ответа в JSON (см. request).
+
+        :param path: Путь эндпоинта.
+        :param kwargs: Параметры запроса aiohttp (json, data, headers).
+        """
+        return await self.request('POST', path, **kwargs)
+
+    async def get(self, path: str, **kwargs) -> Tuple[Optional[int], Any]:
+        """
+        Отправляет GET-запрос к внутреннему API с сервисным токеном.
+        Возвращает статус ответа и тело ответа в JSON (см. request).
+
+        :param path: Путь эндпоинта.
+        :param kwargs: Параметры запроса aiohttp (params).
+        """
+        return await self.request('GET', path, headers={'X-Service-Token': self.service_token}, **kwargs)
+
+    async def get_habits(self, telegram_id: int, today: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        Возвращает привычки пользователя (id, action, place, time) или None, если API недоступен.
+
+        :param telegram_id: ID пользователя в Telegram.
+        :param today: Вернуть только сегодняшние привычки.
+        """
+        params = {'today': 1} if today else {}
+        status, data = await self.get(f'/api/internal/telegram/{telegram_id}/habits/', params=params)
+        return data if status == 200 and isinstance(data, list) else None
+
+    async def complete_habit(self, telegram_id: int, habit_id: int) -> Optional[bool]:
+        """
+        Отмечает выполнение привычки пользователя. Возвращает True, если отметка принята,
+        False, если у пользователя нет такой привычки, и None, если API недоступен.
+
+        :param telegram_id: ID пользователя в Telegram.
+        :param habit_id: ID привычки.
+        """
+        status, _ = await self.post(f'/api/internal/telegram/{telegram_id}/habits/{habit_id}/done/',
+                                    headers={'X-Service-Token': self.service_token})
+        if status == 202:
+            return True
+        return False if status == 404 else None
+
+    async def check_registration(self, telegram_id: int) -> bool:
+        """
+        Проверяет, подключил ли пользователь свой аккаунт к Telegram (False, если API недоступен).
+
+        :param telegram_id: ID пользователя в Telegram.
+        """
+        _, data = await self.post('/api/register/check/', json={'telegram_id': telegram_id})
+        return isinstance(data, dict) and bool(data.get('is_connected'))
+
+    async def confirm_registration(self, connection_code: str, telegram_id: int) -> bool:
+        """
+        Подтверждает регистрацию по коду подключения. Возвращает True, если аккаунт связан.
+
+        :param connection_code: Код подключения.
+        :param telegram_id: ID пользователя в Telegram.
+        """
+        status, _ = await self.post('/api/register/confirm/',
+                                    json={'connection_code': connection_code, 'telegram_id': telegram_id})
+        return status == 200
+
+
+api = DjangoAPIClient(SERVER_URL)
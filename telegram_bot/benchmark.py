@@ -0,0 +1,119 @@
+"""
+Замер пропускной способности обработчиков бота на локальной заглушке API Django.
+
+Сравнивает прежний вариант (новая aiohttp.ClientSession на каждое сообщение)
+с общей сессией DjangoAPIClient. Заглушка считает TCP-соединения, открытые клиентом.
+
+Запуск из каталога telegram_bot: python benchmark.py --updates 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Set, Tuple
+
+import aiohttp
+from aiohttp import web
+
+os.environ.setdefault('TG_BOT_TOKEN', '123456:benchmark')
+
+import handlers  # noqa: E402
+from api_client import api  # noqa: E402
+
+
+class FakeMessage:
+    """Сообщение Telegram с минимальным интерфейсом, который используют обработчики"""
+
+    def __init__(self, telegram_id: int, text: str) -> None:
+        self.from_user = SimpleNamespace(id=telegram_id)
+        self.text = text
+        self.answers = 0
+
+    async def answer(self, text: str) -> None:
+        self.answers += 1
+
+
+def create_stub(latency: float, peers: Set[Tuple[str, int]]) -> web.Application:
+    """
+    Создает заглушку эндпоинтов регистрации.
+
+    :param latency: Задержка ответа в секундах.
+    :param peers: Множество, в которое записываются адреса клиентских соединений.
+    """
+    async def check(request: web.Request) -> web.Response:
+        peers.add(request.transport.get_extra_info('peername'))
+        await asyncio.sleep(latency)
+        return web.json_response({'is_connected': False})
+
+    async def confirm(request: web.Request) -> web.Response:
+        peers.add(request.transport.get_extra_info('peername'))
+        await asyncio.sleep(latency)
+        return web.json_response({'detail': 'Telegram account successfully linked'})
+
+    app = web.Application()
+    app.router.add_post('/api/register/check/', check)
+    app.router.add_post('/api/register/confirm/', confirm)
+    return app
+
+
+async def session_per_message_start(message: FakeMessage) -> None:
+    """Прежний обработчик /start: новая сессия и соединение на каждое сообщение"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f'{api.base_url}/api/register/check/',
+                                json={'telegram_id': message.from_user.id}) as response:
+            data = await response.json()
+            await message.answer('connected' if data['is_connected'] else 'hello')
+
+
+async def run(handler: Callable[[FakeMessage], Awaitable[None]], updates: int, concurrency: int) -> float:
+    """
+    Обрабатывает updates сообщений, не больше concurrency одновременно. Возвращает время обработки.
+
+    :param handler: Обработчик сообщения.
+    :param updates: Количество сообщений.
+    :param concurrency: Количество одновременно обрабатываемых сообщений.
+    """
+    queue = iter(range(updates))
+
+    async def worker() -> None:
+        for telegram_id in queue:
+            await handler(FakeMessage(telegram_id, 'code'))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started_at
+
+
+async def main(updates: int, concurrency: int, latency: float) -> None:
+    peers = set()
+    runner = web.AppRunner(create_stub(latency, peers), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    api.base_url = f'http://127.0.0.1:{port}'
+
+    variants = [
+        ('Сессия на каждое сообщение', session_per_message_start),
+        ('Общая сессия (/start)', handlers.cmd_start),
+        ('Общая сессия (код подключения)', handlers.process_connection_code),
+    ]
+    await api.start()
+    try:
+        for name, handler in variants:
+            peers.clear()
+            elapsed = await run(handler, updates, concurrency)
+            print(f'{name}: {updates / elapsed:.0f} сообщений/с, TCP-соединений: {len(peers)}')
+    finally:
+        await api.close()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--updates', type=int, default=5000, help='Количество сообщений')
+    parser.add_argument('--concurrency', type=int, default=100, help='Количество одновременно обрабатываемых сообщений')
+    parser.add_argument('--latency', type=float, default=0.005, help='Задержка ответа заглушки API в секундах')
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.concurrency, args.latency))
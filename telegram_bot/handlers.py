@@ -1,13 +1,10 @@
-import os
+from typing import Any, Dict, List
 
-import aiohttp
 from aiogram.types import Message
-from dotenv import load_dotenv
 
+from api_client import api
 from bot import dp
-
-load_dotenv()
-SERVER_URL = os.getenv('DJANGO_SERVER_URL')
+from status_cache import status_cache
 
 
 @dp.message_handler(commands=['start'])
@@ -18,17 +15,92 @@ async def cmd_start(message: Message) -> None:
 
     :param message: Объект типа Message.
     """
-    telegram_id = message.from_user.id
-    async with aiohttp.ClientSession() as session:
-        data = {"telegram_id": telegram_id}
-        async with session.post(f'{SERVER_URL}/api/register/check/', json=data) as response:
-            data = await response.json()
-            if data['is_connected']:
-                await message.answer("Вы уже подключили свой аккаунт к телеграмму!")
-            else:
-                await message.answer(
-                    'Привет! Я твой бот, готов помочь тебе с привычками. Для начала введи код подключения!'
-                )
+    if await status_cache.get_or_fetch(message.from_user.id, api.check_registration):
+        await message.answer("Вы уже подключили свой аккаунт к телеграмму!")
+    else:
+        await message.answer(
+            'Привет! Я твой бот, готов помочь тебе с привычками. Для начала введи код подключения!'
+        )
+
+
+@dp.message_handler(commands=['refresh'])
+async def cmd_refresh(message: Message) -> None:
+    """
+    Обработчик команды /refresh.
+    Запрашивает актуальный статус подключения аккаунта у сервиса в обход кэша.
+
+    :param message: Объект типа Message.
+    """
+    if await status_cache.get_or_fetch(message.from_user.id, api.check_registration, refresh=True):
+        await message.answer("Ваш аккаунт подключен к телеграмму!")
+    else:
+        await message.answer("Аккаунт еще не подключен. Введите код подключения!")
+
+
+def format_habits(habits: List[Dict[str, Any]]) -> str:
+    """
+    Формирует текст списка привычек.
+
+    :param habits: Привычки из внутреннего API (id, action, place, time).
+    """
+    return '\n'.join(f"#{habit['id']} {habit['time']} — {habit['action']} ({habit['place']})" for habit in habits)
+
+
+async def answer_habits(message: Message, today: bool) -> None:
+    """
+    Отвечает списком привычек пользователя.
+
+    :param message: Объект типа Message.
+    :param today: Показать только сегодняшние привычки.
+    """
+    habits = await api.get_habits(message.from_user.id, today=today)
+    if habits is None:
+        await message.answer("Не удалось получить привычки. Попробуйте позже.")
+    elif not habits:
+        await message.answer("На сегодня привычек нет." if today else "У вас пока нет привычек.")
+    else:
+        await message.answer(format_habits(habits))
+
+
+@dp.message_handler(commands=['habits'])
+async def cmd_habits(message: Message) -> None:
+    """
+    Обработчик команды /habits: список всех привычек пользователя.
+
+    :param message: Объект типа Message.
+    """
+    await answer_habits(message, today=False)
+
+
+@dp.message_handler(commands=['today'])
+async def cmd_today(message: Message) -> None:
+    """
+    Обработчик команды /today: привычки, которые нужно выполнить сегодня.
+
+    :param message: Объект типа Message.
+    """
+    await answer_habits(message, today=True)
+
+
+@dp.message_handler(commands=['done'])
+async def cmd_done(message: Message) -> None:
+    """
+    Обработчик команды /done <ID привычки>: отметка о выполнении привычки.
+
+    :param message: Объект типа Message.
+    """
+    habit_id = message.get_args().strip()
+    if not habit_id.isdigit():
+        await message.answer("Укажите номер привычки из списка /habits, например: /done 12")
+        return
+
+    completed = await api.complete_habit(message.from_user.id, int(habit_id))
+    if completed is None:
+        await message.answer("Не удалось отметить привычку. Попробуйте позже.")
+    elif not completed:
+        await message.answer(f"Привычка #{habit_id} не найдена.")
+    else:
+        await message.answer(f"Привычка #{habit_id} выполнена!")
 
 
 @dp.message_handler()
@@ -40,15 +112,11 @@ async def process_connection_code(message: Message) -> None:
      :param message: Объект типа Message.
 
      """
-    connection_code = message.text
-    telegram_id = message.from_user.id
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f'{SERVER_URL}/api/register/confirm/',
-                                data={'connection_code': connection_code, 'telegram_id': telegram_id}) as response:
-            if response.status == 200:
-                await message.answer("Ваш аккаунт успешно связан с телеграммом!")
-            else:
-                await message.answer(
-                    "Произошла ошибка при связывании аккаунта. "
-                    "Пожалуйста, проверьте код подключения и попробуйте снова."
-                )
+    if await api.confirm_registration(message.text, message.from_user.id):
+        await status_cache.set(message.from_user.id, True)
+        await message.answer("Ваш аккаунт успешно связан с телеграммом!")
+    else:
+        await message.answer(
+            "Произошла ошибка при связывании аккаунта. "
+            "Пожалуйста, проверьте код подключения и попробуйте снова."
+        )
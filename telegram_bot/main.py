@@ -1,7 +1,69 @@
-from aiogram import executor
+import logging
+import os
+
+from aiogram import Dispatcher, executor
+from dotenv import load_dotenv
 
 import handlers  # noqa
-from bot import dp
+from api_client import api
+from bot import bot, dp
+from status_cache import status_cache
+from webhook import (
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    create_webhook_app
+)
+
+load_dotenv()
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+
+logger = logging.getLogger(__name__)
+
+
+async def on_startup(dispatcher: Dispatcher) -> None:
+    """
+    Открывает HTTP-сессию к API сервиса привычек и кэш статуса подключения при запуске бота.
+
+    :param dispatcher: Диспетчер бота.
+    """
+    await api.start()
+    await status_cache.start()
+
+
+async def on_startup_webhook(dispatcher: Dispatcher) -> None:
+    """
+    При запуске в режиме вебхука дополнительно регистрирует вебхук в Telegram.
+    Реплики бота регистрируют один и тот же адрес, поэтому повторная регистрация ничего не меняет.
+
+    :param dispatcher: Диспетчер бота.
+    """
+    await on_startup(dispatcher)
+    if WEBHOOK_HOST:
+        await bot.set_webhook(f'{WEBHOOK_HOST.rstrip("/")}{WEBHOOK_PATH}', max_connections=WEBHOOK_MAX_CONNECTIONS,
+                              secret_token=WEBHOOK_SECRET or None)
+    else:
+        logger.warning('WEBHOOK_HOST не задан, вебхук нужно зарегистрировать в Telegram вручную')
+
+
+async def on_shutdown(dispatcher: Dispatcher) -> None:
+    """
+    Закрывает HTTP-сессию к API сервиса привычек и кэш статуса подключения при остановке бота.
+    Вебхук не удаляется: остальные реплики продолжают принимать обновления.
+
+    :param dispatcher: Диспетчер бота.
+    """
+    await api.close()
+    await status_cache.close()
+
 
 if __name__ == '__main__':
-    executor.start_polling(dp, skip_updates=True)
+    if BOT_MODE == 'webhook':
+        webhook_executor = executor.set_webhook(dp, WEBHOOK_PATH, on_startup=on_startup_webhook,
+                                                on_shutdown=on_shutdown, web_app=create_webhook_app())
+        webhook_executor.run_app(host=WEBAPP_HOST, port=WEBAPP_PORT)
+    else:
+        executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
@@ -0,0 +1,151 @@
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from redis import asyncio as aioredis
+
+load_dotenv()
+CACHE_TTL = int(os.getenv('BOT_STATUS_CACHE_TTL', 24 * 60 * 60))
+CACHE_NEGATIVE_TTL = int(os.getenv('BOT_STATUS_CACHE_NEGATIVE_TTL', 60))
+CACHE_REDIS_URL = os.getenv('BOT_STATUS_CACHE_REDIS_URL', '')
+CACHE_MAX_ENTRIES = int(os.getenv('BOT_STATUS_CACHE_MAX_ENTRIES', 100000))
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionStatusCache:
+    """
+    Кэш статуса подключения пользователей к Telegram (telegram_id -> подключен ли аккаунт).
+
+    Статус хранится в памяти процесса бота и, если задан redis_url, в общем Redis, чтобы
+    реплики бота не запрашивали API повторно. Подключенный статус не меняется, поэтому
+    хранится долго (ttl), а неподключенный - недолго (negative_ttl): пользователь может
+    подтвердить регистрацию через другую реплику. Счетчики hits/misses показывают,
+    сколько проверок обошлось без запроса к API.
+    """
+    key_prefix = 'bot:tg_connected:'
+
+    def __init__(self, ttl: int = CACHE_TTL, negative_ttl: int = CACHE_NEGATIVE_TTL,
+                 redis_url: str = CACHE_REDIS_URL, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        """
+        Инициализация кэша.
+        :param ttl: Время хранения подключенного статуса в секундах.
+        :param negative_ttl: Время хранения неподключенного статуса в секундах.
+        :param redis_url: Адрес Redis (пустая строка - только память процесса).
+        :param max_entries: Максимальное количество статусов в памяти процесса.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self.redis: Optional[aioredis.Redis] = None
+        self.local: Dict[int, Tuple[bool, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        """
+        Подключается к Redis, если он задан. Вызывается при запуске бота.
+        """
+        if self.redis_url and self.redis is None:
+            self.redis = aioredis.from_url(self.redis_url)
+
+    async def close(self) -> None:
+        """
+        Закрывает соединение с Redis и пишет в лог счетчики попаданий. Вызывается при остановке бота.
+        """
+        logger.info(f'Кэш статуса подключения: попаданий {self.hits}, промахов {self.misses}')
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
+
+    def get_ttl(self, is_connected: bool) -> int:
+        """
+        Возвращает время хранения статуса в секундах.
+
+        :param is_connected: Подключен ли аккаунт пользователя.
+        """
+        return self.ttl if is_connected else self.negative_ttl
+
+    def remember(self, telegram_id: int, is_connected: bool) -> None:
+        """
+        Сохраняет статус в памяти процесса. При переполнении удаляются устаревшие статусы,
+        а если их не хватило - самые старые.
+
+        :param telegram_id: ID пользователя в Telegram.
+        :param is_connected: Подключен ли аккаунт пользователя.
+        """
+        self.local.pop(telegram_id, None)
+        if len(self.local) >= self.max_entries:
+            now = time.monotonic()
+            self.local = {key: value for key, value in self.local.items() if value[1] > now}
+            while len(self.local) >= self.max_entries:
+                del self.local[next(iter(self.local))]
+        self.local[telegram_id] = (is_connected, time.monotonic() + self.get_ttl(is_connected))
+
+    async def get(self, telegram_id: int) -> Optional[bool]:
+        """
+        Возвращает статус из кэша или None, если статуса нет или он устарел.
+
+        :param telegram_id: ID пользователя в Telegram.
+        """
+        cached = self.local.get(telegram_id)
+        if cached is not None:
+            is_connected, expires_at = cached
+            if expires_at > time.monotonic():
+                return is_connected
+            del self.local[telegram_id]
+
+        if self.redis is None:
+            return None
+        try:
+            value = await self.redis.get(f'{self.key_prefix}{telegram_id}')
+        except aioredis.RedisError:
+            logger.exception('Не удалось прочитать статус подключения из Redis')
+            return None
+        if value is None:
+            return None
+        is_connected = value == b'1'
+        self.remember(telegram_id, is_connected)
+        return is_connected
+
+    async def set(self, telegram_id: int, is_connected: bool) -> None:
+        """
+        Сохраняет статус в кэш.
+
+        :param telegram_id: ID пользователя в Telegram.
+        :param is_connected: Подключен ли аккаунт пользователя.
+        """
+        self.remember(telegram_id, is_connected)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(f'{self.key_prefix}{telegram_id}', b'1' if is_connected else b'0',
+                                 ex=self.get_ttl(is_connected))
+        except aioredis.RedisError:
+            logger.exception('Не удалось сохранить статус подключения в Redis')
+
+    async def get_or_fetch(self, telegram_id: int, fetch: Callable[[int], Awaitable[bool]],
+                           refresh: bool = False) -> bool:
+        """
+        Возвращает статус из кэша, а при промахе (или refresh=True) запрашивает его через fetch
+        и сохраняет в кэш.
+
+        :param telegram_id: ID пользователя в Telegram.
+        :param fetch: Функция запроса статуса у API.
+        :param refresh: Не использовать кэш, а запросить актуальный статус.
+        """
+        if not refresh:
+            is_connected = await self.get(telegram_id)
+            if is_connected is not None:
+                self.hits += 1
+                return is_connected
+        self.misses += 1
+        is_connected = await fetch(telegram_id)
+        await self.set(telegram_id, is_connected)
+        return is_connected
+
+
+status_cache = ConnectionStatusCache()
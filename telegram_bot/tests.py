@@ -0,0 +1,182 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from redis import asyncio as aioredis
+
+from telegram_bot.api_client import DjangoAPIClient
+from telegram_bot.status_cache import ConnectionStatusCache
+
+
+class FakeRedis:
+    """Заглушка асинхронного клиента Redis: значения хранятся в словаре"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    async def close(self):
+        pass
+
+
+class BrokenRedis(FakeRedis):
+    """Заглушка недоступного Redis"""
+
+    async def get(self, key):
+        raise aioredis.ConnectionError('Redis недоступен')
+
+    async def set(self, key, value, ex=None):
+        raise aioredis.ConnectionError('Redis недоступен')
+
+
+class ConnectionStatusCacheTestCase(SimpleTestCase):
+    """Кэш статуса подключения пользователей к Telegram"""
+
+    def setUp(self):
+        self.now = 1000.0
+        clock_patcher = patch('telegram_bot.status_cache.time')
+        self.addCleanup(clock_patcher.stop)
+        clock_patcher.start().monotonic.side_effect = lambda: self.now
+        self.cache = ConnectionStatusCache(ttl=100, negative_ttl=10, redis_url='', max_entries=3)
+
+    async def test_positive_and_negative_ttl(self):
+        """Подключенный статус хранится ttl секунд, неподключенный - negative_ttl секунд"""
+        await self.cache.set(1, True)
+        await self.cache.set(2, False)
+
+        self.now += 11
+        self.assertTrue(await self.cache.get(1))
+        self.assertIsNone(await self.cache.get(2))
+
+        self.now += 90
+        self.assertIsNone(await self.cache.get(1))
+        self.assertEqual(self.cache.local, {})
+
+    async def test_eviction_at_max_entries(self):
+        """При переполнении сначала удаляются устаревшие статусы, затем самые старые"""
+        await self.cache.set(1, False)
+        await self.cache.set(2, True)
+        await self.cache.set(3, True)
+        self.now += 11
+        await self.cache.set(4, True)
+
+        self.assertEqual(list(self.cache.local), [2, 3, 4])
+
+        await self.cache.set(5, True)
+
+        self.assertEqual(list(self.cache.local), [3, 4, 5])
+
+    async def test_counters_and_refresh(self):
+        """Попадания и промахи учитываются, refresh запрашивает статус в обход кэша"""
+        fetch = AsyncMock(side_effect=[False, True])
+
+        self.assertFalse(await self.cache.get_or_fetch(1, fetch))
+        self.assertFalse(await self.cache.get_or_fetch(1, fetch))
+        self.assertTrue(await self.cache.get_or_fetch(1, fetch, refresh=True))
+
+        self.assertEqual(fetch.await_count, 2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+        self.assertTrue(await self.cache.get(1))
+
+    async def test_shared_redis(self):
+        """Статус, сохраненный одной репликой, читается другой из Redis с TTL по статусу"""
+        redis = FakeRedis()
+        self.cache.redis = redis
+        other_replica = ConnectionStatusCache(ttl=100, negative_ttl=10, redis_url='')
+        other_replica.redis = redis
+        fetch = AsyncMock()
+
+        await self.cache.set(1, True)
+        await self.cache.set(2, False)
+
+        self.assertTrue(await other_replica.get_or_fetch(1, fetch))
+        self.assertFalse(await other_replica.get_or_fetch(2, fetch))
+        fetch.assert_not_awaited()
+        self.assertEqual(redis.ttls, {'bot:tg_connected:1': 100, 'bot:tg_connected:2': 10})
+        self.assertIn(1, other_replica.local)
+
+    async def test_redis_errors_fall_back_to_api(self):
+        """Если Redis недоступен, статус запрашивается у API и хранится в памяти процесса"""
+        self.cache.redis = BrokenRedis()
+        fetch = AsyncMock(return_value=True)
+
+        with self.assertLogs('telegram_bot.status_cache', level='ERROR'):
+            self.assertTrue(await self.cache.get_or_fetch(1, fetch))
+        self.assertTrue(await self.cache.get_or_fetch(1, fetch))
+
+        fetch.assert_awaited_once_with(1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+
+class DjangoAPIClientTestCase(SimpleTestCase):
+    """Клиент API: недоступность API не пробрасывается в обработчики бота"""
+
+    def setUp(self):
+        self.delay = 0
+        self.status = 200
+        self.body = '[{"id": 1, "action": "Зарядка", "place": "Дом", "time": "09:00"}]'
+
+    async def handle(self, request):
+        await asyncio.sleep(self.delay)
+        return web.Response(status=self.status, text=self.body, content_type='application/json')
+
+    def run_client(self, scenario, server_down=False):
+        """Выполняет scenario(client) с клиентом, подключенным к заглушке API"""
+        async def run():
+            app = web.Application()
+            app.router.add_route('*', '/{path:.*}', self.handle)
+            server = TestServer(app)
+            await server.start_server()
+            client = DjangoAPIClient(str(server.make_url('')), timeout=0.5, connect_timeout=0.5)
+            try:
+                if server_down:
+                    await server.close()
+                return await scenario(client)
+            finally:
+                await client.close()
+                await server.close()
+
+        return async_to_sync(run)()
+
+    def test_get_habits(self):
+        """Привычки возвращаются списком"""
+        habits = self.run_client(lambda client: client.get_habits(1))
+
+        self.assertEqual(habits, [{'id': 1, 'action': 'Зарядка', 'place': 'Дом', 'time': '09:00'}])
+
+    def test_bad_gateway_page(self):
+        """HTML-страница 502 от nginx - API недоступен"""
+        self.status, self.body = 502, '<html><body>502 Bad Gateway</body></html>'
+
+        async def scenario(client):
+            return (await client.get('/api/internal/telegram/1/habits/'), await client.get_habits(1),
+                    await client.complete_habit(1, 1), await client.check_registration(1))
+
+        with self.assertLogs('telegram_bot.api_client', level='WARNING'):
+            self.assertEqual(self.run_client(scenario), ((502, None), None, None, False))
+
+    def test_timeout(self):
+        """Запрос, на который API не ответил за таймаут, - API недоступен"""
+        self.delay = 1
+
+        with self.assertLogs('telegram_bot.api_client', level='WARNING'):
+            self.assertIsNone(self.run_client(lambda client: client.get_habits(1)))
+
+    def test_connection_error(self):
+        """API, к которому не удается подключиться, - API недоступен"""
+        async def scenario(client):
+            return (await client.post('/api/register/check/', json={'telegram_id': 1}),
+                    await client.complete_habit(1, 1))
+
+        with self.assertLogs('telegram_bot.api_client', level='WARNING'):
+            self.assertEqual(self.run_client(scenario, server_down=True), ((None, None), None))
@@ -0,0 +1,51 @@
+import asyncio
+import os
+from typing import Awaitable, Callable
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/bot/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', 8080))
+MAX_CONCURRENT_UPDATES = int(os.getenv('BOT_MAX_CONCURRENT_UPDATES', 20))
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def create_webhook_app(max_concurrent_updates: int = MAX_CONCURRENT_UPDATES,
+                       secret: str = WEBHOOK_SECRET) -> web.Application:
+    """
+    Создает aiohttp-приложение для приема обновлений Telegram через вебхук.
+
+    Каждая реплика бота обрабатывает одновременно не больше max_concurrent_updates обновлений,
+    остальные запросы Telegram ждут свободного места (Telegram сам ограничивает количество
+    одновременных запросов параметром max_connections вебхука). Если задан секрет,
+    запросы без заголовка X-Telegram-Bot-Api-Secret-Token с этим секретом отклоняются.
+
+    :param max_concurrent_updates: Максимальное количество одновременно обрабатываемых обновлений.
+    :param secret: Секрет вебхука (пустая строка - не проверять).
+    """
+    semaphore = asyncio.Semaphore(max_concurrent_updates)
+
+    @web.middleware
+    async def webhook_middleware(request: web.Request, handler: Handler) -> web.StreamResponse:
+        if request.path != WEBHOOK_PATH:
+            return await handler(request)
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            raise web.HTTPForbidden()
+        async with semaphore:
+            return await handler(request)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(text='ok')
+
+    app = web.Application(middlewares=[webhook_middleware])
+    app.router.add_get('/health', health)
+    return app